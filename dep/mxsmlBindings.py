@@ -30,30 +30,38 @@ Software, at any time. MetaX reserves all the right for the final explanation.
 from ctypes import *
 import os
 
-path_libmxsml = ""
-path_libmxsml_array = [
-    os.path.join(
-        os.path.dirname(os.path.abspath(__file__)), "libmxsml.so"
-    ),
-    "/opt/mxdriver/lib/libmxsml.so",
-    "/opt/maca/lib/libmxsml.so",
-    "/opt/mxn100/lib/libmxsml.so"
-]
-for file in path_libmxsml_array:
-    if os.path.isfile(file):
-        print("Using lib from %s" % file)
-        path_libmxsml = file
-        break
-
-if not path_libmxsml:
-    print("Unable to find mxsml library.")
-    exit(1)
-
-try:
-    mxsml = cdll.LoadLibrary(path_libmxsml)
-except OSError:
-    print("Unable to load mxsml library.")
-    exit(1)
+def load_libmxsml():
+    path_libmxsml = ""
+    path_libmxsml_array = [
+        os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "libmxsml.so"
+        ),
+        "/opt/mxdriver/lib/libmxsml.so",
+        "/opt/maca/lib/libmxsml.so",
+        "/opt/mxn100/lib/libmxsml.so"
+    ]
+    for file in path_libmxsml_array:
+        if os.path.isfile(file):
+            print("Using lib from %s" % file)
+            path_libmxsml = file
+            break
+
+    if not path_libmxsml:
+        print("Unable to find mxsml library.")
+        exit(1)
+
+    try:
+        return cdll.LoadLibrary(path_libmxsml)
+    except OSError:
+        print("Unable to load mxsml library.")
+        exit(1)
+
+if os.environ.get("MXSML_SIMULATE", "0") not in ("", "0"):
+    from mxsmlSimulator import MxSmlSimulator
+    mxsml = MxSmlSimulator.from_environ()
+    print("Using simulated lib %s" % mxsml)
+else:
+    mxsml = load_libmxsml()
 
 DeviceId = c_uint
 DieId = c_uint
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+
+"""
+Copyright © 2025 MetaX Integrated Circuits (Shanghai) Co., Ltd. All Rights Reserved.
+
+This software and associated documentation files (hereinafter collectively referred to as
+"Software") is a proprietary commercial software developed by MetaX Integrated Circuits
+(Shanghai) Co., Ltd. and/or its affiliates (hereinafter collectively referred to as “MetaX”).
+The information presented in the Software belongs to MetaX. Without prior written permission
+from MetaX, no entity or individual has the right to obtain a copy of the Software to deal in
+the Software, including but not limited to use, copy, modify, merge, disclose, publish,
+distribute, sublicense, and/or sell copies of the Software or substantial portions of the Software.
+
+The Software is provided for reference only, without warranty of any kind, either express or
+implied, including but not limited to the warranty of merchantability, fitness for any purpose
+and/or noninfringement. In no case shall MetaX be liable for any claim, damage or other liability
+arising from, out of or in connection with the Software.
+
+If the Software need to be used in conjunction with any third-party software or open source
+software, the rights to the third-party software or open source software still belong to the
+copyright owners. For details, please refer to the respective notices or licenses. Please comply
+with the provisions of the relevant notices or licenses. If the open source software licenses
+additionally require the disposal of rights related to this Software, please contact MetaX
+immediately and obtain MetaX 's written consent.
+
+MetaX reserves the right, at its sole discretion, to change, modify, add or remove portions of the
+Software, at any time. MetaX reserves all the right for the final explanation.
+"""
+
+"""
+Simulated libmxsml for hardware-free benchmarking and load testing.
+
+mxsmlBindings.py binds every mxSml entry point from the library object, with
+MXSML_SIMULATE=1 it binds them from MxSmlSimulator instead of libmxsml.so.
+The simulated node is configured by environment variables:
+
+    MXSML_SIM_DEVICES       native device count, default 8
+    MXSML_SIM_DIES          die count per device, default 1
+    MXSML_SIM_SGPUS         sgpu count per device, default 0
+    MXSML_SIM_LINKS         MetaXLink count per device, default 7
+    MXSML_SIM_BRAND         C or N, default C
+    MXSML_SIM_LATENCY       latency of each call, unit:ms, default 0
+    MXSML_SIM_FAILURE_RATE  probability that a device query fails, default 0
+    MXSML_SIM_FAIL_FUNCS    comma separated entry points failures are limited to, default all
+    MXSML_SIM_HANG_DEVICES  comma separated device ids whose queries block like a device stuck in reset
+    MXSML_SIM_HANG_TIME     how long a blocked query takes, unit:ms, default 60000
+    MXSML_SIM_ENUM_TIME     how long the driver takes to enumerate all devices after the first
+                            mxSmlInit, the device count grows until then, unit:ms, default 0
+    MXSML_SIM_UNSUPPORTED   comma separated entry points answering not supported, an entry point
+                            prefixed with "<device id>:" only on that device, like a mixed-SKU node
+    MXSML_SIM_SEED          random seed, default 0
+"""
+
+import os
+import time
+import random
+import threading
+
+# MxSmlReturn
+SUCCESS = 0
+FAILURE = 1
+OPERATION_NOT_SUPPORT = 3
+
+ERROR_STRINGS = {
+    SUCCESS: b"Success",
+    FAILURE: b"Failure",
+    OPERATION_NOT_SUPPORT: b"Operation not support",
+}
+
+# entry points that never fail, so that failures hit sampling rather than discovery
+NEVER_FAIL = ("mxSmlInit", "mxSmlInitWithFlags", "mxSmlGetErrorString",
+    "mxSmlGetDeviceCount", "mxSmlGetPfDeviceCount")
+
+# entry points used to discover devices, they never block so that hung devices are still found
+NEVER_HANG = NEVER_FAIL + ("mxSmlGetDeviceInfo", "mxSmlGetDeviceDieCount", "mxSmlGetDeviceVersion",
+    "mxSmlGetDeviceDieVersion", "mxSmlGetMetaXLinkTopo")
+
+
+def deref(arg):
+    # arguments arrive as passed by the caller, ctypes would have converted byref() by argtypes
+    return getattr(arg, "_obj", arg)
+
+
+class SimulatedFunction:
+    """Stands in for a ctypes function pointer, argtypes and restype are accepted and ignored"""
+
+    def __init__(self, simulator, name, impl):
+        self.simulator = simulator
+        self.name = name
+        self.impl = impl
+        self.argtypes = None
+        self.restype = None
+
+    def __call__(self, *args):
+        return self.simulator.call(self.name, self.impl, [deref(arg) for arg in args])
+
+
+class MxSmlSimulator:
+
+    def __init__(self, devices=8, dies=1, sgpus=0, links=7, brand="C", latency=0, failure_rate=0,
+            fail_funcs=(), seed=0, hang_devices=(), hang_time=60, unsupported=(), enum_time=0):
+        self.devices = devices
+        self.dies = dies
+        self.sgpus = sgpus
+        self.links = links
+        self.brand = 1 if brand.upper() == "N" else 2
+        self.latency = latency  # seconds
+        self.failure_rate = failure_rate
+        self.fail_funcs = set(fail_funcs)
+        self.hang_devices = set(hang_devices)
+        self.hang_time = hang_time  # seconds
+        # entry point names, or (device id, entry point name) for a single device
+        self.unsupported = set(unsupported)
+        self.enum_time = enum_time  # seconds
+        self.init_time = None
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        # monotonically increasing counters, (device id, link, type) : bytes
+        self.traffic = {}
+
+    @classmethod
+    def from_environ(cls):
+        env = os.environ
+        fail_funcs = [name.strip() for name in env.get("MXSML_SIM_FAIL_FUNCS", "").split(",") if name.strip()]
+        hang_devices = [int(id) for id in env.get("MXSML_SIM_HANG_DEVICES", "").split(",") if id.strip()]
+        unsupported = []
+        for item in env.get("MXSML_SIM_UNSUPPORTED", "").split(","):
+            if ":" in item:
+                device_id, name = item.split(":", 1)
+                unsupported.append((int(device_id), name.strip()))
+            elif item.strip():
+                unsupported.append(item.strip())
+        return cls(
+            devices=int(env.get("MXSML_SIM_DEVICES", 8)),
+            dies=int(env.get("MXSML_SIM_DIES", 1)),
+            sgpus=int(env.get("MXSML_SIM_SGPUS", 0)),
+            links=int(env.get("MXSML_SIM_LINKS", 7)),
+            brand=env.get("MXSML_SIM_BRAND", "C"),
+            latency=float(env.get("MXSML_SIM_LATENCY", 0)) / 1000,
+            failure_rate=float(env.get("MXSML_SIM_FAILURE_RATE", 0)),
+            fail_funcs=fail_funcs,
+            seed=int(env.get("MXSML_SIM_SEED", 0)),
+            hang_devices=hang_devices,
+            hang_time=float(env.get("MXSML_SIM_HANG_TIME", 60000)) / 1000,
+            unsupported=unsupported,
+            enum_time=float(env.get("MXSML_SIM_ENUM_TIME", 0)) / 1000)
+
+    def __str__(self):
+        return "MxSmlSimulator:{ devices:%d, dies:%d, sgpus:%d, links:%d, latency:%.1fms, failure_rate:%g }" \
+                % (self.devices, self.dies, self.sgpus, self.links, self.latency * 1000, self.failure_rate)
+
+    def __getattr__(self, name):
+        if not name.startswith("mxSml"):
+            raise AttributeError(name)
+        # entry points without a simulation report not supported, like an older library
+        impl = getattr(type(self), "sim_" + name[len("mxSml"):], None)
+        function = SimulatedFunction(self, name, impl)
+        setattr(self, name, function)
+        return function
+
+    def call(self, name, impl, args):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        if self.hang_devices and name not in NEVER_HANG and args and isinstance(args[0], int) \
+                and args[0] in self.hang_devices:
+            time.sleep(self.hang_time)
+
+        if impl is None:
+            return OPERATION_NOT_SUPPORT
+
+        if self.unsupported and (name in self.unsupported
+                or (args and isinstance(args[0], int) and (args[0], name) in self.unsupported)):
+            return OPERATION_NOT_SUPPORT
+
+        if self.failure_rate > 0 and name not in NEVER_FAIL and (not self.fail_funcs or name in self.fail_funcs):
+            with self.lock:
+                failed = self.random.random() < self.failure_rate
+            if failed:
+                return FAILURE
+
+        return impl(self, *args)
+
+    def jitter(self, base, spread):
+        with self.lock:
+            return base + self.random.randint(-spread, spread)
+
+    def uuid(self, device_id):
+        return b"GPU-00000000-0000-0000-0000-%012d" % device_id
+
+    # init and discovery
+    def sim_Init(self):
+        if self.init_time is None:
+            self.init_time = time.time()
+        return SUCCESS
+
+    def sim_InitWithFlags(self, flags):
+        return self.sim_Init()
+
+    def sim_GetErrorString(self, ret):
+        return ERROR_STRINGS.get(ret, b"Unknown error")
+
+    def sim_GetDeviceCount(self):
+        # devices show up one by one while the driver is still enumerating
+        if self.enum_time > 0 and self.init_time is not None:
+            elapsed = time.time() - self.init_time
+            if elapsed < self.enum_time:
+                return int(self.devices * elapsed / self.enum_time)
+        return self.devices
+
+    def sim_GetPfDeviceCount(self):
+        return 0
+
+    def sim_GetDeviceDieCount(self, device_id, count):
+        count.value = self.dies
+        return SUCCESS
+
+    def sim_GetDeviceInfo(self, device_id, info):
+        if device_id >= self.devices:
+            return FAILURE
+        info.deviceId = device_id
+        info.bdfId = b"0000:%02x:00.0" % (device_id + 1)
+        info.gpuId = device_id
+        info.nodeId = device_id
+        info.uuid = self.uuid(device_id)
+        info.brand = self.brand
+        info.mode = 0
+        info.deviceName = b"MXN100" if self.brand == 1 else b"MXC500"
+        return SUCCESS
+
+    def sim_GetDeviceVersion(self, device_id, unit, version, size):
+        version.value = b"1.0.0"
+        return SUCCESS
+
+    def sim_GetDeviceDieVersion(self, device_id, die_id, unit, version, size):
+        version.value = b"1.0.0"
+        return SUCCESS
+
+    def sim_GetMetaXLinkTopo(self, device_id, topo):
+        topo.topologyId = device_id
+        topo.socketId = device_id * 2 // max(self.devices, 1)
+        return SUCCESS
+
+    # device queries
+    def sim_GetTemperatureInfo(self, device_id, sensor, temp):
+        temp.value = self.jitter(4500, 500)
+        return SUCCESS
+
+    def sim_GetDieTemperatureInfo(self, device_id, die_id, sensor, temp):
+        temp.value = self.jitter(4500, 500)
+        return SUCCESS
+
+    def sim_GetDeviceIpUsage(self, device_id, ip, usage):
+        usage.value = self.jitter(50, 50)
+        return SUCCESS
+
+    def sim_GetDieIpUsage(self, device_id, die_id, ip, usage):
+        usage.value = self.jitter(50, 50)
+        return SUCCESS
+
+    def sim_GetMemoryInfo(self, device_id, info):
+        return self.sim_GetDieMemoryInfo(device_id, 0, info)
+
+    def sim_GetDieMemoryInfo(self, device_id, die_id, info):
+        info.vramTotal = info.visVramTotal = 64 * 1024 * 1024
+        info.vramUse = info.visVramUse = self.jitter(32 * 1024 * 1024, 1024 * 1024)
+        info.xttTotal = 16 * 1024 * 1024
+        info.xttUse = self.jitter(1024 * 1024, 1024)
+        return SUCCESS
+
+    def sim_GetPmbusInfo(self, device_id, unit, info):
+        return self.sim_GetDiePmbusInfo(device_id, 0, unit, info)
+
+    def sim_GetDiePmbusInfo(self, device_id, die_id, unit, info):
+        info.voltage = 800
+        info.current = self.jitter(20000, 2000)
+        info.power = self.jitter(50000, 5000)
+        return SUCCESS
+
+    def sim_GetBoardPowerInfo(self, device_id, size, info):
+        size.value = min(size.value, 2)
+        for i in range(size.value):
+            info[i].voltage = 12000
+            info[i].current = self.jitter(15000, 1000)
+            info[i].power = self.jitter(180000, 10000)
+        return SUCCESS
+
+    def sim_GetClocks(self, device_id, ip, size, clocks):
+        size.value = 1
+        clocks[0] = self.jitter(1600, 100)
+        return SUCCESS
+
+    def sim_GetDieClocks(self, device_id, die_id, ip, size, clocks):
+        return self.sim_GetClocks(device_id, ip, size, clocks)
+
+    def sim_GetPcieThroughput(self, device_id, throughput):
+        throughput.rx = self.jitter(100000, 10000)
+        throughput.tx = self.jitter(100000, 10000)
+        return SUCCESS
+
+    def sim_GetEthThroughput(self, device_id, throughput):
+        return self.sim_GetPcieThroughput(device_id, throughput)
+
+    def sim_GetHbmBandWidth(self, device_id, bandwidth):
+        bandwidth.hbmBandwidthReqTotal = self.jitter(500000, 50000)
+        bandwidth.hbmBandwidthRespTotal = self.jitter(500000, 50000)
+        return SUCCESS
+
+    def sim_GetDieHbmBandWidth(self, device_id, die_id, bandwidth):
+        return self.sim_GetHbmBandWidth(device_id, bandwidth)
+
+    def sim_GetCurrentDpmIpPerfLevel(self, device_id, ip, level):
+        level.value = self.jitter(4, 3)
+        return SUCCESS
+
+    def sim_GetCurrentDieDpmIpPerfLevel(self, device_id, die_id, ip, level):
+        return self.sim_GetCurrentDpmIpPerfLevel(device_id, ip, level)
+
+    def sim_GetCurrentClocksThrottleReason(self, device_id, reason):
+        reason.value = 0
+        return SUCCESS
+
+    def sim_GetDieCurrentClocksThrottleReason(self, device_id, die_id, reason):
+        reason.value = 0
+        return SUCCESS
+
+    def sim_GetDieTotalEccErrors(self, device_id, die_id, counts):
+        counts.sramCE = counts.sramUE = counts.dramCE = counts.dramUE = counts.retiredPage = 0
+        return SUCCESS
+
+    def sim_GetDeviceState(self, device_id, state):
+        state.value = 1
+        return SUCCESS
+
+    def sim_GetDieUnavailableReason(self, device_id, die_id, reason):
+        reason.unavailableCode = 0
+        reason.unavailableReason = b""
+        return SUCCESS
+
+    def sim_GetSingleGpuProcess_v2(self, device_id, number, processes):
+        number.value = 0
+        return SUCCESS
+
+    def sim_GetPciEventInfo(self, device_id, event_type, events, size):
+        size.value = 0
+        return SUCCESS
+
+    def sim_GetRasErrorData(self, device_id, data):
+        data.showRasErrorSize = 0
+        return SUCCESS
+
+    def sim_GetDieRasErrorData(self, device_id, die_id, data):
+        data.showRasErrorSize = 0
+        return SUCCESS
+
+    def sim_GetRasStatusData(self, device_id, data):
+        data.showRasStatusSize = 0
+        return SUCCESS
+
+    def sim_GetDieRasStatusData(self, device_id, die_id, data):
+        data.showRasStatusSize = 0
+        return SUCCESS
+
+    # pcie and MetaXLink
+    def sim_GetPcieInfo(self, device_id, info):
+        info.speed = 32.0
+        info.width = 16
+        return SUCCESS
+
+    def sim_GetPcieMaxLinkInfo(self, device_id, info):
+        return self.sim_GetPcieInfo(device_id, info)
+
+    def sim_GetMetaXLinkInfo(self, device_id, info):
+        for i in range(min(self.links, len(info.speed))):
+            info.speed[i] = 32.0
+            info.width[i] = 16
+        return SUCCESS
+
+    def sim_GetMetaXLinkBandwidth(self, device_id, link_type, size, bandwidth):
+        size.value = min(self.links, len(bandwidth))
+        for i in range(size.value):
+            bandwidth[i].requestBandwidth = self.jitter(20000, 2000)
+            bandwidth[i].reponseBandwidth = self.jitter(20000, 2000)
+        return SUCCESS
+
+    def sim_GetMetaXLinkTrafficStat(self, device_id, link_type, size, stats):
+        size.value = min(self.links, len(stats))
+        with self.lock:
+            for i in range(size.value):
+                key = (device_id, i, int(link_type))
+                self.traffic[key] = self.traffic.get(key, 0) + self.random.randint(0, 1 << 30)
+                stats[i].requestTrafficStat = self.traffic[key]
+                stats[i].reponseTrafficStat = self.traffic[key]
+        return SUCCESS
+
+    def sim_GetMetaXLinkAer(self, device_id, size, aer):
+        size.value = min(self.links, len(aer))
+        for i in range(size.value):
+            aer[i].ceAer = 0
+            aer[i].ueAer = 0
+        return SUCCESS
+
+    # sgpu
+    def sim_GetSgpuCount(self, device_id):
+        return self.sgpus
+
+    def sim_GetSgpuInfo(self, device_id, sgpu_id, info):
+        if sgpu_id >= self.sgpus:
+            return OPERATION_NOT_SUPPORT
+        info.parentDeviceId = device_id
+        info.sgpuId = sgpu_id
+        info.vramQuota = 100 // max(self.sgpus, 1)
+        info.computeQuota = 100 // max(self.sgpus, 1)
+        info.minor = 128 + device_id * 16 + sgpu_id
+        info.uuid = b"%s-sgpu-%d" % (self.uuid(device_id), sgpu_id)
+        return SUCCESS
+
+    def sim_GetSgpuAnnotationsId(self, device_id, sgpu_id, annotations_id, size):
+        annotations_id.value = b"%s::%d" % (self.uuid(device_id), sgpu_id)
+        return SUCCESS
+
+    def sim_GetSgpuUsage(self, device_id, sgpu_id, usage):
+        usage.value = self.jitter(5000, 5000)
+        return SUCCESS
+
+    def sim_GetSgpuMemory(self, device_id, sgpu_id, memory):
+        memory.total = 4 * 1024 * 1024
+        memory.used = self.jitter(2 * 1024 * 1024, 1024)
+        memory.free = memory.total - memory.used
+        return SUCCESS
@@ -2,10 +2,10 @@ import sys
 import os.path
 import argparse
 import signal
-from http.server import HTTPServer
 from prometheus_client import MetricsHandler
 from prometheus_client import REGISTRY, GC_COLLECTOR, PLATFORM_COLLECTOR, PROCESS_COLLECTOR
-from mx_exporter.mx_exporter import MxCollector
+from mx_exporter.exposition import FORMATS, choose_format, choose_encoding
+from mx_exporter.http_server import ThreadPoolHTTPServer
 
 
 def check_port(value):
@@ -22,6 +22,34 @@ def check_interval(value):
     return interval
 
 
+def check_workers(value):
+    workers = int(value)
+    if workers < 1:
+        raise argparse.ArgumentTypeError("%s is invalid, worker count must be at least 1" % value)
+    return workers
+
+
+def check_sample_workers(value):
+    workers = int(value)
+    if workers < 0:
+        raise argparse.ArgumentTypeError("%s is invalid, worker count must not be negative" % value)
+    return workers
+
+
+def check_device_timeout(value):
+    timeout = int(value)
+    if timeout < 0:
+        raise argparse.ArgumentTypeError("%s is invalid, timeout must not be negative" % value)
+    return timeout
+
+
+def check_timeout(value):
+    timeout = float(value)
+    if timeout <= 0:
+        raise argparse.ArgumentTypeError("%s is invalid, timeout must be larger than 0s" % value)
+    return timeout
+
+
 def check_path(value):
     if not os.path.exists(value):
         raise argparse.ArgumentTypeError("%s is an invalid path" % value)
@@ -54,11 +82,18 @@ def signal_handler(signum, frame):
 
 
 class MxExporterHandler(MetricsHandler):
+    # HTTP/1.1 keeps scraper connections alive, every response must carry Content-Length
+    protocol_version = "HTTP/1.1"
+    # per-connection socket timeout in seconds, bounds stalled and idle keep-alive peers
+    timeout = 10
+    # /metrics of the MxCollector, set by main() before serving, see ExpositionCache
+    exposition_cache = None
+    # headers and a small compressed body go out in separate writes, with Nagle's algorithm
+    # the body waits for the delayed ACK of the headers on keep-alive connections
+    disable_nagle_algorithm = True
+
     def do_GET(self):
         if self.path == '/':
-            self.send_response(200)
-            self.send_header("Content-Type", "text/html")
-            self.end_headers()
             html_content = """<html>
 <head><title>MetaX Exporter</title></head>
 <body>
@@ -66,16 +101,30 @@ class MxExporterHandler(MetricsHandler):
 <p><a href="./metrics">Metrics</a></p>
 </body>
 </html>"""
-            self.wfile.write(html_content.encode("utf-8"))
+            self.send_body("text/html", html_content.encode("utf-8"))
 
         elif self.path == '/health':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
+            self.send_body('application/json', b"")
 
         else:
             # prometheus /metrics
-            super().do_GET()
+            format = choose_format(self.headers.get("Accept"))
+            encoding = choose_encoding(self.headers.get("Accept-Encoding"))
+            content_type = FORMATS[format][0]
+            body = self.exposition_cache.body(format, encoding)
+            # the body depends on both headers, caches in between must not hand it to other scrapers
+            self.send_body(content_type, body, encoding, vary="Accept, Accept-Encoding")
+
+    def send_body(self, content_type, body, content_encoding=None, vary=None):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if content_encoding is not None:
+            self.send_header("Content-Encoding", content_encoding)
+        if vary is not None:
+            self.send_header("Vary", vary)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
 
 def main():
@@ -90,6 +139,16 @@ def main():
     parser.add_argument("-lm", "--log-monitor", type=int, choices=[0,1], default=1, help="Deprecated, keep for back compatibility")
     parser.add_argument("-im", "--ib-monitor", type=int, choices=[0,1], default=0, help=argparse.SUPPRESS) # help="0/1 - Disable/Enable IB NIC counter monitoring"
     parser.add_argument("-mp", "--mount-point", type=check_path, default="/", help="Container mount point")
+    parser.add_argument("-w", "--workers", type=check_workers, default=8, help="HTTP worker threads serving connections concurrently")
+    parser.add_argument("-t", "--timeout", type=check_timeout, default=10, help="HTTP per-connection idle timeout, unit:s")
+    parser.add_argument("-sw", "--sample-workers", type=check_sample_workers, default=0, help="Threads sampling devices in parallel, 0 samples devices one after another")
+    parser.add_argument("-pr", "--prerender", type=int, choices=[0,1], default=0, help="0/1 - Disable/Enable rendering /metrics once per gathering interval")
+    parser.add_argument("-sim", "--simulate", type=int, choices=[0,1], default=0, help="0/1 - Disable/Enable the simulated mxsml library configured by MXSML_SIM_* environment variables")
+    parser.add_argument("-kp", "--kubelet-period", type=check_interval, default=10000, help="Pod resources refresh interval from kubelet, unit:ms")
+    parser.add_argument("-sp", "--sampler-process", type=int, choices=[0,1], default=0, help="0/1 - Disable/Enable sampling devices in a separate process")
+    parser.add_argument("-dt", "--device-timeout", type=check_device_timeout, default=0, help="Deadline of sampling one device, devices exceeding it are quarantined, 0 waits however long sampling takes, unit:ms")
+    parser.add_argument("-fi", "--fast-init", type=int, choices=[0,1], default=0, help="0/1 - Disable/Enable initializing as soon as the device number is stable instead of the 30s double mxSmlInit")
+    parser.add_argument("-ic", "--inventory-cache", default="", help="File keeping device versions and topology across restarts of the same boot and driver, empty disables it")
 
     args = parser.parse_args()
     print(args)
@@ -111,11 +170,21 @@ def main():
 
     registry = REGISTRY
 
-    mx_collector = MxCollector(cfg_file, registry, args.interval/1000, args.ib_monitor, args.mount_point)
+    if args.simulate:
+        # read when the mxsml bindings are imported
+        os.environ["MXSML_SIMULATE"] = "1"
+
+    # imported here so that tools under this package don't load libmxsml
+    from mx_exporter.mx_exporter import MxCollector
+    mx_collector = MxCollector(cfg_file, registry, args.interval/1000, args.ib_monitor, args.mount_point, args.prerender,
+        args.sample_workers, args.kubelet_period/1000, args.sampler_process, args.device_timeout/1000,
+        args.fast_init, args.inventory_cache)
+    MxExporterHandler.exposition_cache = mx_collector.exposition_cache
+    MxExporterHandler.timeout = args.timeout
 
     server_address = ('', args.port)
     try:
-        httpd = HTTPServer(server_address, MxExporterHandler)
+        httpd = ThreadPoolHTTPServer(server_address, MxExporterHandler, args.workers)
         httpd.serve_forever()
     except OSError:
         print("Invalid HTTP listen port: '{}' already in use(Please use -p/--port to specify a valid port)".format(args.port))
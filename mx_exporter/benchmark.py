@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+"""
+Copyright © 2025 MetaX Integrated Circuits (Shanghai) Co., Ltd. All Rights Reserved.
+
+This software and associated documentation files (hereinafter collectively referred to as
+"Software") is a proprietary commercial software developed by MetaX Integrated Circuits
+(Shanghai) Co., Ltd. and/or its affiliates (hereinafter collectively referred to as “MetaX”).
+The information presented in the Software belongs to MetaX. Without prior written permission
+from MetaX, no entity or individual has the right to obtain a copy of the Software to deal in
+the Software, including but not limited to use, copy, modify, merge, disclose, publish,
+distribute, sublicense, and/or sell copies of the Software or substantial portions of the Software.
+
+The Software is provided for reference only, without warranty of any kind, either express or
+implied, including but not limited to the warranty of merchantability, fitness for any purpose
+and/or noninfringement. In no case shall MetaX be liable for any claim, damage or other liability
+arising from, out of or in connection with the Software.
+
+If the Software need to be used in conjunction with any third-party software or open source
+software, the rights to the third-party software or open source software still belong to the
+copyright owners. For details, please refer to the respective notices or licenses. Please comply
+with the provisions of the relevant notices or licenses. If the open source software licenses
+additionally require the disposal of rights related to this Software, please contact MetaX
+immediately and obtain MetaX 's written consent.
+
+MetaX reserves the right, at its sole discretion, to change, modify, add or remove portions of the
+Software, at any time. MetaX reserves all the right for the final explanation.
+"""
+
+
+"""
+Benchmarks for mx-exporter, run as: python3 -m mx_exporter.benchmark <command> [options]
+
+    scrape  - scrape latency percentiles of a running exporter under N concurrent scrapers
+    cycle   - gather cycle time of GpuMonitor against the simulated mxsml library
+    startup - time until GpuMonitor is initialized against a simulated driver still enumerating devices
+"""
+
+import os
+import io
+import sys
+import csv
+import time
+import contextlib
+import socket
+import argparse
+import threading
+import http.client
+from urllib.parse import urlparse
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def print_latency(title, samples):
+    print("%s: n=%d p50=%.2fms p90=%.2fms p99=%.2fms max=%.2fms" % (title, len(samples),
+        percentile(samples, 50) * 1000, percentile(samples, 90) * 1000,
+        percentile(samples, 99) * 1000, max(samples, default=0) * 1000))
+
+
+def stall_connection(host, port, hold):
+    # a peer that sends half a request and then goes quiet
+    try:
+        sock = socket.create_connection((host, port))
+        sock.sendall(b"GET /metrics HTTP/1.1\r\nHost: ")
+        time.sleep(hold)
+        sock.close()
+    except OSError:
+        pass
+
+
+def read_cpu_time(pid):
+    # user + system seconds consumed by a process, None when it can't be read
+    try:
+        with open("/proc/%d/stat" % pid) as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def scrape_worker(url, requests, keep_alive, format, encoding, samples, sizes, errors):
+    from mx_exporter.exposition import FORMATS
+    target = urlparse(url)
+    content_type = FORMATS[format][0]
+    headers = {"Accept": content_type}
+    if encoding != "identity":
+        headers["Accept-Encoding"] = encoding
+    conn = None
+    for _ in range(requests):
+        if conn is None:
+            conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        start = time.perf_counter()
+        try:
+            conn.request("GET", target.path or "/metrics", headers=headers)
+            response = conn.getresponse()
+            # http.client does not decode the content encoding, this is what went over the wire
+            body = response.read()
+            samples.append(time.perf_counter() - start)
+            sizes.append(len(body))
+            if ((response.getheader("Content-Encoding") or "identity") != encoding
+                    or response.getheader("Content-Type") != content_type):
+                errors.append(1)
+        except (OSError, http.client.HTTPException):
+            errors.append(1)
+            conn.close()
+            conn = None
+            continue
+
+        if not keep_alive or response.will_close:
+            conn.close()
+            conn = None
+
+    if conn is not None:
+        conn.close()
+
+
+def bench_scrape(args):
+    target = urlparse(args.url)
+    stallers = []
+    for _ in range(args.slow_clients):
+        t = threading.Thread(target=stall_connection, args=(target.hostname, target.port or 80, args.slow_hold), daemon=True)
+        t.start()
+        stallers.append(t)
+    time.sleep(0.1)
+
+    samples = []
+    sizes = []
+    errors = []
+    workers = [threading.Thread(target=scrape_worker, args=(args.url, args.requests, args.keep_alive, args.format, args.encoding, samples, sizes, errors))
+               for _ in range(args.concurrency)]
+
+    cpu_start = read_cpu_time(args.pid) if args.pid else None
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    cpu_end = read_cpu_time(args.pid) if args.pid else None
+
+    print("url=%s concurrency=%d requests=%d keep_alive=%d format=%s encoding=%s slow_clients=%d"
+          % (args.url, args.concurrency, args.requests, args.keep_alive, args.format, args.encoding, args.slow_clients))
+    print_latency("scrape", samples)
+    print("throughput=%.1f req/s errors=%d" % (len(samples) / elapsed if elapsed else 0, len(errors)))
+    print("wire bytes per scrape: mean=%d max=%d" % (sum(sizes) / len(sizes) if sizes else 0, max(sizes, default=0)))
+    if cpu_start is not None and cpu_end is not None and samples:
+        print("exporter cpu per scrape: %.2fms" % ((cpu_end - cpu_start) / len(samples) * 1000))
+
+
+def read_metric_ids(config_file):
+    metric_ids = []
+    with open(config_file, 'r') as file_handle:
+        for row in csv.reader(file_handle):
+            if len(row) >= 4 and not row[0].startswith('#'):
+                metric_ids.append(row[0])
+    return metric_ids
+
+
+def bench_cycle(args):
+    # the simulator is configured when the mxsml bindings are imported
+    os.environ["MXSML_SIMULATE"] = "1"
+    os.environ["MXSML_SIM_DEVICES"] = str(args.devices)
+    os.environ["MXSML_SIM_DIES"] = str(args.dies)
+    os.environ["MXSML_SIM_SGPUS"] = str(args.sgpus)
+    os.environ["MXSML_SIM_LATENCY"] = str(args.latency)
+    os.environ["MXSML_SIM_FAILURE_RATE"] = str(args.failure_rate)
+    os.environ["MXSML_SIM_HANG_DEVICES"] = args.hang_devices
+    from mx_exporter.gpu_monitor import GpuMonitor
+
+    # the monitor logs every device on every cycle
+    output = sys.stdout if args.verbose else io.StringIO()
+    with contextlib.redirect_stdout(output):
+        monitor = GpuMonitor(sample_workers=args.sample_workers, init_settle_time=0,
+            device_timeout=args.device_timeout/1000)
+        monitor.set_required_metrics(read_metric_ids(args.config_file) if args.config_file else monitor.get_supported_metrics())
+
+        samples = []
+        for _ in range(args.cycles):
+            if not args.verbose:
+                output.seek(0)
+                output.truncate()
+            # every metric is due on every measured cycle
+            monitor.next_sample_time.clear()
+            start = time.time()
+            monitor.run_cycle(start)
+            samples.append(time.time() - start)
+            if monitor.need_init:
+                monitor.initialize()
+
+    print("devices=%d dies=%d sgpus=%d latency=%gms failure_rate=%g hang_devices=%s device_timeout=%dms sample_workers=%d metrics=%d"
+          % (args.devices, args.dies, args.sgpus, args.latency, args.failure_rate, args.hang_devices or "none",
+             args.device_timeout, args.sample_workers, len(monitor.metrics_required) + len(monitor.sgpu_metrics_required)))
+    print_latency("cycle", samples)
+
+
+def bench_startup(args):
+    # the simulated driver starts enumerating on the first mxSmlInit of this process,
+    # so each run measures one initialization mode
+    os.environ["MXSML_SIMULATE"] = "1"
+    os.environ["MXSML_SIM_DEVICES"] = str(args.devices)
+    os.environ["MXSML_SIM_ENUM_TIME"] = str(args.enum_time)
+    os.environ["MXSML_SIM_LATENCY"] = str(args.latency)
+    from mx_exporter.gpu_monitor import GpuMonitor
+
+    output = sys.stdout if args.verbose else io.StringIO()
+    with contextlib.redirect_stdout(output):
+        start = time.time()
+        monitor = GpuMonitor(init_settle_time=args.settle_time, fast_init=args.fast_init)
+        elapsed = time.time() - start
+
+    found = len(monitor.native_ids) + len(monitor.pf_ids) + len(monitor.vf_ids)
+    print("devices=%d enum_time=%dms fast_init=%d settle_time=%gs"
+          % (args.devices, args.enum_time, args.fast_init, args.settle_time))
+    print("startup: %.2fs devices_found=%d%s" % (elapsed, found, "" if found == args.devices else " INCOMPLETE"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="mx-exporter benchmarks")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    scrape = commands.add_parser("scrape", help="Scrape latency under concurrent scrapers")
+    scrape.add_argument("-u", "--url", default="http://127.0.0.1:8000/metrics", help="Exporter metrics url")
+    scrape.add_argument("-n", "--concurrency", type=int, default=8, help="Concurrent scrapers")
+    scrape.add_argument("-r", "--requests", type=int, default=50, help="Requests per scraper")
+    scrape.add_argument("-k", "--keep-alive", type=int, choices=[0,1], default=1, help="Reuse the connection between requests")
+    scrape.add_argument("-f", "--format", choices=["text", "openmetrics", "protobuf"], default="text", help="Exposition format asked for by Accept, the response must use it")
+    scrape.add_argument("-e", "--encoding", choices=["identity", "gzip", "zstd"], default="identity", help="Accept-Encoding sent, the response must use it")
+    scrape.add_argument("--pid", type=int, default=0, help="Exporter process id, reports its cpu time per scrape")
+    scrape.add_argument("-s", "--slow-clients", type=int, default=0, help="Peers that open a connection and stall")
+    scrape.add_argument("--slow-hold", type=float, default=30, help="Seconds a slow peer stays stalled")
+    scrape.set_defaults(func=bench_scrape)
+
+    cycle = commands.add_parser("cycle", help="Gather cycle time against the simulated mxsml library")
+    cycle.add_argument("-d", "--devices", type=int, default=8, help="Simulated devices")
+    cycle.add_argument("--dies", type=int, default=1, help="Simulated dies per device")
+    cycle.add_argument("--sgpus", type=int, default=0, help="Simulated sgpus per device")
+    cycle.add_argument("-l", "--latency", type=float, default=0.1, help="Simulated latency of each mxsml call, unit:ms")
+    cycle.add_argument("-f", "--failure-rate", type=float, default=0, help="Probability that a device query fails")
+    cycle.add_argument("--hang-devices", default="", help="Comma separated simulated device ids whose queries block")
+    cycle.add_argument("-dt", "--device-timeout", type=int, default=0, help="Deadline of sampling one device, unit:ms")
+    cycle.add_argument("-c", "--config-file", help="Metrics config file, default: all supported metrics")
+    cycle.add_argument("-n", "--cycles", type=int, default=20, help="Gather cycles to run")
+    cycle.add_argument("-sw", "--sample-workers", type=int, default=0, help="Threads sampling devices in parallel")
+    cycle.add_argument("-v", "--verbose", action="store_true", help="Keep the monitor log")
+    cycle.set_defaults(func=bench_cycle)
+
+    startup = commands.add_parser("startup", help="Initialization time against a simulated driver enumerating devices")
+    startup.add_argument("-d", "--devices", type=int, default=8, help="Simulated devices")
+    startup.add_argument("-e", "--enum-time", type=int, default=2000, help="Time the simulated driver takes to enumerate all devices, unit:ms")
+    startup.add_argument("-l", "--latency", type=float, default=0.1, help="Simulated latency of each mxsml call, unit:ms")
+    startup.add_argument("-fi", "--fast-init", type=int, choices=[0,1], default=1, help="0/1 - Double mxSmlInit/Device number stability polling")
+    startup.add_argument("-s", "--settle-time", type=float, default=30, help="Wait between the two mxSmlInit calls of the double mxSmlInit, unit:s")
+    startup.add_argument("-v", "--verbose", action="store_true", help="Keep the monitor log")
+    startup.set_defaults(func=bench_startup)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
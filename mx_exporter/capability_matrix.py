@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+"""
+Copyright © 2025 MetaX Integrated Circuits (Shanghai) Co., Ltd. All Rights Reserved.
+
+This software and associated documentation files (hereinafter collectively referred to as
+"Software") is a proprietary commercial software developed by MetaX Integrated Circuits
+(Shanghai) Co., Ltd. and/or its affiliates (hereinafter collectively referred to as “MetaX”).
+The information presented in the Software belongs to MetaX. Without prior written permission
+from MetaX, no entity or individual has the right to obtain a copy of the Software to deal in
+the Software, including but not limited to use, copy, modify, merge, disclose, publish,
+distribute, sublicense, and/or sell copies of the Software or substantial portions of the Software.
+
+The Software is provided for reference only, without warranty of any kind, either express or
+implied, including but not limited to the warranty of merchantability, fitness for any purpose
+and/or noninfringement. In no case shall MetaX be liable for any claim, damage or other liability
+arising from, out of or in connection with the Software.
+
+If the Software need to be used in conjunction with any third-party software or open source
+software, the rights to the third-party software or open source software still belong to the
+copyright owners. For details, please refer to the respective notices or licenses. Please comply
+with the provisions of the relevant notices or licenses. If the open source software licenses
+additionally require the disposal of rights related to this Software, please contact MetaX
+immediately and obtain MetaX 's written consent.
+
+MetaX reserves the right, at its sole discretion, to change, modify, add or remove portions of the
+Software, at any time. MetaX reserves all the right for the final explanation.
+"""
+
+class Failure:
+    def __init__(self):
+        self.count = 0
+        self.backoff = 0  # seconds
+        self.retry_time = 0
+
+
+class CapabilityMatrix:
+    """Support and health of the mxsml queries behind each metric, per (device id, die id, metric id)
+
+    The die id is None for queries issued per device. A query answering not supported is
+    never issued again for that key, a failing query is retried with exponential backoff.
+    Keys start with the device id and a device is sampled by one thread at a time, so the
+    entries of a key are only touched by one thread.
+    """
+
+    def __init__(self, base_backoff, max_backoff):
+        self.base_backoff = base_backoff  # seconds
+        self.max_backoff = max_backoff  # seconds
+        self.unsupported = set()
+        # key : Failure, keys whose last query failed
+        self.failing = {}
+
+    def is_sampled(self, key, now):
+        if key in self.unsupported:
+            return False
+        failure = self.failing.get(key)
+        # half a backoff of tolerance like the metric intervals, now is the start of a cycle
+        return failure is None or now + self.base_backoff / 2 >= failure.retry_time
+
+    def is_unsupported(self, device_id, metric_id, die_ids):
+        # a metric is pruned from the plan of a device once the device or all of its dies don't support it
+        if (device_id, None, metric_id) in self.unsupported:
+            return True
+        return len(die_ids) != 0 and all((device_id, die_id, metric_id) in self.unsupported for die_id in die_ids)
+
+    def not_supported(self, key):
+        # True the first time, the caller logs it once
+        if key in self.unsupported:
+            return False
+        self.unsupported.add(key)
+        self.failing.pop(key, None)
+        return True
+
+    def failed(self, key, now):
+        failure = self.failing.get(key)
+        if failure is None:
+            failure = Failure()
+            self.failing[key] = failure
+        failure.count += 1
+        # the first retry is on the next cycle, then the wait doubles
+        failure.backoff = min(self.base_backoff * 2 ** (failure.count - 1), self.max_backoff)
+        failure.retry_time = now + failure.backoff
+        return failure
+
+    def succeeded(self, key):
+        # the failure cleared, or None when the key wasn't failing
+        return self.failing.pop(key, None)
+
+    def clear(self):
+        self.unsupported = set()
+        self.failing = {}
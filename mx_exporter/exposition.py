@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+
+"""
+Copyright © 2025 MetaX Integrated Circuits (Shanghai) Co., Ltd. All Rights Reserved.
+
+This software and associated documentation files (hereinafter collectively referred to as
+"Software") is a proprietary commercial software developed by MetaX Integrated Circuits
+(Shanghai) Co., Ltd. and/or its affiliates (hereinafter collectively referred to as “MetaX”).
+The information presented in the Software belongs to MetaX. Without prior written permission
+from MetaX, no entity or individual has the right to obtain a copy of the Software to deal in
+the Software, including but not limited to use, copy, modify, merge, disclose, publish,
+distribute, sublicense, and/or sell copies of the Software or substantial portions of the Software.
+
+The Software is provided for reference only, without warranty of any kind, either express or
+implied, including but not limited to the warranty of merchantability, fitness for any purpose
+and/or noninfringement. In no case shall MetaX be liable for any claim, damage or other liability
+arising from, out of or in connection with the Software.
+
+If the Software need to be used in conjunction with any third-party software or open source
+software, the rights to the third-party software or open source software still belong to the
+copyright owners. For details, please refer to the respective notices or licenses. Please comply
+with the provisions of the relevant notices or licenses. If the open source software licenses
+additionally require the disposal of rights related to this Software, please contact MetaX
+immediately and obtain MetaX 's written consent.
+
+MetaX reserves the right, at its sole discretion, to change, modify, add or remove portions of the
+Software, at any time. MetaX reserves all the right for the final explanation.
+"""
+
+import zlib
+import time
+import threading
+from datetime import datetime
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.openmetrics import exposition as openmetrics
+from mx_exporter import metrics_pb2
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+old_print = print
+def timestamp_print(*args, **kwargs):
+    old_print(datetime.now(), "Exposition", *args, **kwargs)
+print = timestamp_print
+
+
+CONTENT_TYPE_PROTOBUF = "application/vnd.google.protobuf; proto=io.prometheus.client.MetricFamily; encoding=delimited"
+
+
+def encode_varint(value):
+    encoded = bytearray()
+    while value > 0x7f:
+        encoded.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def protobuf_families(family):
+    # (name, metric type, value field, samples) of the protobuf families of one family
+    if family.type == "gauge":
+        yield family.name, metrics_pb2.GAUGE, "gauge", family.samples
+    elif family.type == "counter":
+        # the family name has _total stripped, _created samples have no protobuf counterpart here
+        name = family.name + "_total"
+        yield name, metrics_pb2.COUNTER, "counter", [sample for sample in family.samples if sample.name == name]
+    else:
+        # info, summary and histogram are not exported by mx-exporter, fall back to one untyped
+        # family per sample name
+        samples = {}
+        for sample in family.samples:
+            samples.setdefault(sample.name, []).append(sample)
+        for name, named_samples in samples.items():
+            yield name, metrics_pb2.UNTYPED, "untyped", named_samples
+
+
+def generate_protobuf(registry):
+    # length-delimited MetricFamily messages, families without samples are left out
+    output = []
+    for family in registry.collect():
+        for name, metric_type, field, samples in protobuf_families(family):
+            if not samples:
+                continue
+            message = metrics_pb2.MetricFamily(name=name, help=family.documentation, type=metric_type)
+            for sample in samples:
+                metric = message.metric.add()
+                for label_name, label_value in sample.labels.items():
+                    metric.label.add(name=label_name, value=label_value)
+                getattr(metric, field).value = sample.value
+                if sample.timestamp is not None:
+                    metric.timestamp_ms = int(float(sample.timestamp) * 1000)
+            body = message.SerializeToString()
+            output.append(encode_varint(len(body)))
+            output.append(body)
+    return b"".join(output)
+
+
+# exposition format : (content type, render function, trailer ending the rendered body), earlier
+# ones are preferred when a scraper accepts several with the same q value
+FORMATS = {
+    "protobuf": (CONTENT_TYPE_PROTOBUF, generate_protobuf, b""),
+    "openmetrics": (openmetrics.CONTENT_TYPE_LATEST, openmetrics.generate_latest, b"# EOF\n"),
+    "text": (CONTENT_TYPE_LATEST, generate_latest, b""),
+}
+
+
+def gzip_start(body):
+    # the member is left open, every scrape finishes a copy of the compressor with its live
+    # families, so that the body stays a single gzip member
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    return compressor.compress(body), compressor
+
+
+def gzip_finish(compressor, body):
+    compressor = compressor.copy()
+    return compressor.compress(body) + compressor.flush()
+
+
+def zstd_start(body):
+    return zstandard.ZstdCompressor(level=3).compress(body), None
+
+
+def zstd_finish(state, body):
+    # a zstd body may consist of several frames (RFC 8878), the live families get their own
+    return zstandard.ZstdCompressor(level=3).compress(body) if body else b""
+
+
+# content encoding : (compress the cached part, compress the part rendered per scrape after it),
+# earlier ones are preferred when a scraper accepts several
+ENCODINGS = {}
+if zstandard is not None:
+    ENCODINGS["zstd"] = (zstd_start, zstd_finish)
+ENCODINGS["gzip"] = (gzip_start, gzip_finish)
+
+
+class CollectedFamilies:
+    """Collector replaying the families of one collection
+
+    MxCollector drains the log monitors when it collects, so every format of a generation is
+    rendered from one collection rather than collecting again per format.
+    """
+
+    def __init__(self, families):
+        self.families = list(families)
+
+    def collect(self):
+        return iter(self.families)
+
+
+class Exposition:
+    """Rendered cycle families of one generation, a part is never modified after creation
+
+    Parts leave out the trailer of their format, the families rendered per scrape follow them.
+    """
+
+    __slots__ = ("generation", "timestamp", "families", "parts", "lock")
+
+    def __init__(self, generation, families):
+        self.generation = generation
+        self.timestamp = time.time()
+        self.families = families
+        # (format, content encoding) : part, every format and encoding is produced once per generation
+        self.parts = {}
+        # reentrant, compressing a body renders its format first
+        self.lock = threading.RLock()
+
+    def part(self, format, encoding=None):
+        # (body, compressor state to finish it with), the state is None without content encoding
+        key = (format, encoding)
+        part = self.parts.get(key)
+        if part is None:
+            # concurrent scrapes of a new generation wait for one rendering or compression instead
+            # of each producing the same body
+            with self.lock:
+                part = self.parts.get(key)
+                if part is None:
+                    if encoding is None:
+                        _, render, trailer = FORMATS[format]
+                        body = render(self.families)
+                        part = (body[:len(body) - len(trailer)], None)
+                    else:
+                        part = ENCODINGS[encoding][0](self.part(format)[0])
+                    self.parts[key] = part
+        return part
+
+
+class ExpositionCache:
+    """/metrics of the latest generation, a generation is any value that changes with the samples
+
+    Families collected from the samples of a gather cycle are rendered and compressed once per
+    generation: with pre-rendering by the gather thread every cycle, otherwise by the first scrape
+    seeing a new generation. Families computed at scrape time, like sample ages, are rendered by
+    every scrape and appended, so that they keep moving while the gather thread stalls.
+    """
+
+    def __init__(self, collect_cycle, collect_live, generation_func, prerender=0):
+        self.collect_cycle = collect_cycle
+        self.collect_live = collect_live
+        self.generation_func = generation_func
+        self.prerender = prerender
+        self.exposition = None
+        self.lock = threading.Lock()
+
+    def render(self, generation=None):
+        # called from the gather thread once per cycle with pre-rendering, otherwise under self.lock
+        start = time.time()
+        if generation is None:
+            generation = self.generation_func()
+        exposition = Exposition(generation, CollectedFamilies(self.collect_cycle()))
+        if self.prerender:
+            exposition.part("text")
+            # formats and encodings scraped from the last generation are produced here rather
+            # than by the first scrape of this one
+            if self.exposition is not None:
+                for format, encoding in list(self.exposition.parts):
+                    exposition.part(format, encoding)
+        self.exposition = exposition
+        print("Render generation %s: %s in %.3fs" % (generation,
+            ", ".join("%s%s %d bytes" % (format, "" if encoding is None else "/" + encoding, len(body))
+                      for (format, encoding), (body, _) in exposition.parts.items()) or "collected", time.time() - start))
+        return exposition
+
+    def get(self):
+        exposition = self.exposition
+        if self.prerender and exposition is not None:
+            return exposition
+
+        generation = self.generation_func()
+        if exposition is None or exposition.generation != generation:
+            with self.lock:
+                exposition = self.exposition
+                if exposition is None or exposition.generation != generation:
+                    exposition = self.render(generation)
+        return exposition
+
+    def body(self, format, encoding=None):
+        # the live families follow the cached cycle part and carry the trailer of the format
+        body, state = self.get().part(format, encoding)
+        live_body = FORMATS[format][1](CollectedFamilies(self.collect_live()))
+        if encoding is not None:
+            live_body = ENCODINGS[encoding][1](state, live_body)
+        return body + live_body
+
+
+def parse_accept(header):
+    # (lower-cased value, {parameter: value}, q value) of every item of an Accept style header
+    items = []
+    for item in (header or "").split(","):
+        value, *params = item.split(";")
+        q = 1.0
+        parameters = {}
+        for param in params:
+            key, _, param_value = param.partition("=")
+            key = key.strip().lower()
+            param_value = param_value.strip().strip('"')
+            if key == "q":
+                try:
+                    q = float(param_value)
+                except ValueError:
+                    q = 0.0
+            else:
+                parameters[key] = param_value
+        items.append((value.strip().lower(), parameters, q))
+    return items
+
+
+def accepted_format(media_type, parameters):
+    if media_type == "application/vnd.google.protobuf":
+        if (parameters.get("proto") == "io.prometheus.client.MetricFamily"
+                and parameters.get("encoding") == "delimited"):
+            return "protobuf"
+    elif media_type == "application/openmetrics-text":
+        if parameters.get("version", "1.0.0").startswith("1."):
+            return "openmetrics"
+    elif media_type in ("text/plain", "text/*", "*/*"):
+        return "text"
+    return None
+
+
+def choose_format(accept):
+    # format with the highest q value in Accept, ties go to the order of FORMATS, scrapers that
+    # accept none of them get the classic text format
+    accepted = {}
+    for media_type, parameters, q in parse_accept(accept):
+        format = accepted_format(media_type, parameters)
+        if format is not None:
+            accepted[format] = max(q, accepted.get(format, 0.0))
+
+    chosen = "text"
+    chosen_q = 0.0
+    for format in FORMATS:
+        q = accepted.get(format, 0.0)
+        if q > chosen_q:
+            chosen = format
+            chosen_q = q
+    return chosen
+
+
+def choose_encoding(accept_encoding):
+    # encoding with the highest q value in Accept-Encoding, ties go to the order of ENCODINGS,
+    # None sends the body as is
+    accepted = {}
+    for name, _, q in parse_accept(accept_encoding):
+        accepted[name] = q
+
+    chosen = None
+    chosen_q = 0.0
+    for encoding in ENCODINGS:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > chosen_q:
+            chosen = encoding
+            chosen_q = q
+    return chosen
@@ -30,10 +30,15 @@ Software, at any time. MetaX reserves all the right for the final explanation.
 import time
 import threading
 from functools import partial
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 from datetime import datetime
 from copy import deepcopy
+from types import MappingProxyType
 
 from mx_exporter.mxsml_function import *
+from mx_exporter.sample_store import SampleStore
+from mx_exporter.capability_matrix import CapabilityMatrix
+from mx_exporter.inventory_cache import InventoryCache
 
 
 old_print = print
@@ -43,7 +48,7 @@ print = timestamp_print
 
 
 class Metric:
-    def __init__(self, id, for_native, for_pf, for_vf, for_sgpu, for_mxn, for_mxc, func):
+    def __init__(self, id, for_native, for_pf, for_vf, for_sgpu, for_mxn, for_mxc, func, prefetch=None):
         self.id = id
         self.for_native = for_native
         self.for_pf = for_pf
@@ -52,6 +57,9 @@ class Metric:
         self.for_mxn = for_mxn
         self.for_mxc = for_mxc
         self.func = func
+        # runs once per device before the metric functions when any due metric declares it,
+        # server metrics declaring one have it run on the native devices
+        self.prefetch = prefetch
 
 
 class DeviceInfo:
@@ -81,14 +89,77 @@ class ServerInfo:
         self.conn_status = conn_status
 
 
+class PlanStep:
+    """One call of a compiled sampling plan, run when any of its metrics is due"""
+
+    __slots__ = ("function", "args", "metric_ids")
+
+    def __init__(self, function, args, metric_ids):
+        self.function = function  # called as function(device id, *args)
+        self.args = args
+        self.metric_ids = metric_ids
+
+
+class Quarantine:
+    def __init__(self, task, backoff):
+        # future of the sampling task which missed its deadline, it may still be blocked in the driver
+        self.task = task
+        self.backoff = backoff  # seconds
+        self.retry_time = time.time() + backoff
+
+
+class Snapshot:
+    """Samples of one gather cycle published by GpuMonitor
+
+    The monitor never modifies the maps of a published snapshot, it builds new ones for the
+    next cycle, and samples are frozen SampleStore copies, so readers can hold on to a
+    snapshot as long as they like without any lock.
+    """
+
+    def __init__(self, generation, topology_generation, sgpu_generation, gpu_data, sgpu_data, server_data,
+            device_info_map, bdf_device_map, all_sgpu_info, sgpu_pod_uuid_map, device_sample_time):
+        self.generation = generation
+        # bumped when devices are rediscovered
+        self.topology_generation = topology_generation
+        # bumped when sgpus or their pod register ids change
+        self.sgpu_generation = sgpu_generation
+        self.timestamp = time.time()
+        # SampleFrame keyed by device id or (device id, die id)
+        self.gpu_data = gpu_data
+        # SampleFrame keyed by (device id, sgpu id)
+        self.sgpu_data = sgpu_data
+        # metric id : value
+        self.server_data = MappingProxyType(server_data)
+        # (device id, die id) : device info
+        self.device_info_map = MappingProxyType(device_info_map)
+        # bdfid : device id
+        self.bdf_device_map = MappingProxyType(bdf_device_map)
+        # (device id, sgpu id) : MxSmlSgpuInfo()
+        self.all_sgpu_info = MappingProxyType(all_sgpu_info)
+        # (device id, sgpu id) : pod_register_uuid
+        self.sgpu_pod_uuid_map = MappingProxyType(sgpu_pod_uuid_map)
+        # device id : time its samples were last completed
+        self.device_sample_time = MappingProxyType(device_sample_time)
+
+
 class GpuMonitor:
-    def __init__(self, gather_interval = 10):
-        self.init_members(gather_interval)
+    def __init__(self, gather_interval = 10, sample_workers = 0, init_settle_time = 30, device_timeout = 0, fast_init = 0,
+            inventory_cache = ""):
+        self.init_members(gather_interval, sample_workers, init_settle_time, device_timeout, fast_init, inventory_cache)
         self.initialize()
         self.generate_supported_metrics()
 
 
-    def start(self, metrics_required):
+    def start(self, metrics_required, metric_intervals = None):
+        self.set_required_metrics(metrics_required, metric_intervals)
+
+        t = threading.Thread(target=self.monitor, args=(), daemon=True)
+        t.start()
+
+
+    def set_required_metrics(self, metrics_required, metric_intervals = None):
+        if metric_intervals is None:
+            metric_intervals = {}
         for metric_id in metrics_required:
             if metric_id not in self.metrics_supported:
                 print("Skip not support metric %s" % metric_id)
@@ -98,26 +169,31 @@ class GpuMonitor:
                 else:
                     self.metrics_required_original.append(metric_id)
 
+                if metric_id in metric_intervals:
+                    self.metric_intervals[metric_id] = metric_intervals[metric_id]
+                    print("Metric %s sampling interval %.3fs" % (metric_id, metric_intervals[metric_id]))
+
         self.metrics_required = deepcopy(self.metrics_required_original)
 
-        t = threading.Thread(target=self.monitor, args=(), daemon=True)
-        t.start()
+        # sgpus are rediscovered on each pass, so sgpu metrics share the shortest sgpu interval
+        if len(self.sgpu_metrics_required) != 0:
+            self.sgpu_interval = min(self.get_metric_interval(metric_id) for metric_id in self.sgpu_metrics_required)
+
+        # the loop wakes up at the shortest interval and samples the metrics which are due
+        self.tick_interval = min([self.gather_interval] + list(self.metric_intervals.values()))
+        self.plan_stale = True
 
 
     def monitor(self):
         while True:
             start = time.time()
 
-            self.monitor_native_devices()
-            self.monitor_pf_devices()
-            self.monitor_vf_devices()
-            self.monitor_sgpu_devices()
-            self.monitor_server()
+            self.run_cycle(start)
 
             elapsed_time = time.time() - start
 
-            if elapsed_time < self.gather_interval:
-                time.sleep(self.gather_interval - elapsed_time)
+            if elapsed_time < self.tick_interval:
+                time.sleep(self.tick_interval - elapsed_time)
             else:
                 print("error elapsed_time %d" % elapsed_time)
 
@@ -125,45 +201,65 @@ class GpuMonitor:
                 self.initialize()
 
 
-    def get_server_data(self):
-        with self.lock:
-            data = deepcopy(self.server_data)
-        return data
+    def run_cycle(self, start):
+        self.begin_device_cycle(start)
+        self.sample_devices([(self.sample_native_device, id) for id in self.native_ids]
+            + [(self.sample_pf_device, id) for id in self.pf_ids]
+            + [(self.sample_vf_device, id) for id in self.vf_ids])
+
+        self.monitor_sgpu_devices(start)
+        self.monitor_server()
+        self.recover_devices(start)
+        self.publish_snapshot()
+        self.notify_cycle_listeners()
+
 
+    def register_cycle_listener(self, listener):
+        self.cycle_listeners.append(listener)
 
-    def get_gpu_data(self):
-        with self.lock:
-            data = deepcopy(self.gpu_data)
-        return data
 
+    def notify_cycle_listeners(self):
+        for listener in self.cycle_listeners:
+            try:
+                listener()
+            except Exception as e:
+                print("Cycle listener exception: %s" % (e))
 
-    def get_sgpu_data(self):
-        with self.lock:
-            data = deepcopy(self.sgpu_data)
-        return data
+
+    def get_snapshot(self):
+        return self.snapshot
+
+
+    def publish_snapshot(self):
+        # only the gather thread writes the maps below, and it replaces rather than modifies
+        # any map once it has been published, so a reference swap hands the cycle over
+        self.generation += 1
+        self.snapshot = Snapshot(self.generation, self.topology_generation, self.sgpu_generation,
+            self.gpu_store.freeze(), self.sgpu_store.freeze(), self.server_data,
+            self.device_info_map, self.bdf_device_map, self.all_sgpu_info, self.sgpu_pod_uuid_map,
+            dict(self.device_sample_time))
 
 
     def update_server_data(self, metric_id, data):
-        with self.lock:
-            self.server_data[metric_id] = data
+        self.server_data[metric_id] = data
 
 
+    # each device key is written by a single sampling task, scrapes only see frozen copies,
+    # tasks abandoned at their deadline may return late and must not write any more
     def update_die_data(self, device_id, die_id, metric_id, data):
-        with self.lock:
-            self.gpu_data[(device_id, die_id)][metric_id] = data
+        if device_id in self.abandoned_devices:
+            return
+        self.gpu_store.write((device_id, die_id), metric_id, data)
 
 
     def update_gpu_data(self, device_id, metric_id, data):
-        with self.lock:
-            self.gpu_data[device_id][metric_id] = data
+        if device_id in self.abandoned_devices:
+            return
+        self.gpu_store.write(device_id, metric_id, data)
 
 
     def update_sgpu_data(self, device_id, sgpu_id, metric_id, data):
-        with self.lock:
-            if (device_id, sgpu_id) not in self.sgpu_data:
-                self.sgpu_data[(device_id, sgpu_id)] = ({metric_id : data})
-            else:
-                self.sgpu_data[(device_id, sgpu_id)].update({metric_id : data})
+        self.sgpu_store.write((device_id, sgpu_id), metric_id, data)
 
 
     def generate_supported_metrics(self):
@@ -172,42 +268,75 @@ class GpuMonitor:
                or (self.product == "MXC" and metric.for_mxc == 1):
                 self.metrics_supported.append(metric_id)
 
-    def remove_notsupported_metrics(self, metric_id):
-        if metric_id in self.metrics_required:
-            print("Remove not supported metric %s" % metric_id)
-            self.metrics_required.remove(metric_id)
+    def is_sampled(self, device_id, die_id, metric_id):
+        return self.capability_matrix.is_sampled((device_id, die_id, metric_id), self.cycle_start)
 
-    def get_supported_metrics(self):
-        return self.metrics_supported
+    def sampled_dies(self, device_id, metric_id):
+        return [die_id for die_id in self.get_device_die_range(device_id)
+            if self.capability_matrix.is_sampled((device_id, die_id, metric_id), self.cycle_start)]
+
+    def check_result(self, ret, query, device_id, die_id, metric_id):
+        # records the result in the capability matrix, True when the query succeeded
+        key = (device_id, die_id, metric_id)
+        where = "GPU#%d" % device_id if die_id is None else "GPU#%d die %d" % (device_id, die_id)
+        if ret == MxSmlReturn.MXSML_Success:
+            if self.capability_matrix.succeeded(key) is not None:
+                print("%s for %s %s recovered" % (query, where, metric_id))
+            return True
 
-    def get_device_info_map(self):
-        return self.device_info_map
+        if ret == MxSmlReturn.MXSML_OperationNotSupport:
+            if self.capability_matrix.not_supported(key):
+                print("%s for %s not supported, stop sampling %s there" % (query, where, metric_id))
+                self.plan_stale = True
+            return False
 
-    def get_sgpu_info_dict(self):
-        return self.all_sgpu_info, self.sgpu_pod_uuid_map
+        failure = self.capability_matrix.failed(key, self.cycle_start)
+        print("%s for %s %s failed: %s, retry in %.0fs" % (query, where, metric_id,
+            mxsml_get_error_string(ret), failure.backoff))
+        return False
 
-    def get_bdf_device_map(self):
-        return self.bdf_device_map
+    def get_supported_metrics(self):
+        return self.metrics_supported
 
     def initialize(self):
         self.clear()
 
+        if self.fast_init:
+            self.fast_init_handshake()
+        else:
+            self.init_handshake()
+
+        self.need_init = False
+        self.metrics_required = deepcopy(self.metrics_required_original)
+        self.next_sample_time.clear()
+        self.find_all_devices()
+        self.plan_stale = True
+        # devices count as sampled when found, quarantined devices age from here on
+        now = time.time()
+        self.device_sample_time = {id: now for id in self.native_ids + self.pf_ids + self.vf_ids}
+        self.topology_generation += 1
+        self.publish_snapshot()
+
+    def init_handshake(self):
+        # device count must be equal across two mxSmlInit calls init_settle_time apart
         while True:
             ret = mxsml_init()
             if ret != MxSmlReturn.MXSML_Success:
                 print("first mxSmlInit failed: %s" % (mxsml_get_error_string(ret)))
-                time.sleep(30)
+                time.sleep(self.init_settle_time)
             else:
                 print("first mxSmlInit success")
+                for wrapper, function in get_mxsml_capabilities()["call_paths"].items():
+                    print("mxsml call path %s -> %s" % (wrapper, function))
                 gpu_num1 = mxSmlGetDeviceCount()
                 print("Device number1: %d" % (gpu_num1))
 
-                time.sleep(30)
+                time.sleep(self.init_settle_time)
 
                 ret = mxsml_init()
                 if ret != MxSmlReturn.MXSML_Success:
                     print("second mxSmlInit failed: %s" % (mxsml_get_error_string(ret)))
-                    time.sleep(30)
+                    time.sleep(self.init_settle_time)
                 else:
                     print("second mxSmlInit success")
                     gpu_num2 = mxSmlGetDeviceCount()
@@ -217,76 +346,282 @@ class GpuMonitor:
                         break
                     else:
                         print("initialize failed, gpu number is not equal")
-                        time.sleep(30)
+                        time.sleep(self.init_settle_time)
+
+    def fast_init_handshake(self):
+        # poll mxSmlInit and the device count until a non-zero count holds for init_stable_time,
+        # polls are init_poll_min apart while devices are still showing up and back off up to
+        # init_poll_max while waiting for the count to hold or for mxSmlInit to succeed.
+        # A zero count may be a driver that has not enumerated yet, it has to hold for
+        # init_settle_time as in the legacy handshake, then the exporter runs without devices
+        delay = self.init_poll_min
+        gpu_num = None
+        stable_since = 0
+        polls = 0
+        start = time.time()
+        while True:
+            ret = mxsml_init()
+            now = time.time()
+            if ret != MxSmlReturn.MXSML_Success:
+                print("mxSmlInit failed: %s, retry in %.1fs" % (mxsml_get_error_string(ret), delay))
+                gpu_num = None
+                time.sleep(delay)
+                delay = min(delay * 2, self.init_poll_max)
+                continue
 
-        self.need_init = False
-        self.metrics_required = deepcopy(self.metrics_required_original)
-        self.find_all_devices()
+            count = mxSmlGetDeviceCount()
+            if count != gpu_num:
+                if gpu_num is None:
+                    print("mxSmlInit success")
+                    for wrapper, function in get_mxsml_capabilities()["call_paths"].items():
+                        print("mxsml call path %s -> %s" % (wrapper, function))
+                print("Device number: %d" % (count))
+                gpu_num = count
+                stable_since = now
+                polls = 1
+                delay = self.init_poll_min
+            else:
+                polls += 1
+                stable_time = self.init_stable_time if gpu_num > 0 else self.init_settle_time
+                if polls >= 3 and now - stable_since >= stable_time:
+                    print("initialize success in %.1fs" % (now - start))
+                    break
+                delay = min(delay * 2, self.init_poll_max)
+            time.sleep(delay)
 
+    # maps shared with published snapshots are replaced, not cleared
     def clear(self):
-        self.gpu_data.clear()
+        self.gpu_store = SampleStore()
         self.native_ids.clear()
         self.pf_ids.clear()
         self.vf_ids.clear()
-        self.bdf_device_map.clear()
-        self.device_info_map.clear()
+        self.bdf_device_map = {}
+        self.device_info_map = {}
         self.metrics_required.clear()
+        self.memory_info_map.clear()
+        self.mxlk_info.clear()
+        self.pcie_info.clear()
+        self.pcie_bridge_info.clear()
+        self.device_sample_time = {}
+        self.failed_devices.clear()
+        self.inventory_suspect = False
+        # device ids may change, everything is probed again
+        self.capability_matrix.clear()
+        buffer_arena.release()
         self.clear_sgpu()
         self.clear_server_data()
+        # scrapes during re-initialization see no devices rather than stale ones, the maps
+        # above are filled in place by find_all_devices so they can't be published yet
+        self.generation += 1
+        self.topology_generation += 1
+        self.snapshot = Snapshot(self.generation, self.topology_generation, self.sgpu_generation,
+            self.gpu_store.freeze(), self.sgpu_store.freeze(), {}, {}, {}, {}, {}, {})
 
     def clear_sgpu(self): # sgpu is dynamic
-        self.sgpu_data.clear()
-        self.all_sgpu_info.clear()
-        self.sgpu_pod_uuid_map.clear()
+        self.sgpu_store = SampleStore()
+        self.all_sgpu_info = {}
+        self.sgpu_pod_uuid_map = {}
         self.sgpu_memory_info.clear()
 
     def clear_server_data(self):
-        self.server_data.clear()
+        self.server_data = {}
         self.mxlk_status = 1
 
-    def monitor_native_devices(self):
-        for id in self.native_ids:
-            print("Get data GPU#%d " %(id))
-            self.get_memory_info(id)
-            self.get_pcie_info(id)
-            self.get_pcie_bridge_info(id)
-            self.get_mxlk_info(id)
+    def get_metric_interval(self, metric_id):
+        return self.metric_intervals.get(metric_id, self.gather_interval)
+
+
+    def is_due(self, key, interval, now):
+        # half a tick of tolerance so that timer jitter doesn't postpone a metric by a whole tick
+        if self.next_sample_time.get(key, 0) - now > self.tick_interval / 2:
+            return False
+
+        self.next_sample_time[key] = now + interval
+        return True
+
+
+    def begin_device_cycle(self, now):
+        # metrics found not supported while devices are sampled leave the plan from the next cycle on
+        self.cycle_start = now
+        if self.plan_stale:
+            self.compile_sampling_plan()
+        # metrics which are not due keep their previous samples in the store
+        self.cycle_metrics = frozenset(metric_id for metric_id in self.metrics_required
+            if self.is_due(metric_id, self.get_metric_interval(metric_id), now))
+        # tasks abandoned by the deadline only query quarantined devices, which are skipped
+        # until their task is done, so no late result leaks into the new cycle
+        query_cache.clear()
+
+
+    def compile_sampling_plan(self):
+        # all devices of a kind share the steps compiled for it
+        plans = {kind: self.compile_steps(self.metrics_required, kind) for kind in ("for_native", "for_pf", "for_vf")}
+        sampling_plan = {}
+        for kind, ids in [("for_native", self.native_ids), ("for_pf", self.pf_ids), ("for_vf", self.vf_ids)]:
+            for id in ids:
+                sampling_plan[id] = self.prune_steps(id, plans[kind])
+        self.sampling_plan = sampling_plan
+        self.sgpu_plan = self.compile_steps(self.sgpu_metrics_required, "for_sgpu")
+        self.plan_stale = False
+        print("Compiled sampling plan: %d native, %d pf, %d vf, %d sgpu steps" % (len(plans["for_native"]),
+            len(plans["for_pf"]), len(plans["for_vf"]), len(self.sgpu_plan)))
+
+
+    def compile_steps(self, metric_ids, kind):
+        # prefetches come first, each once with every metric declaring it, then the metric
+        # functions in config order
+        prefetch = {}
+        steps = []
+        for metric_id in metric_ids:
+            metric = self.metric_map[metric_id]
+            for_kind = getattr(metric, kind) == 1
+            # server metrics declaring a prefetch have it run on the native devices
+            is_server_metric = not (metric.for_native or metric.for_pf or metric.for_vf or metric.for_sgpu)
+            if metric.prefetch is not None and (for_kind or (is_server_metric and kind == "for_native")):
+                prefetch.setdefault(metric.prefetch, []).append(metric_id)
+            if for_kind:
+                steps.append(PlanStep(metric.func, (metric_id,), (metric_id,)))
+
+        return tuple([PlanStep(function, (), tuple(ids)) for function, ids in prefetch.items()] + steps)
+
+
+    def prune_steps(self, device_id, steps):
+        # drops the metrics the device doesn't support, and prefetches no metric needs any more
+        die_ids = self.get_device_die_range(device_id)
+        unsupported = set(metric_id for step in steps for metric_id in step.metric_ids
+            if self.capability_matrix.is_unsupported(device_id, metric_id, die_ids))
+        if len(unsupported) == 0:
+            return steps
+
+        print("GPU#%d doesn't support %s" % (device_id, ", ".join(sorted(unsupported))))
+        pruned = []
+        for step in steps:
+            metric_ids = tuple(metric_id for metric_id in step.metric_ids if metric_id not in unsupported)
+            if len(metric_ids) != 0:
+                pruned.append(PlanStep(step.function, step.args, metric_ids))
+        return tuple(pruned)
+
+
+    def run_plan(self, id, steps):
+        cycle_metrics = self.cycle_metrics
+        for step in steps:
+            if not cycle_metrics.isdisjoint(step.metric_ids):
+                step.function(id, *step.args)
+
+
+    def sample_devices(self, tasks):
+        if self.device_timeout > 0:
+            self.sample_devices_with_deadline(tasks)
+            return
+
+        if self.sample_executor is None or len(tasks) <= 1:
+            for task, id in tasks:
+                task(id)
+                self.device_sampled(id, time.time())
+            return
+
+        futures = [(self.sample_executor.submit(task, id), id) for task, id in tasks]
+        for future, id in futures:
+            future.result()
+            self.device_sampled(id, time.time())
+
+
+    def device_sampled(self, id, now):
+        # a device that failed keeps its last sample time, probe_device() may drop its samples
+        if id not in self.failed_devices:
+            self.device_sample_time[id] = now
+
 
-            for metric_id in self.metrics_required:
-                if self.metric_map[metric_id].for_native == 1:
-                    self.metric_map[metric_id].func(id, metric_id)
+    def sample_devices_with_deadline(self, tasks):
+        # a call blocked in the driver can't be interrupted, so the deadline applies to the
+        # sampling task of each device: a task which overruns it is left behind, its device
+        # is quarantined and the cycle goes on with the other devices
+        now = time.time()
+        queued = [(task, id) for task, id in reversed(tasks) if not self.is_quarantined(id, now)]
+        # future : (device id, time the task started)
+        running = {}
+        while queued or running:
+            while queued and len(running) < self.sample_workers:
+                task, id = queued.pop()
+                running[self.start_device_task(task, id)] = (id, time.time())
 
+            done, _ = wait(running, timeout=self.device_timeout / 4, return_when=FIRST_COMPLETED)
+            now = time.time()
+            for future in done:
+                id, _ = running.pop(future)
+                future.result()
+                self.device_sampled(id, now)
+                self.release_quarantine(id)
 
-    def monitor_pf_devices(self):
-        for id in self.pf_ids:
-            print("Get data GPU#%d" %(id))
-            self.get_pcie_info(id)
-            self.get_pcie_bridge_info(id)
+            for future, (id, start) in list(running.items()):
+                if now - start > self.device_timeout:
+                    del running[future]
+                    self.quarantine_device(id, future)
 
-            for metric_id in self.metrics_required:
-                if self.metric_map[metric_id].for_pf == 1:
-                    self.metric_map[metric_id].func(id, metric_id)
 
+    def start_device_task(self, task, id):
+        # one daemon thread per task instead of the worker pool, a thread blocked in the
+        # driver must neither hold a pool worker nor keep the exporter from exiting
+        future = Future()
+        def run():
+            try:
+                task(id)
+                future.set_result(None)
+            except BaseException as e:
+                future.set_exception(e)
+        threading.Thread(target=run, name="mx-sample-%d" % id, daemon=True).start()
+        return future
 
-    def monitor_vf_devices(self):
-        for id in self.vf_ids:
-            print("Get data VGPU#%d" %(id))
-            self.get_memory_info(id)
 
-            for metric_id in self.metrics_required:
-                if self.metric_map[metric_id].for_vf == 1:
-                    self.metric_map[metric_id].func(id, metric_id)
+    def is_quarantined(self, id, now):
+        quarantine = self.quarantine.get(id)
+        if quarantine is None:
+            return False
+        # never sample a device while its abandoned task may still hold the driver
+        return not quarantine.task.done() or now < quarantine.retry_time
 
 
-    def monitor_sgpu_devices(self):
+    def quarantine_device(self, id, task):
+        quarantine = self.quarantine.get(id)
+        backoff = self.gather_interval * 2
+        if quarantine is not None:
+            backoff = min(quarantine.backoff * 2, self.gather_interval * 32)
+        print("Device %d sampling exceeded %.3fs, quarantined, retry in %.0fs" % (id, self.device_timeout, backoff))
+        self.quarantine[id] = Quarantine(task, backoff)
+        self.abandoned_devices.add(id)
+        task.add_done_callback(lambda _: self.abandoned_devices.discard(id))
+
+
+    def release_quarantine(self, id):
+        if self.quarantine.pop(id, None) is not None:
+            print("Device %d sampled in time, released from quarantine" % id)
+
+
+    def sample_native_device(self, id):
+        print("Get data GPU#%d " %(id))
+        self.run_plan(id, self.sampling_plan.get(id, ()))
+
+
+    def sample_pf_device(self, id):
+        print("Get data GPU#%d" %(id))
+        self.run_plan(id, self.sampling_plan.get(id, ()))
+
+
+    def sample_vf_device(self, id):
+        print("Get data VGPU#%d" %(id))
+        self.run_plan(id, self.sampling_plan.get(id, ()))
+
+
+    def monitor_sgpu_devices(self, now):
+        if len(self.sgpu_metrics_required) == 0 or not self.is_due("sgpu", self.sgpu_interval, now):
+            return
+
         self.clear_sgpu()
-        sgpu_memory_toggle = 0
-        if any(map(lambda metric: metric in self.sgpu_metrics_required,
-            ['sgpu_memory_total', 'sgpu_memory_used', 'sgpu_memory_free'])):
-            sgpu_memory_toggle = 1
 
         if len(self.sgpu_metrics_required) != 0:
             for id in self.native_ids:
+                if id in self.quarantine:
+                    continue
                 sgpu_count = mxsml_get_sgpu_count(id)
                 if sgpu_count == -1 or sgpu_count == 0:
                     # Skip if the version of mxsmlBindings.py and libmxsml.so is too low for sgpu mode
@@ -294,52 +629,106 @@ class GpuMonitor:
 
                 print("Get sgpu data GPU#%d(sgpu count:%d)" %(id, sgpu_count))
                 self.get_sgpu_info(id, sgpu_count)
-                if sgpu_memory_toggle:
-                    self.get_sgpu_memory_info(id)
+                # the sgpu pass has a single interval, all of its steps are due together
+                for step in self.sgpu_plan:
+                    step.function(id, *step.args)
 
-                for metric_id in self.sgpu_metrics_required:
-                    self.metric_map[metric_id].func(id, metric_id)
+        sgpu_signature = tuple((key, info.uuid, info.minor, self.sgpu_pod_uuid_map.get(key))
+            for key, info in self.all_sgpu_info.items())
+        if sgpu_signature != self.sgpu_signature:
+            self.sgpu_signature = sgpu_signature
+            self.sgpu_generation += 1
 
     def monitor_server(self):
         server_metrics = ['server_info', 'server_conn_status']
 
         is_required = False
         for metric_id in server_metrics:
-            if metric_id in self.metrics_required:
+            if metric_id in self.cycle_metrics:
                 is_required = True
                 break
 
         if not is_required:
             return
 
+        self.server_data = dict(self.server_data)
         ret = self.get_server_info()
         if ret != MxSmlReturn.MXSML_Success:
             return
 
         for metric_id in server_metrics:
-            if metric_id in self.metrics_required:
+            if metric_id in self.cycle_metrics:
                 self.metric_map[metric_id].func(metric_id)
 
         self.mxlk_status = 1 # init in each period
 
 
-    def init_members(self, gather_interval):
+    def init_members(self, gather_interval, sample_workers, init_settle_time, device_timeout, fast_init, inventory_cache):
         self.server_data = {}
 
-        # (device id, die id) : {metric id : value}
-        self.gpu_data = {}
-
-        # (device id, sgpu id) : {metric id : value}
-        self.sgpu_data = {}
-
-        self.lock = threading.Lock()
+        # samples keyed by device id or (device id, die id)
+        self.gpu_store = SampleStore()
+        # required metrics due in the running cycle, frozen at its start
+        self.cycle_metrics = frozenset()
+        self.cycle_start = 0
+        # support and health of the queries per (device id, die id, metric id), failing
+        # queries are retried after one gather interval, then the wait doubles
+        self.capability_matrix = CapabilityMatrix(gather_interval, gather_interval * 32)
+        # device id : tuple of PlanStep, compiled from the required metrics and the devices found
+        self.sampling_plan = {}
+        self.sgpu_plan = ()
+        # set when the required metrics or the devices change, the plan is compiled again
+        # before the next cycle
+        self.plan_stale = True
+
+        # samples keyed by (device id, sgpu id)
+        self.sgpu_store = SampleStore()
+
+        # latest published cycle, readers take the reference and never copy it
+        self.generation = 0
+        self.snapshot = None
+        self.topology_generation = 0
+        self.sgpu_generation = 0
+        self.sgpu_signature = ()
+
+        # callables invoked by the gather thread after each cycle
+        self.cycle_listeners = []
 
         self.metrics_supported = []  # supported metrics per product
         self.metrics_required_original = [] # store original required metrics, must not update
-        self.metrics_required = []  # user required metrics, remove if not support
+        self.metrics_required = []  # user required metrics, support per device is in capability_matrix
         self.sgpu_metrics_required = []  # user required sgpu metrics
 
         self.gather_interval = gather_interval  # seconds
+        self.init_settle_time = init_settle_time  # seconds, wait between the two mxSmlInit calls
+        # poll the device count until it is stable instead of the two mxSmlInit calls
+        self.fast_init = fast_init
+        self.init_poll_min = 0.1  # seconds, poll delay of fast init while the device count changes
+        self.init_poll_max = 3.2  # seconds, poll delay cap of fast init
+        self.init_stable_time = 1  # seconds, device count must hold this long in fast init
+        # set from the brand of device 0 when devices are found, a node without devices keeps MXC
+        self.product = "MXC"
+        self.tick_interval = gather_interval  # seconds, shortest sampling interval of all metrics
+        self.sgpu_interval = gather_interval  # seconds
+        # metric id : sampling interval in seconds, metrics not listed use gather_interval
+        self.metric_intervals = {}
+        # metric id : next time the metric is due
+        self.next_sample_time = {}
+
+        # fan device sampling out to a worker pool, 0 or 1 samples devices one after another
+        self.sample_executor = None
+        self.sample_workers = max(sample_workers, 1)
+        if sample_workers > 1:
+            self.sample_executor = ThreadPoolExecutor(max_workers=self.sample_workers, thread_name_prefix="mx-sample")
+
+        # seconds a device sampling task may take, 0 waits for devices however long they take
+        self.device_timeout = device_timeout
+        # device id : time its sampling task completed last
+        self.device_sample_time = {}
+        # device id : Quarantine, devices whose sampling task missed the deadline
+        self.quarantine = {}
+        # devices whose abandoned task is still running, their late samples are dropped
+        self.abandoned_devices = set()
 
         # store device ids
         self.native_ids = []
@@ -352,15 +741,25 @@ class GpuMonitor:
         self.device_info_map = {}
         # device id : die count
         self.device_die_count_map = {}
+        # device and pf numbers found by the last initialization
+        self.device_count = 0
+        self.pf_count = 0
+        # devices with a failed query since their last recovery, written by sampling tasks
+        self.failed_devices = set()
+        # a node level query failed, the device numbers are checked again
+        self.inventory_suspect = False
+        # die counts, versions and topology of the last initialization, reused after a restart
+        self.inventory_cache = InventoryCache(inventory_cache) if inventory_cache else None
         # server mxlk status, 1 - health, 0 - unhealthy, set as 0 if any mxlk link is abnormal
         # need initialized with 1 in each period
         self.mxlk_status = 1
 
-        # store device info each time to avoid calling apis repeatedly
-        self.memory_info_map = {} # {die_id : MxSmlMemoryInfo()}
-        self.mxlk_info = MxSmlMetaXLinkInfo()
-        self.pcie_info = MxSmlPcieInfo()
-        self.pcie_bridge_info = MxSmlPcieInfo()
+        # store device info each time to avoid calling apis repeatedly, kept per device so
+        # that devices can be sampled concurrently
+        self.memory_info_map = {} # {device_id : {die_id : MxSmlMemoryInfo()}}
+        self.mxlk_info = {} # {device_id : MxSmlMetaXLinkInfo()}
+        self.pcie_info = {} # {device_id : MxSmlPcieInfo()}
+        self.pcie_bridge_info = {} # {device_id : MxSmlPcieInfo()}
         self.all_sgpu_info = {} # { (device_id, sgpu_id) : MxSmlSgpuInfo() }
         self.sgpu_pod_uuid_map = {} # { (device_id, sgpu_id) : pod_register_uuid }
         self.sgpu_memory_info = {} # { (device_id, sgpu_id) : MxSmlSgpuMemoryInfo() }
@@ -379,9 +778,9 @@ class GpuMonitor:
             "gpu_usage"    : Metric("gpu_usage",     1, 1, 1, 0, 0, 1, partial(self.get_gpu_usage, MxSmlUsageIp.MXSML_Usage_Xcore)),
             "vpue_usage"   : Metric("vpue_usage",    1, 1, 1, 0, 1, 1, partial(self.get_gpu_usage, MxSmlUsageIp.MXSML_Usage_Vpue)),
             "vpud_usage"   : Metric("vpud_usage",    1, 1, 1, 0, 1, 1, partial(self.get_gpu_usage, MxSmlUsageIp.MXSML_Usage_Vpud)),
-            "memory_usage" : Metric("memory_usage",  1, 0, 1, 0, 1, 1, self.get_memory_usage),
-            "memory_total" : Metric("memory_total",  1, 0, 1, 0, 1, 1, self.get_memory_total),
-            "memory_used"  : Metric("memory_used",   1, 0, 1, 0, 1, 1, self.get_memory_used),
+            "memory_usage" : Metric("memory_usage",  1, 0, 1, 0, 1, 1, self.get_memory_usage, self.get_memory_info),
+            "memory_total" : Metric("memory_total",  1, 0, 1, 0, 1, 1, self.get_memory_total, self.get_memory_info),
+            "memory_used"  : Metric("memory_used",   1, 0, 1, 0, 1, 1, self.get_memory_used, self.get_memory_info),
             # Power
             "board_power"  : Metric("board_power",   1, 1, 0, 0, 1, 1, self.get_board_power),
             "pmbus_power"  : Metric("pmbus_power",   1, 1, 0, 0, 1, 1, self.get_pmbus_power),
@@ -401,12 +800,12 @@ class GpuMonitor:
             "dla_dpm_level"  : Metric("dla_dpm_level",   1, 1, 0, 0, 1, 0, partial(self.get_dpm_level, MxSmlDpmIp.MXSML_Dpm_Dla)),
             "xcore_dpm_level": Metric("xcore_dpm_level", 1, 1, 0, 0, 0, 1, partial(self.get_dpm_level, MxSmlDpmIp.MXSML_Dpm_Xcore)),
             # pcie and mxlk info
-            "pcie_speed"        : Metric("pcie_speed",        1, 1, 0, 0, 1, 1, self.get_pcie_speed),
-            "pcie_width"        : Metric("pcie_width",        1, 1, 0, 0, 1, 1, self.get_pcie_width),
-            "pcie_bridge_speed" : Metric("pcie_bridge_speed", 1, 1, 0, 0, 1, 1, self.get_pcie_bridge_speed),
-            "pcie_bridge_width" : Metric("pcie_bridge_width", 1, 1, 0, 0, 1, 1, self.get_pcie_bridge_width),
-            "mxlk_speed"        : Metric("mxlk_speed",        1, 0, 0, 0, 0, 1, self.get_mxlk_speed),
-            "mxlk_width"        : Metric("mxlk_width",        1, 0, 0, 0, 0, 1, self.get_mxlk_width),
+            "pcie_speed"        : Metric("pcie_speed",        1, 1, 0, 0, 1, 1, self.get_pcie_speed, self.get_pcie_info),
+            "pcie_width"        : Metric("pcie_width",        1, 1, 0, 0, 1, 1, self.get_pcie_width, self.get_pcie_info),
+            "pcie_bridge_speed" : Metric("pcie_bridge_speed", 1, 1, 0, 0, 1, 1, self.get_pcie_bridge_speed, self.get_pcie_bridge_info),
+            "pcie_bridge_width" : Metric("pcie_bridge_width", 1, 1, 0, 0, 1, 1, self.get_pcie_bridge_width, self.get_pcie_bridge_info),
+            "mxlk_speed"        : Metric("mxlk_speed",        1, 0, 0, 0, 0, 1, self.get_mxlk_speed, self.get_mxlk_info),
+            "mxlk_width"        : Metric("mxlk_width",        1, 0, 0, 0, 0, 1, self.get_mxlk_width, self.get_mxlk_info),
             "mxlk_traffic_total_bytes" : Metric("mxlk_traffic_total_bytes", 1, 0, 0, 0, 0, 1, self.get_mxlk_traffic_total_bytes),
             "mxlk_aer_count"           : Metric("mxlk_aer_count",           1, 0, 0, 0, 0, 1, self.get_mxlk_aer_count),
             "topo_info"    : Metric("topo_info",     0, 0, 0, 0, 0, 1, self.get_topo_info),
@@ -421,33 +820,42 @@ class GpuMonitor:
             # sgpu info
             "sgpu_compute_quota" : Metric("sgpu_compute_quota",  0, 0, 0, 1, 0, 1, self.get_sgpu_compute_quota),
             "sgpu_usage"         : Metric("sgpu_usage",          0, 0, 0, 1, 0, 1, self.get_sgpu_usage),
-            "sgpu_memory_total"  : Metric("sgpu_memory_total",   0, 0, 0, 1, 0, 1, self.get_sgpu_memory_total),
-            "sgpu_memory_used"   : Metric("sgpu_memory_used",    0, 0, 0, 1, 0, 1, self.get_sgpu_memory_used),
-            "sgpu_memory_free"   : Metric("sgpu_memory_free",    0, 0, 0, 1, 0, 1, self.get_sgpu_memory_free),
+            "sgpu_memory_total"  : Metric("sgpu_memory_total",   0, 0, 0, 1, 0, 1, self.get_sgpu_memory_total, self.get_sgpu_memory_info),
+            "sgpu_memory_used"   : Metric("sgpu_memory_used",    0, 0, 0, 1, 0, 1, self.get_sgpu_memory_used, self.get_sgpu_memory_info),
+            "sgpu_memory_free"   : Metric("sgpu_memory_free",    0, 0, 0, 1, 0, 1, self.get_sgpu_memory_free, self.get_sgpu_memory_info),
             # server info
             "server_info"        : Metric("server_info",        0, 0, 0, 0, 0, 1, self.get_server_uuid),
-            "server_conn_status" : Metric("server_conn_status", 0, 0, 0, 0, 0, 1, self.get_server_conn_status),
+            "server_conn_status" : Metric("server_conn_status", 0, 0, 0, 0, 0, 1, self.get_server_conn_status, self.get_mxlk_info),
             # pcie event aer_ue/aer_ce/synfld/dbe/mmio
             "pci_event"  : Metric("pci_event",   1, 1, 0, 0, 0, 1, self.get_pci_event),
             # ras
             "ras_count"  : Metric("ras_count",   1, 1, 0, 0, 0, 1, self.get_ras_count),
-            "ras_status" : Metric("ras_status",  1, 1, 0, 0, 0, 1, self.get_ras_status)
+            "ras_status" : Metric("ras_status",  1, 1, 0, 0, 0, 1, self.get_ras_status),
+            # seconds since the device was sampled completely, computed when exported
+            "sample_age" : Metric("sample_age",  0, 0, 0, 0, 1, 1, None)
         }
 
 
     def find_all_devices(self):
         gpu_num = mxSmlGetDeviceCount()
         print("mxSmlGetDeviceCount number: %d" % (gpu_num))
+        self.device_count = gpu_num
 
         if gpu_num > 64:
             self.need_init = True
             return
 
+        if self.inventory_cache is not None:
+            # one live query validates the cache, the boot id and device BDFs are checked by it
+            driver_version = self.get_version(0, 0, MxSmlVersionUnit.MXSML_Version_Driver) if gpu_num > 0 else ""
+            self.inventory_cache.load(driver_version)
+
         for gpu_id in range(0, gpu_num):
             self.get_device_base_info(gpu_id)
 
         pf_num = mxSmlGetPfDeviceCount()
         print("mxSmlGetPfDeviceCount number: %d" %(pf_num))
+        self.pf_count = pf_num
 
         if pf_num > 16:
             self.need_init = True
@@ -456,6 +864,77 @@ class GpuMonitor:
         for gpu_id in range(100, 100+pf_num):
             self.get_device_base_info(gpu_id)
 
+        if self.inventory_cache is not None:
+            self.inventory_cache.save()
+
+
+    def device_failed(self, device_id):
+        self.failed_devices.add(device_id)
+
+
+    def recover_devices(self, now):
+        # a failed query only re-probes its device, the node is initialized again only when
+        # the device inventory changed
+        if not self.failed_devices and not self.inventory_suspect:
+            return
+
+        self.inventory_suspect = False
+        gpu_num = mxSmlGetDeviceCount()
+        pf_num = mxSmlGetPfDeviceCount()
+        if gpu_num != self.device_count or pf_num != self.pf_count:
+            print("Device number changed from %d/%d to %d/%d, initialize again"
+                % (self.device_count, self.pf_count, gpu_num, pf_num))
+            self.need_init = True
+            return
+
+        for device_id in sorted(self.failed_devices):
+            # a task abandoned at its deadline may still hold the driver for this device
+            if self.is_quarantined(device_id, now):
+                continue
+            if self.probe_device(device_id):
+                self.failed_devices.discard(device_id)
+            if self.need_init:
+                return
+
+
+    def probe_device(self, device_id):
+        device_info = MxSmlDeviceInfo()
+        ret = mxSmlGetDeviceInfo(device_id, byref(device_info))
+        if ret != MxSmlReturn.MXSML_Success:
+            # the device is still there but not answering, its samples are dropped rather
+            # than exported stale and it is probed again after the next cycle
+            print("Device %d probe failed: %s" % (device_id, mxsml_get_error_string(ret)))
+            self.gpu_store.invalidate(device_id)
+            return False
+
+        ret, die_count = mxsml_get_device_die_count(device_id)
+        known = self.device_info_map.get((device_id, 0))
+        if known is None or known.bdfid != device_info.bdfId.decode('ASCII') \
+                or known.uuid != device_info.uuid.decode('ASCII') \
+                or (ret == MxSmlReturn.MXSML_Success and die_count != self.device_die_count_map.get(device_id)):
+            print("Device %d changed, initialize again" % (device_id))
+            self.need_init = True
+            return False
+
+        # static info of the device is queried again, cached device data is fetched again
+        # by the next cycle
+        device_info_map = dict(self.device_info_map)
+        for die_id in self.get_device_die_range(device_id):
+            device_info_map[(device_id, die_id)] = DeviceInfo(
+                device_info,
+                self.get_version(device_id, die_id, MxSmlVersionUnit.MXSML_Version_Driver),
+                self.get_version(device_id, die_id, MxSmlVersionUnit.MXSML_Version_Bios),
+                *self.get_topo_info(device_id, die_id),
+            )
+        if any(vars(device_info_map[key]) != vars(self.device_info_map[key]) for key in device_info_map):
+            self.device_info_map = device_info_map
+            self.topology_generation += 1
+        for info_map in [self.memory_info_map, self.mxlk_info, self.pcie_info, self.pcie_bridge_info]:
+            info_map.pop(device_id, None)
+
+        print("Device %d recovered" % (device_id))
+        return True
+
 
     def get_device_base_info(self, gpu_id):
         device_info = MxSmlDeviceInfo()
@@ -472,20 +951,45 @@ class GpuMonitor:
         else:
             self.vf_ids.append(gpu_id)
 
+        bdf = device_info.bdfId.decode('ASCII')
+        self.bdf_device_map[bdf] = gpu_id
+
+        entry = None
+        if self.inventory_cache is not None:
+            entry = self.inventory_cache.get(bdf, device_info.uuid.decode('ASCII'))
+        if entry is not None:
+            self.device_die_count_map[gpu_id] = len(entry["dies"])
+            for die_id, (driver_version, bios_version, topo_id, socket_id) in enumerate(entry["dies"]):
+                self.device_info_map[(device_info.deviceId, die_id)] = DeviceInfo(
+                    device_info, driver_version, bios_version, topo_id, socket_id, die_id)
+                self.set_product_type(device_info.brand)
+            return
+
         ret, die_count = mxsml_get_device_die_count(gpu_id)
         if ret != MxSmlReturn.MXSML_Success:
             print("mxSmlGetDeviceDieCount for GPU#%d failed: %s" % (gpu_id, mxsml_get_error_string(ret)))
             die_count = 0
         self.device_die_count_map[gpu_id] = die_count
 
-        self.bdf_device_map[device_info.bdfId.decode('ASCII')] = gpu_id
-        self.gpu_data[gpu_id] = {}
-
         for die_id in range(0, die_count):
-            self.gpu_data[(gpu_id, die_id)] = {}
             self.store_device_info(device_info, die_id)
             self.set_product_type(device_info.brand)
 
+        if self.inventory_cache is not None:
+            self.cache_device_info(device_info, die_count)
+
+
+    def cache_device_info(self, device_info, die_count):
+        # failed queries are not cached, they are retried by the next initialization
+        dies = []
+        for die_id in range(0, die_count):
+            info = self.device_info_map[(device_info.deviceId, die_id)]
+            if info.driver_version == 'unknown' or info.bios_version == 'unknown' or info.topo_id == -1:
+                return
+            dies.append([info.driver_version, info.bios_version, info.topo_id, info.socket_id])
+        if dies:
+            self.inventory_cache.put(info.bdfid, {"uuid": info.uuid, "dies": dies})
+
 
     def set_product_type(self, device_brand):
         if device_brand == MxSmlDeviceBrand.MXSML_Brand_N:
@@ -525,43 +1029,42 @@ class GpuMonitor:
 
 
     def get_memory_info(self, device_id):
-        self.memory_info_map.clear()
-        if any(map(lambda metric: metric in self.metrics_required, ['memory_usage', 'memory_total', 'memory_used'])):
-            for die_id in self.get_device_die_range(device_id):
-                ret, info = mxsml_get_die_memory_info(device_id, die_id)
-                if ret != MxSmlReturn.MXSML_Success:
-                    print("mxSmlGetMemoryInfo failed: %s" % (mxsml_get_error_string(ret)))
-                    self.need_init = True
-                    break
-                self.memory_info_map[die_id] = info
+        memory_info_map = {}
+        self.memory_info_map[device_id] = memory_info_map
+        for die_id in self.get_device_die_range(device_id):
+            ret, info = query_cache.call(mxsml_get_die_memory_info, device_id, die_id)
+            if ret != MxSmlReturn.MXSML_Success:
+                print("mxSmlGetMemoryInfo failed: %s" % (mxsml_get_error_string(ret)))
+                self.device_failed(device_id)
+                break
+            memory_info_map[die_id] = info
 
 
     def get_pcie_info(self, id):
-        if any(map(lambda metric: metric in self.metrics_required, ['pcie_speed', 'pcie_width'])):
-            ret = mxSmlGetPcieInfo(id, byref(self.pcie_info))
-            if ret != MxSmlReturn.MXSML_Success:
-                print("mxSmlGetPcieInfo failed: %s" % (mxsml_get_error_string(ret)))
-                self.need_init = True
+        ret, pcie_info = query_cache.call(mxsml_get_device_pcie_info, id)
+        self.pcie_info[id] = pcie_info
+        if ret != MxSmlReturn.MXSML_Success:
+            print("mxSmlGetPcieInfo failed: %s" % (mxsml_get_error_string(ret)))
+            self.device_failed(id)
 
 
     def get_pcie_bridge_info(self, id):
-        if any(map(lambda metric: metric in self.metrics_required, ['pcie_bridge_speed', 'pcie_bridge_width'])):
-            ret = mxSmlGetPcieMaxLinkInfo(id, byref(self.pcie_bridge_info))
-            if ret != MxSmlReturn.MXSML_Success:
-                print("mxSmlGetPcieMaxLinkInfo failed: %s" % (mxsml_get_error_string(ret)))
-                self.need_init = True
+        ret, pcie_bridge_info = query_cache.call(mxsml_get_device_pcie_max_link_info, id)
+        self.pcie_bridge_info[id] = pcie_bridge_info
+        if ret != MxSmlReturn.MXSML_Success:
+            print("mxSmlGetPcieMaxLinkInfo failed: %s" % (mxsml_get_error_string(ret)))
+            self.device_failed(id)
 
 
     def get_mxlk_info(self, device_id):
-        if any(map(lambda metric: metric in self.metrics_required, ['mxlk_speed', 'mxlk_width', 'server_conn_status'])):
-            ret, mxlk_info = mxsml_get_device_metaxlink_info(device_id)
-            if ret != MxSmlReturn.MXSML_Success:
-                print("mxSmlGetMetaXLinkInfo failed: %s" % (mxsml_get_error_string(ret)))
-                self.need_init = True
-                self.mxlk_status = 0
-            else:
-                self.mxlk_info = mxlk_info
-                self.check_mxlk_status(mxlk_info)
+        ret, mxlk_info = query_cache.call(mxsml_get_device_metaxlink_info, device_id)
+        if ret != MxSmlReturn.MXSML_Success:
+            print("mxSmlGetMetaXLinkInfo failed: %s" % (mxsml_get_error_string(ret)))
+            self.device_failed(device_id)
+            self.mxlk_status = 0
+        else:
+            self.mxlk_info[device_id] = mxlk_info
+            self.check_mxlk_status(mxlk_info)
 
 
     def check_mxlk_status(self, mxlk_info):
@@ -576,65 +1079,54 @@ class GpuMonitor:
 
     def get_temperature(self, sensor, device_id, metric_id):
         if(sensor == MxSmlTemperatureSensors.MXSML_Temperature_Soc):
-            ret, temp = mxsml_get_device_temperature_info(device_id, sensor)
-            if ret != MxSmlReturn.MXSML_Success:
-                print("mxSmlGetTemperatureInfo for sensor %d failed: %s" % (sensor, mxsml_get_error_string(ret)))
-            else:
+            if not self.is_sampled(device_id, None, metric_id):
+                return
+            ret, temp = query_cache.call(mxsml_get_device_temperature_info, device_id, sensor)
+            if self.check_result(ret, "mxSmlGetTemperatureInfo", device_id, None, metric_id):
                 self.update_gpu_data(device_id, metric_id, temp/100)
             return
 
-        for die_id in self.get_device_die_range(device_id):
-            ret, temp = mxsml_get_die_temperature_info(device_id, die_id, sensor)
-            if ret != MxSmlReturn.MXSML_Success:
-                if ret == MxSmlReturn.MXSML_OperationNotSupport:
-                    self.remove_notsupported_metrics(metric_id)
-                else:
-                    print("mxSmlGetTemperatureInfo for sensor %d failed: %s" % (sensor, mxsml_get_error_string(ret)))
-            else:
+        for die_id in self.sampled_dies(device_id, metric_id):
+            ret, temp = query_cache.call(mxsml_get_die_temperature_info, device_id, die_id, sensor)
+            if self.check_result(ret, "mxSmlGetTemperatureInfo", device_id, die_id, metric_id):
                 self.update_die_data(device_id, die_id, metric_id, temp/100)
 
 
     def get_om_temperature(self, device_id, metric_id):
-        entryList = []
-        omInfo = (MxSmlOpticalModuleStatus*3)(*entryList)
-        omInfoSize = c_uint(3)
-        ret = mxSmlGetOpticalModuleStatus(device_id, omInfo, byref(omInfoSize))
-        if ret == MxSmlReturn.MXSML_Success:
+        if not self.is_sampled(device_id, None, metric_id):
+            return
+        ret, omInfo, omInfoSize = query_cache.call(mxsml_get_device_optical_module_status, device_id)
+        if self.check_result(ret, "mxSmlGetOpticalModuleStatus", device_id, None, metric_id):
             data = {}
-            for i in range(omInfoSize.value):
+            for i in range(omInfoSize):
                 data[i] = omInfo[i].temperature/100
             self.update_gpu_data(device_id, metric_id, data)
-        elif ret == MxSmlReturn.MXSML_OperationNotSupport:
-            self.remove_notsupported_metrics(metric_id)
-        else:
-            print("mxSmlGetOpticalModuleStatus failed: %s" % (mxsml_get_error_string(ret)))
-            self.need_init = True
+        elif ret != MxSmlReturn.MXSML_OperationNotSupport:
+            self.device_failed(device_id)
 
 
     # All native, pf and vf devices can access GPU usage
     def get_gpu_usage(self, ip, device_id, metric_id):
         if ip in [MxSmlUsageIp.MXSML_Usage_Dla, MxSmlUsageIp.MXSML_Usage_G2d]:
-            ret, usage = mxsml_get_device_ip_usage(device_id, ip)
-            if ret != MxSmlReturn.MXSML_Success:
-                print("mxSmlGetDeviceIpUsage for %d failed: %s" % (ip, mxsml_get_error_string(ret)))
-                self.need_init = True
-            else:
+            if not self.is_sampled(device_id, None, metric_id):
+                return
+            ret, usage = query_cache.call(mxsml_get_device_ip_usage, device_id, ip)
+            if self.check_result(ret, "mxSmlGetDeviceIpUsage", device_id, None, metric_id):
                 self.update_gpu_data(device_id, metric_id, usage)
+            elif ret != MxSmlReturn.MXSML_OperationNotSupport:
+                self.device_failed(device_id)
             return
 
-        for die_id in self.get_device_die_range(device_id):
-            ret, usage = mxsml_get_die_ip_usage(device_id, die_id, ip)
-            if ret == MxSmlReturn.MXSML_Success:
+        for die_id in self.sampled_dies(device_id, metric_id):
+            ret, usage = query_cache.call(mxsml_get_die_ip_usage, device_id, die_id, ip)
+            if self.check_result(ret, "mxSmlGetDeviceIpUsage", device_id, die_id, metric_id):
                 self.update_die_data(device_id, die_id, metric_id, usage)
-            elif ret == MxSmlReturn.MXSML_OperationNotSupport:
-                self.remove_notsupported_metrics(metric_id)
-            else:
-                print("mxSmlGetDeviceIpUsage for %d failed: %s" % (ip, mxsml_get_error_string(ret)))
-                self.need_init = True
+            elif ret != MxSmlReturn.MXSML_OperationNotSupport:
+                self.device_failed(device_id)
 
 
     def get_memory_usage(self, device_id, metric_id):
-        for die_id, memory_info in self.memory_info_map.items():
+        for die_id, memory_info in self.memory_info_map.get(device_id, {}).items():
             data = {"vram":0, "xtt":0}
             if memory_info.vramTotal != 0:
                 data["vram"] = memory_info.vramUse*100/memory_info.vramTotal
@@ -646,12 +1138,12 @@ class GpuMonitor:
 
 
     def get_memory_total(self, device_id, metric_id):
-        for die_id, memory_info in self.memory_info_map.items():
+        for die_id, memory_info in self.memory_info_map.get(device_id, {}).items():
             self.update_die_data(device_id, die_id, metric_id, {"vram":memory_info.vramTotal, "xtt":memory_info.xttTotal})
 
 
     def get_memory_used(self, device_id, metric_id):
-        for die_id, memory_info in self.memory_info_map.items():
+        for die_id, memory_info in self.memory_info_map.get(device_id, {}).items():
             self.update_die_data(device_id, die_id, metric_id, {"vram":memory_info.vramUse, "xtt":memory_info.xttUse})
 
 
@@ -666,27 +1158,25 @@ class GpuMonitor:
                 (MxSmlPmbusUnit.MXSML_Pmbus_Hbm2, "hbm2"),
                 (MxSmlPmbusUnit.MXSML_Pmbus_Pcie2, "pcie2")
             ]:
-                ret, pmbusPowerInfo = mxsml_get_die_pmbus_info(device_id, die_id, unit)
-                if ret == MxSmlReturn.MXSML_Success:
-                    data[name] = pmbusPowerInfo.power
-                elif ret == MxSmlReturn.MXSML_OperationNotSupport:
+                # boards populate different rails, so each unit has its own entry
+                unit_id = "%s_%s" % (metric_id, name)
+                if not self.is_sampled(device_id, die_id, unit_id):
                     continue
-                else:
-                    print("mxSmlGetPmbusInfo for unit %d failed: %s" % (unit, mxsml_get_error_string(ret)))
+                ret, pmbusPowerInfo = query_cache.call(mxsml_get_die_pmbus_info, device_id, die_id, unit)
+                if self.check_result(ret, "mxSmlGetPmbusInfo", device_id, die_id, unit_id):
+                    data[name] = pmbusPowerInfo.power
+            if data:
                 self.update_die_data(device_id, die_id, metric_id, data)
 
 
     def get_board_power(self, device_id, metric_id):
-        entryBoardInfo = []
-        boardPowerInfo = (MxSmlBoardWayElectricInfo* 3)(*entryBoardInfo)
-        BoardWaySize = c_uint(3)
-        ret = mxSmlGetBoardPowerInfo(device_id, byref(BoardWaySize), boardPowerInfo)
-        if ret != MxSmlReturn.MXSML_Success:
-            print("mxSmlGetBoardElectricInfo failed: %s" % (mxsml_get_error_string(ret)))
-        else:
+        if not self.is_sampled(device_id, None, metric_id):
+            return
+        ret, boardPowerInfo, BoardWaySize = query_cache.call(mxsml_get_device_board_power_info, device_id)
+        if self.check_result(ret, "mxSmlGetBoardPowerInfo", device_id, None, metric_id):
             i = 0
             power_total = 0
-            while i < BoardWaySize.value:
+            while i < BoardWaySize:
                 power_total += boardPowerInfo[i].power
                 i += 1
             self.update_gpu_data(device_id, metric_id, power_total)
@@ -694,21 +1184,17 @@ class GpuMonitor:
 
     def get_clocks(self, ip, device_id, metric_id):
         if ip in [MxSmlClockIp.MXSML_Clock_Dla, MxSmlClockIp.MXSML_Clock_G2D]:
-            ret, clocksMhz = mxsml_get_device_clocks(device_id, ip)
-            if ret != MxSmlReturn.MXSML_Success:
-                print("mxSmlGetClocks for ip %d failed: %s" % (ip, mxsml_get_error_string(ret)))
-            else:
+            if not self.is_sampled(device_id, None, metric_id):
+                return
+            ret, clocksMhz = query_cache.call(mxsml_get_device_clocks, device_id, ip)
+            if self.check_result(ret, "mxSmlGetClocks", device_id, None, metric_id):
                 self.update_gpu_data(device_id, metric_id, clocksMhz[0])
             return
 
-        for die_id in self.get_device_die_range(device_id):
-            ret, clocksMhz = mxsml_get_die_clocks(device_id, die_id, ip)
-            if ret == MxSmlReturn.MXSML_Success:
+        for die_id in self.sampled_dies(device_id, metric_id):
+            ret, clocksMhz = query_cache.call(mxsml_get_die_clocks, device_id, die_id, ip)
+            if self.check_result(ret, "mxSmlGetClocks", device_id, die_id, metric_id):
                 self.update_die_data(device_id, die_id, metric_id, clocksMhz[0])
-            elif ret == MxSmlReturn.MXSML_OperationNotSupport:
-                self.remove_notsupported_metrics(metric_id)
-            else:
-                print("mxSmlGetClocks for ip %d failed: %s" % (ip, mxsml_get_error_string(ret)))
 
 
     def get_mem_clock(self, device_id, metric_id):
@@ -720,142 +1206,130 @@ class GpuMonitor:
 
 
     def get_pcie_throughput(self, device_id, metric_id):
-        pcieThroughput = MxSmlPcieThroughput()
-        ret = mxSmlGetPcieThroughput(device_id, byref(pcieThroughput))
-        if ret != MxSmlReturn.MXSML_Success:
-            print("mxSmlGetPcieThroughput failed: %s" % mxsml_get_error_string(ret))
-        else:
+        if not self.is_sampled(device_id, None, metric_id):
+            return
+        ret, pcieThroughput = query_cache.call(mxsml_get_device_pcie_throughput, device_id)
+        if self.check_result(ret, "mxSmlGetPcieThroughput", device_id, None, metric_id):
             self.update_gpu_data(device_id, metric_id, {"tx":pcieThroughput.tx, "rx":pcieThroughput.rx})
 
 
     def get_mxlk_bandwidth(self, device_id, metric_id):
+        if not self.is_sampled(device_id, None, metric_id):
+            return
         data = {"rx":{}, "tx":{}}
         for typeCode, typeName in [(MxSmlMetaXLinkType.MXSML_MetaXLink_Input, "rx"), (MxSmlMetaXLinkType.MXSML_MetaXLink_Target, "tx")]:
-            ret, linkSize, mxlkBw = mxsml_get_device_metaxlink_bandwidth(device_id, typeCode)
-            if ret == MxSmlReturn.MXSML_Success:
-                targetData = data[typeName]
-                for i in range(linkSize):
-                    targetData[i + 1] = mxlkBw[i].requestBandwidth
-
-            elif ret == MxSmlReturn.MXSML_OperationNotSupport:
-                self.remove_notsupported_metrics(metric_id)
+            ret, linkSize, mxlkBw = query_cache.call(mxsml_get_device_metaxlink_bandwidth, device_id, typeCode)
+            if not self.check_result(ret, "mxSmlGetMetaXLinkBandwidth", device_id, None, metric_id):
+                if ret != MxSmlReturn.MXSML_OperationNotSupport:
+                    self.device_failed(device_id)
                 return
 
-            else:
-                print("mxSmlGetMetaXLinkBandwidth failed: %s" % mxsml_get_error_string(ret))
-                self.need_init = True
-                return
+            targetData = data[typeName]
+            for i in range(linkSize):
+                targetData[i + 1] = mxlkBw[i].requestBandwidth
 
         self.update_gpu_data(device_id, metric_id, data)
 
 
     def get_mxlk_traffic_total_bytes(self, device_id, metric_id):
+        if not self.is_sampled(device_id, None, metric_id):
+            return
         data = {"rx":{}, "tx":{}}
         for typeCode, typeName in [(MxSmlMetaXLinkType.MXSML_MetaXLink_Input, "rx"), (MxSmlMetaXLinkType.MXSML_MetaXLink_Target, "tx")]:
-            ret, linkSize, mxlkTrafficStats = mxsml_get_device_metaxlink_traffic_stat(device_id, typeCode)
-            if ret == MxSmlReturn.MXSML_Success:
-                targetData = data[typeName]
-                for i in range(linkSize):
-                    targetData[i + 1] = mxlkTrafficStats[i].requestTrafficStat
-
-            elif ret == MxSmlReturn.MXSML_OperationNotSupport:
-                self.remove_notsupported_metrics(metric_id)
+            ret, linkSize, mxlkTrafficStats = query_cache.call(mxsml_get_device_metaxlink_traffic_stat, device_id, typeCode)
+            if not self.check_result(ret, "mxSmlGetMetaXLinkTrafficStat", device_id, None, metric_id):
+                if ret != MxSmlReturn.MXSML_OperationNotSupport:
+                    self.device_failed(device_id)
                 return
 
-            else:
-                print("mxSmlGetMetaXLinkTrafficStat failed: %s" % mxsml_get_error_string(ret))
-                self.need_init = True
-                return
+            targetData = data[typeName]
+            for i in range(linkSize):
+                targetData[i + 1] = mxlkTrafficStats[i].requestTrafficStat
 
         self.update_gpu_data(device_id, metric_id, data)
 
 
     def get_mxlk_aer_count(self, device_id, metric_id):
+        if not self.is_sampled(device_id, None, metric_id):
+            return
         data = {"ce":{}, "ue":{}}
-        ret, linkSize, mxlkAer = mxsml_get_device_metaxlink_aer(device_id)
-        if ret == MxSmlReturn.MXSML_Success:
-            for i in range(linkSize):
-                data["ce"][i + 1] = mxlkAer[i].ceAer
-                data["ue"][i + 1] = mxlkAer[i].ueAer
-
-        elif ret == MxSmlReturn.MXSML_OperationNotSupport:
-            self.remove_notsupported_metrics(metric_id)
+        ret, linkSize, mxlkAer = query_cache.call(mxsml_get_device_metaxlink_aer, device_id)
+        if not self.check_result(ret, "mxSmlGetMetaXLinkAer", device_id, None, metric_id):
+            if ret != MxSmlReturn.MXSML_OperationNotSupport:
+                self.device_failed(device_id)
             return
 
-        else:
-            print("mxSmlGetMetaXLinkAer failed: %s" % mxsml_get_error_string(ret))
-            self.need_init = True
-            return
+        for i in range(linkSize):
+            data["ce"][i + 1] = mxlkAer[i].ceAer
+            data["ue"][i + 1] = mxlkAer[i].ueAer
 
         self.update_gpu_data(device_id, metric_id, data)
 
 
     def get_hbm_throughput(self, device_id, metric_id):
-        for die_id in self.get_device_die_range(device_id):
-            hbmThroughput = MxSmlHbmBandwidth()
-            ret = mxSmlGetDieHbmBandWidth(device_id, die_id, byref(hbmThroughput))
-            if ret != MxSmlReturn.MXSML_Success:
-                print("mxSmlGetHbmBandWidth failed: %s" % mxsml_get_error_string(ret))
-            else:
+        for die_id in self.sampled_dies(device_id, metric_id):
+            ret, hbmThroughput = query_cache.call(mxsml_get_die_hbm_bandwidth, device_id, die_id)
+            if self.check_result(ret, "mxSmlGetHbmBandWidth", device_id, die_id, metric_id):
                 self.update_die_data(device_id, die_id, metric_id, hbmThroughput.hbmBandwidthRespTotal)
 
 
     def get_dpm_level(self, ip, device_id, metric_id):
         if ip == MxSmlDpmIp.MXSML_Dpm_Dla:
-            ret, dpmLevel = mxsml_get_device_current_dpm_ip_perf_level(device_id, ip)
-            if ret != MxSmlReturn.MXSML_Success:
-                if ret != MxSmlReturn.MXSML_OperationNotSupport:
-                    print("mxSmlGetCurrentDpmIpPerfLevel failed: " + mxsml_get_error_string(ret))
-            else:
+            if not self.is_sampled(device_id, None, metric_id):
+                return
+            ret, dpmLevel = query_cache.call(mxsml_get_device_current_dpm_ip_perf_level, device_id, ip)
+            if self.check_result(ret, "mxSmlGetCurrentDpmIpPerfLevel", device_id, None, metric_id):
                 self.update_gpu_data(device_id, metric_id, dpmLevel)
             return
 
-        for die_id in self.get_device_die_range(device_id):
-            ret, dpmLevel = mxsml_get_die_current_dpm_ip_perf_level(device_id, die_id, ip)
-            if ret != MxSmlReturn.MXSML_Success:
-                if ret != MxSmlReturn.MXSML_OperationNotSupport:
-                    print("mxSmlGetCurrentDpmIpPerfLevel failed: " + mxsml_get_error_string(ret))
-            else:
+        for die_id in self.sampled_dies(device_id, metric_id):
+            ret, dpmLevel = query_cache.call(mxsml_get_die_current_dpm_ip_perf_level, device_id, die_id, ip)
+            if self.check_result(ret, "mxSmlGetCurrentDpmIpPerfLevel", device_id, die_id, metric_id):
                 self.update_die_data(device_id, die_id, metric_id, dpmLevel)
 
 
     def get_pcie_speed(self, device_id, metric_id):
-        self.update_gpu_data(device_id, metric_id, self.pcie_info.speed)
+        if device_id in self.pcie_info:
+            self.update_gpu_data(device_id, metric_id, self.pcie_info[device_id].speed)
 
     def get_pcie_width(self, device_id, metric_id):
-        self.update_gpu_data(device_id, metric_id, self.pcie_info.width)
+        if device_id in self.pcie_info:
+            self.update_gpu_data(device_id, metric_id, self.pcie_info[device_id].width)
 
     def get_pcie_bridge_speed(self, device_id, metric_id):
-        self.update_gpu_data(device_id, metric_id, self.pcie_bridge_info.speed)
+        if device_id in self.pcie_bridge_info:
+            self.update_gpu_data(device_id, metric_id, self.pcie_bridge_info[device_id].speed)
 
     def get_pcie_bridge_width(self, device_id, metric_id):
-        self.update_gpu_data(device_id, metric_id, self.pcie_bridge_info.width)
+        if device_id in self.pcie_bridge_info:
+            self.update_gpu_data(device_id, metric_id, self.pcie_bridge_info[device_id].width)
 
     def get_mxlk_speed(self, device_id, metric_id):
+        if device_id not in self.mxlk_info:
+            return
         data = {}
         for idx in range(METAX_LINK_NUM):
-            data[idx+1] = self.mxlk_info.speed[idx]
+            data[idx+1] = self.mxlk_info[device_id].speed[idx]
         self.update_gpu_data(device_id, metric_id, data)
 
     def get_mxlk_width(self, device_id, metric_id):
+        if device_id not in self.mxlk_info:
+            return
         data = {}
         for idx in range(METAX_LINK_NUM):
-            data[idx+1] = self.mxlk_info.width[idx]
+            data[idx+1] = self.mxlk_info[device_id].width[idx]
         self.update_gpu_data(device_id, metric_id, data)
 
 
     def get_process_info(self, device_id, metric_id):
-        entrylist = []
-        processNumber = c_uint(32)
-        processInfo = (MxSmlProcessInfo_v2*32)(*entrylist)
-        ret = mxSmlGetSingleGpuProcess_v2(device_id, processNumber, processInfo)
-        if ret != MxSmlReturn.MXSML_Success:
-            print("mxSmlGetSingleGpuProcess failed: " + mxsml_get_error_string(ret))
-        else:
+        if not self.is_sampled(device_id, None, metric_id):
+            return
+        ret, processInfo, processNumber = query_cache.call(mxsml_get_device_process_info, device_id)
+        if self.check_result(ret, "mxSmlGetSingleGpuProcess", device_id, None, metric_id):
             for die_id in self.get_device_die_range(device_id):
                 number = 0
                 for idx, process in enumerate(processInfo):
-                    if idx == processNumber.value:
+                    if idx == processNumber:
                         break
                     for gpu_idx, gpu_info in enumerate(process.processGpuInfo):
                         if gpu_idx == process.gpuNumber:
@@ -866,36 +1340,33 @@ class GpuMonitor:
                 self.update_die_data(device_id, die_id, metric_id, number)
 
     def get_gpu_state(self, device_id, metric_id):
+        if not self.is_sampled(device_id, None, metric_id):
+            return
+        ret, deviceState = query_cache.call(mxsml_get_device_state, device_id)
+        if not self.check_result(ret, "mxSmlGetDeviceState", device_id, None, metric_id):
+            return
+
         for die_id in self.get_device_die_range(device_id):
             unavailable_reason = ""
-            deviceState = c_int(0)
-            ret = mxSmlGetDeviceState(device_id, byref(deviceState))
-            if ret != MxSmlReturn.MXSML_Success:
-                print("mxSmlGetDeviceState failed: " + mxsml_get_error_string(ret))
-            else:
-                if deviceState.value == 0:
-                    ret, unavailable_reason = mxsml_get_die_unavailable_reason(device_id, die_id)
-                self.update_die_data(device_id, die_id, metric_id, {unavailable_reason: deviceState.value})
+            if deviceState == 0:
+                ret, unavailable_reason = query_cache.call(mxsml_get_die_unavailable_reason, device_id, die_id)
+            self.update_die_data(device_id, die_id, metric_id, {unavailable_reason: deviceState})
 
 
     def get_clock_throttle_reason(self, device_id, metric_id):
-        for die_id in self.get_device_die_range(device_id):
-            ret, clocksThrottleReason = mxsml_get_current_clocks_throttle_reason(device_id, die_id)
-            if ret == MxSmlReturn.MXSML_Success:
+        for die_id in self.sampled_dies(device_id, metric_id):
+            ret, clocksThrottleReason = query_cache.call(mxsml_get_current_clocks_throttle_reason, device_id, die_id)
+            if self.check_result(ret, "mxSmlGetCurrentClocksThrottleReason", device_id, die_id, metric_id):
                 self.update_die_data(device_id, die_id, metric_id, clocksThrottleReason)
-            elif ret == MxSmlReturn.MXSML_OperationNotSupport:
-                self.remove_notsupported_metrics(metric_id)
-                return
-            else:
-                print("mxSmlGetCurrentClocksThrottleReason failed: " + mxsml_get_error_string(ret))
-                self.need_init = True
+            elif ret != MxSmlReturn.MXSML_OperationNotSupport:
+                self.device_failed(device_id)
                 return
 
 
     def get_ecc_count(self, device_id, metric_id):
-        for die_id in self.get_device_die_range(device_id):
-            ret, eccCounts = mxsml_get_die_total_ecc_errors(device_id, die_id)
-            if ret == MxSmlReturn.MXSML_Success:
+        for die_id in self.sampled_dies(device_id, metric_id):
+            ret, eccCounts = query_cache.call(mxsml_get_die_total_ecc_errors, device_id, die_id)
+            if self.check_result(ret, "mxSmlGetDieTotalEccErrors", device_id, die_id, metric_id):
                 self.update_die_data(
                     device_id,
                     die_id,
@@ -908,12 +1379,8 @@ class GpuMonitor:
                         "retired_page": eccCounts.retiredPage,
                     }
                 )
-            elif ret == MxSmlReturn.MXSML_OperationNotSupport:
-                self.remove_notsupported_metrics(metric_id)
-                return
-            else:
-                print("mxSmlGetDieTotalEccErrors failed: %s" % mxsml_get_error_string(ret))
-                self.need_init = True
+            elif ret != MxSmlReturn.MXSML_OperationNotSupport:
+                self.device_failed(device_id)
                 return
 
 
@@ -923,37 +1390,35 @@ class GpuMonitor:
             if count >= sgpu_count:
                 break
 
-            ret, sgpu_info = mxsml_get_sgpu_info(device_id, sgpu_id)
+            ret, sgpu_info = query_cache.call(mxsml_get_sgpu_info, device_id, sgpu_id)
             if ret == MxSmlReturn.MXSML_Success:
                 count = count + 1
                 self.all_sgpu_info[(device_id, sgpu_id)] = sgpu_info
-                pod_register_uuid = mxsml_get_sgpu_annotations_id(device_id, sgpu_id)
+                pod_register_uuid = query_cache.call(mxsml_get_sgpu_annotations_id, device_id, sgpu_id)
                 self.sgpu_pod_uuid_map[(device_id, sgpu_id)] = pod_register_uuid
             elif ret != MxSmlReturn.MXSML_OperationNotSupport:
                 print("mxSmlGetSgpuInfo failed: %s" % (mxsml_get_error_string(ret)))
-                self.need_init = True
+                self.device_failed(device_id)
                 break
 
 
     def get_sgpu_usage(self, device_id, metric_id):
         for (device_id, sgpu_id) in self.all_sgpu_info:
-            usage = c_int(0)
-            ret = mxSmlGetSgpuUsage(device_id, sgpu_id, byref(usage))
+            ret, usage = query_cache.call(mxsml_get_sgpu_usage, device_id, sgpu_id)
             if ret != MxSmlReturn.MXSML_Success and ret != MxSmlReturn.MXSML_OperationNotSupport:
                 print(f"Device {device_id} Sgpu {sgpu_id} mxSmlGetSgpuUsage failed: "
                         + mxSmlGetErrorString(ret).decode('ASCII'))
             else:
-                self.update_sgpu_data(device_id, sgpu_id, metric_id, usage.value/100)
+                self.update_sgpu_data(device_id, sgpu_id, metric_id, usage/100)
 
 
     def get_sgpu_memory_info(self, device_id):
         for (device_id, sgpu_id) in self.all_sgpu_info:
-            memory = MxSmlSgpuMemoryInfo()
-            ret = mxSmlGetSgpuMemory(device_id, sgpu_id, byref(memory))
+            ret, memory = query_cache.call(mxsml_get_sgpu_memory, device_id, sgpu_id)
             if ret != MxSmlReturn.MXSML_Success and ret != MxSmlReturn.MXSML_OperationNotSupport:
                 print(f"Device {device_id} Sgpu {sgpu_id} mxSmlGetSgpuMemory failed: "
                         + mxSmlGetErrorString(ret).decode('ASCII'))
-                self.need_init = True
+                self.device_failed(device_id)
                 break
             self.sgpu_memory_info[(device_id, sgpu_id)] = memory
 
@@ -982,12 +1447,12 @@ class GpuMonitor:
             self.update_sgpu_data(device_id, sgpu_id, metric_id, sgpuInfo.computeQuota)
 
     def get_server_info(self):
-        ret, local_uuid, remote_uuid1, remote_uuid2 = mxsml_get_local_and_multiple_remote_uuid()
+        ret, local_uuid, remote_uuid1, remote_uuid2 = query_cache.call(mxsml_get_local_and_multiple_remote_uuid)
         self.server_info = ServerInfo(local_uuid, [remote_uuid1, remote_uuid2], self.mxlk_status)
 
         if ret != MxSmlReturn.MXSML_Success and ret != MxSmlReturn.MXSML_OperationNotSupport:
              print("mxSmlGetLocalAndMultipleRemoteUuid failed: " + mxsml_get_error_string(ret))
-             self.need_init = True
+             self.inventory_suspect = True
 
         return ret
 
@@ -1013,68 +1478,59 @@ class GpuMonitor:
 
 
     def get_pci_event(self, device_id, metric_id):
+        if not self.is_sampled(device_id, None, metric_id):
+            return
         pcie_event_name_array = ["aer_ue", "aer_ce", "synfld", "dbe", "mmio"]
         data = {"aer_ue":{}, "aer_ce":{}, "synfld":{}, "dbe":{}, "mmio":{}}
         for event_idx, event_name in enumerate(pcie_event_name_array):
             event_type = event_idx
-            ret, event, size = mxsml_get_device_pci_event(device_id, event_type)
-            if ret == MxSmlReturn.MXSML_Success:
-                for i in range(size):
-                    data[event_name][event[i].name.decode('ASCII')] = event[i].count
-
-            elif ret == MxSmlReturn.MXSML_OperationNotSupport:
-                self.remove_notsupported_metrics(metric_id)
+            # an event type failing doesn't hold back the others
+            event_id = "%s_%s" % (metric_id, event_name)
+            if not self.is_sampled(device_id, None, event_id):
+                continue
+            ret, event, size = query_cache.call(mxsml_get_device_pci_event, device_id, event_type)
+            if ret == MxSmlReturn.MXSML_OperationNotSupport:
+                self.check_result(ret, "mxSmlGetPciEventInfo", device_id, None, metric_id)
                 break
 
-            else:
-                print("mxSmlGetPciEventInfo device %d type %d failed: %s" % (device_id, event_type, mxsml_get_error_string(ret)))
-                continue
+            if self.check_result(ret, "mxSmlGetPciEventInfo", device_id, None, event_id):
+                for i in range(size):
+                    data[event_name][event[i].name.decode('ASCII')] = event[i].count
 
         self.update_gpu_data(device_id, metric_id, data)
 
     def get_ras_count(self, device_id, metric_id):
-        for die_id in self.get_device_die_range(device_id):
-            ret, ras_error_data = mxsml_get_die_ras_count(device_id, die_id)
+        for die_id in self.sampled_dies(device_id, metric_id):
+            ret, ras_error_data = query_cache.call(mxsml_get_die_ras_count, device_id, die_id)
             data = {}
-            if ret == MxSmlReturn.MXSML_Success:
+            if self.check_result(ret, "mxSmlGetRasErrorData", device_id, die_id, metric_id):
                 for item in ras_error_data:
                     data[item[0]] = item[1]
 
             elif ret == MxSmlReturn.MXSML_OperationNotSupport:
-                self.remove_notsupported_metrics(metric_id)
-                break
-
-            else:
-                print("mxSmlGetRasErrorData device %d failed: %s" % (device_id, mxsml_get_error_string(ret)))
+                continue
 
             self.update_die_data(device_id, die_id, metric_id, data)
 
     def get_ras_status(self, device_id, metric_id):
-        for die_id in self.get_device_die_range(device_id):
-            ret, ras_status = mxsml_get_die_ras_status(device_id, die_id)
+        for die_id in self.sampled_dies(device_id, metric_id):
+            ret, ras_status = query_cache.call(mxsml_get_die_ras_status, device_id, die_id)
 
             data = {}
-            if ret == MxSmlReturn.MXSML_Success:
+            if self.check_result(ret, "mxSmlGetRasStatusData", device_id, die_id, metric_id):
                 for item in ras_status:
                     data[item[0]] = item[1]
 
             elif ret == MxSmlReturn.MXSML_OperationNotSupport:
-                self.remove_notsupported_metrics(metric_id)
-
-            else:
-                print("mxSmlGetRasStatusData device %d failed: %s" % (device_id, mxsml_get_error_string(ret)))
+                continue
 
             self.update_die_data(device_id, die_id, metric_id, data)
 
     def get_eth_throughput(self, device_id, metric_id):
-        ethThroughput = MxSmlEthThroughput()
-        ret = mxSmlGetEthThroughput(device_id, byref(ethThroughput))
-        if ret != MxSmlReturn.MXSML_Success:
-            if ret == MxSmlReturn.MXSML_OperationNotSupport:
-                self.remove_notsupported_metrics(metric_id)
-            else:
-                print("mxSmlGetEthThroughput failed: %s" % mxsml_get_error_string(ret))
-        else:
+        if not self.is_sampled(device_id, None, metric_id):
+            return
+        ret, ethThroughput = query_cache.call(mxsml_get_device_eth_throughput, device_id)
+        if self.check_result(ret, "mxSmlGetEthThroughput", device_id, None, metric_id):
             self.update_gpu_data(device_id, metric_id, {"tx":ethThroughput.tx, "rx":ethThroughput.rx})
 
 if __name__ == "__main__":
@@ -1093,6 +1549,6 @@ if __name__ == "__main__":
     monitor.start(metrics_required_mxc)
 
     while True:
-        print(monitor.get_gpu_data())
+        print(monitor.get_snapshot().gpu_data.to_dict())
         time.sleep(5)
 
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+"""
+Copyright © 2025 MetaX Integrated Circuits (Shanghai) Co., Ltd. All Rights Reserved.
+
+This software and associated documentation files (hereinafter collectively referred to as
+"Software") is a proprietary commercial software developed by MetaX Integrated Circuits
+(Shanghai) Co., Ltd. and/or its affiliates (hereinafter collectively referred to as “MetaX”).
+The information presented in the Software belongs to MetaX. Without prior written permission
+from MetaX, no entity or individual has the right to obtain a copy of the Software to deal in
+the Software, including but not limited to use, copy, modify, merge, disclose, publish,
+distribute, sublicense, and/or sell copies of the Software or substantial portions of the Software.
+
+The Software is provided for reference only, without warranty of any kind, either express or
+implied, including but not limited to the warranty of merchantability, fitness for any purpose
+and/or noninfringement. In no case shall MetaX be liable for any claim, damage or other liability
+arising from, out of or in connection with the Software.
+
+If the Software need to be used in conjunction with any third-party software or open source
+software, the rights to the third-party software or open source software still belong to the
+copyright owners. For details, please refer to the respective notices or licenses. Please comply
+with the provisions of the relevant notices or licenses. If the open source software licenses
+additionally require the disposal of rights related to this Software, please contact MetaX
+immediately and obtain MetaX 's written consent.
+
+MetaX reserves the right, at its sole discretion, to change, modify, add or remove portions of the
+Software, at any time. MetaX reserves all the right for the final explanation.
+"""
+
+from http.server import HTTPServer
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ThreadPoolHTTPServer(HTTPServer):
+    """HTTPServer that hands every accepted connection to a fixed pool of worker threads
+
+    A connection keeps its worker for as long as it stays open, so keep-alive peers
+    must be bounded by the handler timeout, otherwise idle clients can starve the pool.
+    """
+
+    def __init__(self, server_address, handler_class, workers=8):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mx-http")
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_worker, request, client_address)
+
+    def process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
@@ -111,8 +111,6 @@ class IBMonitor:
                 "resp_local_length_error", "resp_remote_access_errors", "rnr_nak_retry_err", "roce_adp_retrans", "roce_adp_retrans_to",
                 "rx_read_requests", "rx_write_requests"
                 ]
-        self.port_counter = Gauge("port_counter", "Port Counters under the counters folder", ["nic_name", "port", "counter_name", "Hostname"])
-        self.port_hw_counter = Gauge("port_hw_counter", "HW counters under the hw_counters folder", ["nic_name", "port", "counter_name", "Hostname"])
         self.ib_path = '/sys/class/infiniband/'
         self.ib_nics = []
         self.initialize()
@@ -158,13 +156,14 @@ class IBMonitor:
         return
 
     def export(self, host_name):
-        self.port_counter.clear()
-        self.port_hw_counter.clear()
+        # gauges are created per export and returned to the caller, nothing is shared between scrapes
+        port_counter = Gauge("port_counter", "Port Counters under the counters folder", ["nic_name", "port", "counter_name", "Hostname"], registry=None)
+        port_hw_counter = Gauge("port_hw_counter", "HW counters under the hw_counters folder", ["nic_name", "port", "counter_name", "Hostname"], registry=None)
 
         if len(self.ib_nics) == 0:
             print("No valid nic found")
             self.initialize()
-            return
+            return [port_counter, port_hw_counter]
 
         print("Export IB counters")
         need_init = False
@@ -180,16 +179,16 @@ class IBMonitor:
 
                 counter_dir = os.path.join(port_dir, "counters")
                 for counter in ib_nic.get_counters_export():
-                    self.port_counter.labels(nic, port, counter, host_name).set(self.get_counter_value(counter_dir, counter))
+                    port_counter.labels(nic, port, counter, host_name).set(self.get_counter_value(counter_dir, counter))
 
                 hw_counter_dir = os.path.join(port_dir, "hw_counters")
                 for hw_counter in ib_nic.get_hw_counters_export():
-                    self.port_hw_counter.labels(nic, port, hw_counter, host_name).set(self.get_counter_value(hw_counter_dir, hw_counter))
+                    port_hw_counter.labels(nic, port, hw_counter, host_name).set(self.get_counter_value(hw_counter_dir, hw_counter))
 
         if need_init:
             self.initialize()
 
-        return
+        return [port_counter, port_hw_counter]
 
     def get_counter_value(self, counter_dir, counter_name):
         counter_file = os.path.join(counter_dir, counter_name)
@@ -222,14 +221,13 @@ class IBMonitor:
 class BnxtMonitor:
 
     def __init__(self):
-        self.bnxt_counter = Gauge("bnxt_counter", "bnxt_re counters", ["nic_name", "counter_name", "Hostname"])
         self.bnxt_re_path = "/sys/kernel/debug/bnxt_re"
 
     def export(self, host_name):
-        self.bnxt_counter.clear()
+        bnxt_counter = Gauge("bnxt_counter", "bnxt_re counters", ["nic_name", "counter_name", "Hostname"], registry=None)
 
         if not os.path.exists(self.bnxt_re_path):
-            return
+            return [bnxt_counter]
 
         for bnxt_nic in os.listdir(self.bnxt_re_path):
             bnxt_nic_info = os.path.join(self.bnxt_re_path, bnxt_nic, "info")
@@ -252,12 +250,12 @@ class BnxtMonitor:
 
                         ret,value_int = self.str_to_int(value)
                         if ret:
-                            self.bnxt_counter.labels(bnxt_nic, counter_name, host_name).set(value_int)
+                            bnxt_counter.labels(bnxt_nic, counter_name, host_name).set(value_int)
 
             except Exception as e:
                 print("Read %s error %s" % (bnxt_nic_info, e))
 
-        return
+        return [bnxt_counter]
 
     def str_to_int(self, src_str):
         try:
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+"""
+Copyright © 2025 MetaX Integrated Circuits (Shanghai) Co., Ltd. All Rights Reserved.
+
+This software and associated documentation files (hereinafter collectively referred to as
+"Software") is a proprietary commercial software developed by MetaX Integrated Circuits
+(Shanghai) Co., Ltd. and/or its affiliates (hereinafter collectively referred to as “MetaX”).
+The information presented in the Software belongs to MetaX. Without prior written permission
+from MetaX, no entity or individual has the right to obtain a copy of the Software to deal in
+the Software, including but not limited to use, copy, modify, merge, disclose, publish,
+distribute, sublicense, and/or sell copies of the Software or substantial portions of the Software.
+
+The Software is provided for reference only, without warranty of any kind, either express or
+implied, including but not limited to the warranty of merchantability, fitness for any purpose
+and/or noninfringement. In no case shall MetaX be liable for any claim, damage or other liability
+arising from, out of or in connection with the Software.
+
+If the Software need to be used in conjunction with any third-party software or open source
+software, the rights to the third-party software or open source software still belong to the
+copyright owners. For details, please refer to the respective notices or licenses. Please comply
+with the provisions of the relevant notices or licenses. If the open source software licenses
+additionally require the disposal of rights related to this Software, please contact MetaX
+immediately and obtain MetaX 's written consent.
+
+MetaX reserves the right, at its sole discretion, to change, modify, add or remove portions of the
+Software, at any time. MetaX reserves all the right for the final explanation.
+"""
+
+import os
+import json
+from datetime import datetime
+
+
+old_print = print
+def timestamp_print(*args, **kwargs):
+    old_print(datetime.now(), "InventoryCache", *args, **kwargs)
+print = timestamp_print
+
+
+BOOT_ID_FILE = "/proc/sys/kernel/random/boot_id"
+FORMAT_VERSION = 1
+
+
+def read_boot_id():
+    try:
+        with open(BOOT_ID_FILE) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+class InventoryCache:
+    """Static device inventory kept on disk across exporter restarts
+
+    Holds die counts, driver/BIOS versions and MetaXLink topology per device BDF. The file
+    is only trusted for the boot and driver version it was written under, and an entry only
+    for a device with the same BDF and uuid, devices missing from it are queried as usual.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.boot_id = ""
+        self.driver_version = ""
+        # bdf : entry, valid entries loaded from the file
+        self.cached = {}
+        # bdf : entry, inventory of the devices found by the running initialization
+        self.entries = {}
+        self.changed = False
+
+    def load(self, driver_version):
+        self.cached = {}
+        self.entries = {}
+        self.changed = False
+        self.boot_id = read_boot_id()
+        self.driver_version = driver_version
+        if not self.boot_id:
+            return
+
+        try:
+            with open(self.path) as f:
+                content = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print("Read %s failed: %s" % (self.path, e))
+            return
+
+        if not isinstance(content, dict) or content.get("format") != FORMAT_VERSION:
+            print("Ignore %s, unknown format" % self.path)
+        elif content.get("boot_id") != self.boot_id:
+            print("Ignore %s, written before the last boot" % self.path)
+        elif content.get("driver_version") != driver_version:
+            print("Ignore %s, written for driver %s" % (self.path, content.get("driver_version")))
+        else:
+            self.cached = content.get("devices", {})
+            print("Loaded %d devices from %s" % (len(self.cached), self.path))
+
+    def get(self, bdf, uuid):
+        entry = self.cached.get(bdf)
+        if entry is None or entry.get("uuid") != uuid:
+            return None
+        self.entries[bdf] = entry
+        return entry
+
+    def put(self, bdf, entry):
+        self.entries[bdf] = entry
+        self.changed = True
+
+    def save(self):
+        # devices gone since the file was written are dropped as well
+        if not self.boot_id or (not self.changed and self.entries.keys() == self.cached.keys()):
+            return
+
+        content = {
+            "format": FORMAT_VERSION,
+            "boot_id": self.boot_id,
+            "driver_version": self.driver_version,
+            "devices": self.entries,
+        }
+        temp_path = "%s.%d.tmp" % (self.path, os.getpid())
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(temp_path, "w") as f:
+                json.dump(content, f, indent=1, sort_keys=True)
+            os.replace(temp_path, self.path)
+            print("Saved %d devices to %s" % (len(self.entries), self.path))
+        except OSError as e:
+            print("Write %s failed: %s" % (self.path, e))
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
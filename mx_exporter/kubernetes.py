@@ -27,11 +27,26 @@ MetaX reserves the right, at its sole discretion, to change, modify, add or remo
 Software, at any time. MetaX reserves all the right for the final explanation.
 """
 
+import os
+import time
+import threading
+from datetime import datetime
+
 import grpc
 from mx_exporter import podresourcev1alpha1_pb2
 from mx_exporter import podresourcev1alpha1_pb2_grpc
 
 
+old_print = print
+def timestamp_print(*args, **kwargs):
+    old_print(datetime.now(), "Kubernetes", *args, **kwargs)
+print = timestamp_print
+
+
+KUBELET_SOCKET = 'unix:///var/lib/kubelet/pod-resources/kubelet.sock'
+SGPU_REGISTER_DIR = "/run/metax/device-plugin/sgpu/"
+
+
 class PodInfo:
 
     def __init__(self, pod_name='', pod_namespace='', container_name='', device_uuid=''):
@@ -47,17 +62,23 @@ class PodInfo:
     def __repr__(self):
         return self.__str__()
 
+    # pod maps are compared to tell whether cached labels are still valid
+    def __eq__(self, other):
+        if not isinstance(other, PodInfo):
+            return NotImplemented
+        return (self.pod_name, self.pod_namespace, self.container_name, self.device_uuid) \
+                == (other.pod_name, other.pod_namespace, other.container_name, other.device_uuid)
 
-def get_pod_resource():
+    # defining __eq__ drops the inherited __hash__, pod infos are not modified after creation
+    def __hash__(self):
+        return hash((self.pod_name, self.pod_namespace, self.container_name, self.device_uuid))
+
+
+def list_pod_resource(stub, timeout = None):
     device_pod_map = {}
 
-    with grpc.insecure_channel('unix:///var/lib/kubelet/pod-resources/kubelet.sock') as channel:
-        stub = podresourcev1alpha1_pb2_grpc.PodResourcesListerStub(channel)
-        try:
-            response = stub.List(podresourcev1alpha1_pb2.ListPodResourcesRequest())
-        except grpc.RpcError as rpc_error:
-#            print("grpc error: %s" % rpc_error.details())
-            return device_pod_map
+    # raises grpc.RpcError
+    response = stub.List(podresourcev1alpha1_pb2.ListPodResourcesRequest(), timeout=timeout)
 
     for pod in response.pod_resources:
         for container in pod.containers:
@@ -71,6 +92,176 @@ def get_pod_resource():
     return device_pod_map
 
 
+def get_pod_resource():
+    with grpc.insecure_channel(KUBELET_SOCKET) as channel:
+        stub = podresourcev1alpha1_pb2_grpc.PodResourcesListerStub(channel)
+        try:
+            return list_pod_resource(stub)
+        except grpc.RpcError as rpc_error:
+#            print("grpc error: %s" % rpc_error.details())
+            return {}
+
+
+def get_sgpu_register_signature():
+    # register files are written by device-plugin, a changed name or mtime means a new allocation
+    try:
+        with os.scandir(SGPU_REGISTER_DIR) as entries:
+            return tuple(sorted((entry.name, entry.stat().st_mtime_ns) for entry in entries))
+    except OSError:
+        return ()
+
+
+def read_sgpu_register_id(uuid):
+    sgpu_target_file = os.path.join(SGPU_REGISTER_DIR, uuid)
+    try:
+        with open(sgpu_target_file, "r") as f:
+            content = f.read().strip()
+    except:
+        return ""
+
+    pairs = content.split(";")
+    for pair in pairs:
+        if "=" in pair:
+            key, value = pair.split("=", 1)
+            if key.strip() == "id":
+                return value.strip()
+
+    return ""
+
+
+def index_register_ids(device_pod_map):
+    # K8S-745 gpu oversubscription, pod register_id format: "${native gpu uuid}::${index}"
+    register_ids = {}
+    for key in device_pod_map:
+        uuid, separator, _ = str(key).partition("::")
+        if separator:
+            register_ids.setdefault(uuid, []).append(key)
+
+    return {uuid: tuple(ids) for uuid, ids in register_ids.items()}
+
+
+class PodResources:
+    """Pod assignment of devices at some point, never modified after creation"""
+
+    def __init__(self, generation, device_pod_map, register_ids = None, sgpu_register_ids = None):
+        # bumped when pod assignments or sgpu register files change
+        self.generation = generation
+        # device uuid : pod info
+        self.device_pod_map = device_pod_map
+        # native gpu uuid : (oversubscription register id, ...)
+        self.register_ids = register_ids if register_ids is not None else {}
+        # native gpu uuid : device-plugin register id from sgpu register files
+        self.sgpu_register_ids = sgpu_register_ids if sgpu_register_ids is not None else {}
+
+    def get_register_ids(self, uuid):
+        # K8S-480 device-plugin register first, then K8S-745 oversubscription
+        if uuid in self.sgpu_register_ids:
+            return (self.sgpu_register_ids[uuid],)
+
+        return self.register_ids.get(uuid, ())
+
+
+class PodResourceWatcher:
+    """Keeps the device to pod index up to date in the background
+
+    Pod resources are listed over a long-lived channel every refresh_interval seconds, and
+    immediately when the device-plugin sgpu register files change. If kubelet fails, the last
+    good index is kept, so scrapes never wait for kubelet.
+    """
+
+    def __init__(self, refresh_interval = 10, poll_interval = 1, rpc_timeout = 5):
+        self.refresh_interval = refresh_interval  # seconds
+        self.poll_interval = poll_interval  # seconds, sgpu register files polling
+        self.rpc_timeout = rpc_timeout  # seconds
+
+        self.channel = grpc.insecure_channel(KUBELET_SOCKET)
+        self.stub = podresourcev1alpha1_pb2_grpc.PodResourcesListerStub(self.channel)
+
+        self.register_signature = ()
+        self.rpc_failed = False
+        self.poll_failed = False
+        self.pod_resources = PodResources(0, {})
+
+    def start(self):
+        # the first scrape should already see pods
+        self.poll(True)
+
+        t = threading.Thread(target=self.watch, args=(), daemon=True)
+        t.start()
+
+    def get(self):
+        return self.pod_resources
+
+    def watch(self):
+        next_refresh = time.time() + self.refresh_interval
+        while True:
+            time.sleep(self.poll_interval)
+
+            if self.poll(time.time() >= next_refresh):
+                next_refresh = time.time() + self.refresh_interval
+
+    def poll(self, refresh_due):
+        # any failure keeps the last pod resources, the watcher thread must not die
+        try:
+            signature = get_sgpu_register_signature()
+            if signature == self.register_signature and not refresh_due:
+                return False
+
+            self.refresh(signature)
+            if self.poll_failed:
+                print("Refresh pod resources recovered")
+            self.poll_failed = False
+        except Exception as e:
+            if not self.poll_failed:
+                print("Refresh pod resources failed, keep last pod resources: %r" % e)
+            self.poll_failed = True
+        return True
+
+    def refresh(self, signature):
+        device_pod_map = self.pod_resources.device_pod_map
+        try:
+            device_pod_map = list_pod_resource(self.stub, self.rpc_timeout)
+            if self.rpc_failed:
+                print("List pod resources recovered")
+            self.rpc_failed = False
+        except grpc.RpcError as rpc_error:
+            if not self.rpc_failed:
+                print("List pod resources failed, keep last pod resources: %s" % rpc_error.details())
+            self.rpc_failed = True
+
+        pod_resources = self.pod_resources
+        if signature == self.register_signature and device_pod_map == pod_resources.device_pod_map:
+            return
+
+        register_ids = pod_resources.register_ids
+        if device_pod_map != pod_resources.device_pod_map:
+            register_ids = index_register_ids(device_pod_map)
+
+        sgpu_register_ids = pod_resources.sgpu_register_ids
+        if signature != self.register_signature:
+            sgpu_register_ids = self.update_sgpu_register_ids(sgpu_register_ids, signature)
+
+        self.register_signature = signature
+        self.pod_resources = PodResources(pod_resources.generation + 1, device_pod_map, register_ids, sgpu_register_ids)
+
+    def update_sgpu_register_ids(self, sgpu_register_ids, signature):
+        # only re-read register files which are new or modified
+        last_signature = dict(self.register_signature)
+        names = set(name for name, _ in signature)
+        register_ids = {uuid: id for uuid, id in sgpu_register_ids.items() if uuid in names}
+        for name, mtime in signature:
+            if last_signature.get(name) == mtime:
+                continue
+
+            register_id = read_sgpu_register_id(name)
+            if register_id:
+                register_ids[name] = register_id
+            else:
+                register_ids.pop(name, None)
+
+        return register_ids
+
+
 if __name__ == "__main__":
     device_pod = get_pod_resource()
     print(device_pod)
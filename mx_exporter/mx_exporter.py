@@ -27,19 +27,20 @@ MetaX reserves the right, at its sole discretion, to change, modify, add or remo
 Software, at any time. MetaX reserves all the right for the final explanation.
 """
 
-import time
 import os.path
 import csv
+import time
 import socket
-import threading
 from typing import Optional
 from datetime import datetime
-from prometheus_client import CollectorRegistry, Gauge
+from prometheus_client import CollectorRegistry, Gauge, Counter
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
 from mx_exporter.gpu_monitor import GpuMonitor
+from mx_exporter.sampler_process import SamplerProcess
+from mx_exporter.exposition import ExpositionCache
 from mx_exporter.ib_metrics import IBMonitor, BnxtMonitor
-from mx_exporter.kubernetes import get_pod_resource, PodInfo
+from mx_exporter.kubernetes import PodResourceWatcher, PodInfo
 from mx_exporter.log_monitor import KernelLogMonitor,SysLogMonitor
-from collections import defaultdict
 
 old_print = print
 def timestamp_print(*args, **kwargs):
@@ -47,19 +48,126 @@ def timestamp_print(*args, **kwargs):
 print = timestamp_print
 
 
+# metric type in config file : (metric class validating name and labels, family built per scrape)
+METRIC_TYPES = {
+    "Gauge": (Gauge, GaugeMetricFamily),
+    "Counter": (Counter, CounterMetricFamily),
+}
+
+
+class MetricTemplate:
+
+    def __init__(self, metric_type, name, description, labels):
+        metric_func, self.family_func = METRIC_TYPES[metric_type]
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.label_count = len(labels)
+        # appended to label values before cutting them to label_count, so that label values
+        # beyond the configured labels are dropped and missing ones are "NA"
+        self.padding = ("NA",) * self.label_count
+        metric_func(name, description, labels, registry=None) # validate metric name and labels
+
+    def create(self):
+        # samples are collected per scrape into plain containers, scrapes share no state
+        return MetricSamples(self)
+
+    def project(self, labels):
+        return (tuple(map(str, labels)) + self.padding)[:self.label_count]
+
+
+class MetricSamples:
+    """Samples of one metric collected by one scrape"""
+
+    __slots__ = ("template", "samples")
+
+    def __init__(self, template):
+        self.template = template
+        # label values : value, a later sample with the same label values replaces the earlier one
+        self.samples = {}
+
+    def set(self, labels, value):
+        self.samples[self.template.project(labels)] = value
+
+    def inc(self, labels):
+        labels = self.template.project(labels)
+        self.samples[labels] = self.samples.get(labels, 0) + 1
+
+    def family(self):
+        template = self.template
+        family = template.family_func(template.name, template.description, labels=template.labels)
+        for labels, value in self.samples.items():
+            family.add_metric(labels, value)
+        return family
+
+
+class Scrape:
+    """State of one scrape, private to the thread serving it"""
+
+    def __init__(self, metrics, pod_resources, snapshot):
+        # metric id : samples collected by this scrape
+        self.metrics = metrics
+        # pod assignment being exported, read-only
+        self.pod_resources = pod_resources
+        # device uuid : pod info
+        self.device_pod_map = pod_resources.device_pod_map
+        # gather cycle being exported, read-only
+        self.snapshot = snapshot
+        # (device id, die id) : device info
+        self.device_info_map = snapshot.device_info_map
+        # bdfid : device id
+        self.bdf_device_map = snapshot.bdf_device_map
+        # (device id, sgpu id) : sgpu info
+        self.all_sgpu_info = snapshot.all_sgpu_info
+        # (device id, sgpu id) : sgpu pod register id
+        self.sgpu_pod_register_id = snapshot.sgpu_pod_uuid_map
+
+        # K8S-745, common labels number is greater than 1 when over-subscription
+        # 1. (device id, die id) : ((common labels1), (common lables2), ...)
+        # 2. (device id) : ((common labels1), (common lables2), ...)
+        # shared with other scrapes through the label cache, never modified
+        self.common_labels = {}
+
+        # (device id, sgpu id) : sgpu labels
+        self.sgpu_labels = {}
+
+        # (metric id, is sgpu) : (layout series, ((slot, label values), ...)), shared like common_labels
+        self.projections = {}
+
+
+class LabelSet:
+    """Labels built for one combination of devices, sgpus and pod assignments"""
+
+    def __init__(self, key, common_labels, sgpu_labels):
+        # (topology generation, sgpu generation, pod resources generation)
+        self.key = key
+        self.common_labels = common_labels
+        self.sgpu_labels = sgpu_labels
+        # label values of every sample slot, compiled per metric on first use
+        self.projections = {}
+
+
 class MxCollector(object):
 
     def __init__(self, config_file, registry: Optional[CollectorRegistry] = None, gather_interval = 10,
-            ib_monitor_flag = 0, mount_point = ""):
+            ib_monitor_flag = 0, mount_point = "", prerender = 0, sample_workers = 0, pod_refresh_interval = 10,
+            sampler_process = 0, device_timeout = 0, fast_init = 0, inventory_cache = ""):
 
         if registry is not None:
             registry.register(self)
 
-        self.lock = threading.Lock()
-        self.init_members(gather_interval, ib_monitor_flag)
+        self.init_members(gather_interval, ib_monitor_flag, sample_workers, pod_refresh_interval, sampler_process,
+            device_timeout, fast_init, inventory_cache)
         self.init_required_metrics(config_file, self.metrics_supported)
 
-        self.gpu_monitor.start(self.metrics_required.keys())
+        # scrapes serve the cycle families rendered once per generation, pre-rendered in the gather
+        # thread with prerender, otherwise by the first scrape of a generation
+        self.exposition_cache = ExpositionCache(self.collect_cycle, self.collect_live, self.get_generation, prerender)
+        if prerender:
+            self.gpu_monitor.register_cycle_listener(self.exposition_cache.render)
+
+        self.gpu_monitor.start(self.metrics_required.keys(), self.metric_intervals)
+        self.pod_watcher.start()
 
         if any(metric in self.metrics_required for metric in self.kernel_log_monitor.get_supported_metrics()):
             self.kernel_log_monitor.start(mount_point)
@@ -70,39 +178,37 @@ class MxCollector(object):
     def describe(self):
         return []
 
-    def init_members(self, gather_interval, ib_monitor_flag):
-        self.ib_monitor_flag = ib_monitor_flag
-
-        # device uuid : pod info
-        self.device_pod_map = {}
-        # bdfid : device id
-        self.bdf_device_map = {}
-        # (device id, die id) : device info
-        self.device_info_map = {}
-
-        # K8S-745, common labels number is greater than 1 when over-subscription
-        # 1. (device id, die id) : [[common labels1], [common lables2], ...]
-        # 2. (device id) : [[common labels1], [common lables2], ...]
-        self.common_labels = defaultdict(list)
+    def get_generation(self):
+        # /metrics changes with the gather cycle and the pod assignment
+        snapshot = self.gpu_monitor.get_snapshot()
+        return (snapshot.generation if snapshot is not None else 0), self.pod_watcher.get().generation
 
-        # (device id, sgpu id) : sgpu info
-        self.all_sgpu_info = {}
-        # (device id, sgpu id) : sgpu pod register id
-        self.sgpu_pod_register_id = {}
-
-        self.sgpu_labels = {}
+    def init_members(self, gather_interval, ib_monitor_flag, sample_workers, pod_refresh_interval, sampler_process,
+            device_timeout, fast_init, inventory_cache):
+        self.ib_monitor_flag = ib_monitor_flag
 
-        # required metrics in config file
+        # required metrics in config file, metric id : metric template
         self.metrics_required = {}
+        # metric id : sampling interval in seconds, for metrics with their own interval in config file
+        self.metric_intervals = {}
 
-        self.metric_types = ["Gauge", "Counter", "Summary", "Histogram", "Info"]
+        self.metric_types = list(METRIC_TYPES)
 
-        self.gpu_monitor = GpuMonitor(gather_interval)
+        # the sampler process offers the same interface as GpuMonitor
+        if sampler_process:
+            self.gpu_monitor = SamplerProcess(gather_interval, sample_workers, device_timeout, fast_init, inventory_cache)
+        else:
+            self.gpu_monitor = GpuMonitor(gather_interval, sample_workers, device_timeout=device_timeout, fast_init=fast_init,
+                inventory_cache=inventory_cache)
         self.kernel_log_monitor = KernelLogMonitor()
         self.sys_log_monitor = SysLogMonitor()
+        self.pod_watcher = PodResourceWatcher(pod_refresh_interval)
 
         self.metrics_supported = self.gpu_monitor.get_supported_metrics() \
                 + self.kernel_log_monitor.get_supported_metrics() + self.sys_log_monitor.get_supported_metrics()
+        # metrics computed at scrape time rather than sampled by the gather thread
+        self.live_metrics = set(["sample_age"] + self.kernel_log_monitor.get_supported_metrics()
+                + self.sys_log_monitor.get_supported_metrics())
 
         if self.ib_monitor_flag:
             self.ib_monitor = IBMonitor()
@@ -110,44 +216,57 @@ class MxCollector(object):
 
         self.host_name = self.get_host_name()
 
-        # basic metrics : device type, bios version, driver version
-        self.devType = Gauge("mx_device_type", "Device type", ["deviceId", "dieId", "deviceType", "uuid"])
-        self.biosVersion = Gauge("mx_bios_ver", "Bios version", ["deviceId", "dieId", "bios"])
-        self.driverVersion = Gauge("mx_driver_ver", "Driver version", ["deviceId", "dieId", "driver"])
+        # labels of the last scrape, reused until devices, sgpus or pods change
+        self.label_set = None
 
 
     def collect(self):
-        with self.lock:
-            print("Export metrics")
-            time.sleep(0.05) # avoid 2nd thread clear metrics before 1st send response
-            self.device_pod_map = get_pod_resource()
-            self.device_info_map = self.gpu_monitor.get_device_info_map()
-            self.all_sgpu_info, self.sgpu_pod_register_id = self.gpu_monitor.get_sgpu_info_dict()
+        yield from self.collect_cycle()
+        yield from self.collect_live()
+
+
+    def create_scrape(self, live):
+        return Scrape(
+            {metric_id: template.create() for metric_id, template in self.metrics_required.items()
+                if (metric_id in self.live_metrics) == live},
+            self.pod_watcher.get(),
+            self.gpu_monitor.get_snapshot())
 
-            self.generate_common_labels()
-            gpu_data = self.gpu_monitor.get_gpu_data()
-            self.generate_sgpu_labels()
-            sgpu_data = self.gpu_monitor.get_sgpu_data()
 
-            for metric_id, metric in self.metrics_required.items():
-                metric.clear()
-                for device_key, value in gpu_data.items():
-                    if metric_id in value:
-                        self.export_common(device_key, metric, value[metric_id])
+    def collect_cycle(self):
+        # families that only change with the gather cycle or the pod assignment
+        print("Export metrics")
+        scrape = self.create_scrape(False)
 
-                for (device_id, sgpu_id), value in sgpu_data.items():
-                    if metric_id in value:
-                        self.export_sgpu_info(device_id, sgpu_id, metric, value[metric_id])
+        self.load_labels(scrape)
 
-            self.export_device_basic_metrics()
-            self.export_server_info()
-            self.export_log_info()
+        for metric_id, metric in scrape.metrics.items():
+            self.export_series(scrape, metric_id, metric, scrape.snapshot.gpu_data, False)
+            self.export_series(scrape, metric_id, metric, scrape.snapshot.sgpu_data, True)
 
-            if self.ib_monitor_flag:
-                self.ib_monitor.export(self.host_name)
-                self.bnxt_monitor.export(self.host_name)
+        basic_metrics = self.export_device_basic_metrics(scrape)
+        self.export_server_info(scrape)
 
-            return []
+        yield from basic_metrics
+        for metric in scrape.metrics.values():
+            yield metric.family()
+
+
+    def collect_live(self):
+        # families computed when scraped, they must not be cached with the gather cycle
+        scrape = self.create_scrape(True)
+
+        self.load_labels(scrape)
+
+        self.export_sample_age(scrape)
+        self.export_log_info(scrape)
+
+        for metric in scrape.metrics.values():
+            yield metric.family()
+
+        if self.ib_monitor_flag:
+            for metric in self.ib_monitor.export(self.host_name) + self.bnxt_monitor.export(self.host_name):
+                yield from metric.collect()
 
 
     def init_required_metrics(self, config_file, metrics_supported):
@@ -158,17 +277,25 @@ class MxCollector(object):
                 if not self.is_row_valid(row, metrics_supported):
                     continue
 
-                # metric id,metric type,metric name,metric description,label1,label2,...
-                # metric type is also metric function, eg, Gauge
+                # metric id,metric type,metric name,metric description[,interval],label1,label2,...
                 metric_id = row[0]
-                metric_func = globals()[row[1]]
+                metric_type = row[1]
                 metric_name = row[2]
                 metric_description = row[3]
                 metric_labels = row[4:]
+                # label names can't be numeric, so a numeric 5th column is the sampling interval in ms
+                if len(metric_labels) > 0 and metric_labels[0].strip().isdigit():
+                    interval = int(metric_labels[0])
+                    metric_labels = metric_labels[1:]
+                    if interval < 100:
+                        print("Skip invalid interval %dms of metric id: %s, must be larger than 100ms" % (interval, metric_id))
+                    else:
+                        self.metric_intervals[metric_id] = interval/1000
                 try:
-                    self.metrics_required[metric_id] = metric_func(metric_name, metric_description, metric_labels)
+                    self.metrics_required[metric_id] = MetricTemplate(metric_type, metric_name, metric_description, metric_labels)
                 except Exception as e:
                     print("Create metric exception: %s" % (e))
+                    self.metric_intervals.pop(metric_id, None)
 
 
     def is_row_valid(self, row, metrics_supported):
@@ -196,184 +323,198 @@ class MxCollector(object):
         return True
 
 
-    def export_device_basic_metrics(self):
-        self.devType.clear()
-        self.biosVersion.clear()
-        self.driverVersion.clear()
-        for (device_id, die_id), device_info in self.device_info_map.items():
-            self.devType.labels(device_id, die_id, device_info.name, device_info.uuid).set(1)
-            self.biosVersion.labels(device_id, die_id, device_info.bios_version).set(1)
-            self.driverVersion.labels(device_id, die_id, device_info.driver_version).set(1)
-
-        if 'topo_info' in self.metrics_required:
-            for (device_id, die_id), device_info in self.device_info_map.items():
-                for common_labels in self.common_labels[(device_id, die_id)]:
-                    self.gauge_labels_set(self.metrics_required['topo_info'], [device_info.topo_id,
+    def export_device_basic_metrics(self, scrape):
+        # basic metrics : device type, bios version, driver version
+        devType = GaugeMetricFamily("mx_device_type", "Device type", labels=["deviceId", "dieId", "deviceType", "uuid"])
+        biosVersion = GaugeMetricFamily("mx_bios_ver", "Bios version", labels=["deviceId", "dieId", "bios"])
+        driverVersion = GaugeMetricFamily("mx_driver_ver", "Driver version", labels=["deviceId", "dieId", "driver"])
+        for (device_id, die_id), device_info in scrape.device_info_map.items():
+            device_id, die_id = str(device_id), str(die_id)
+            devType.add_metric([device_id, die_id, device_info.name, device_info.uuid], 1)
+            biosVersion.add_metric([device_id, die_id, device_info.bios_version], 1)
+            driverVersion.add_metric([device_id, die_id, device_info.driver_version], 1)
+
+        if 'topo_info' in scrape.metrics:
+            for (device_id, die_id), device_info in scrape.device_info_map.items():
+                for common_labels in scrape.common_labels[(device_id, die_id)]:
+                    scrape.metrics['topo_info'].set([device_info.topo_id,
                         device_info.socket_id, device_info.die_id, *common_labels], 1)
 
+        return [devType, biosVersion, driverVersion]
 
-    def get_sgpu_register_id(self, uuid):
-        sgpu_target_dir = "/run/metax/device-plugin/sgpu/"
-        sgpu_target_file = os.path.join(sgpu_target_dir, uuid)
-        if not os.path.exists(sgpu_target_file):
-                return ""
 
-        try:
-            with open(sgpu_target_file, "r") as f:
-                content = f.read().strip()
-        except:
-            return ""
+    def load_labels(self, scrape):
+        key = (scrape.snapshot.topology_generation, scrape.snapshot.sgpu_generation,
+            scrape.pod_resources.generation)
+        label_set = self.label_set
+        if label_set is not None and label_set.key == key:
+            scrape.common_labels = label_set.common_labels
+            scrape.sgpu_labels = label_set.sgpu_labels
+            scrape.projections = label_set.projections
+            return
 
-        pairs = content.split(";")
-        for pair in pairs:
-            if "=" in pair:
-                key, value = pair.split("=", 1)
-                if key.strip() == "id":
-                    return value.strip()
+        print("Generate labels")
+        self.generate_common_labels(scrape)
+        self.generate_sgpu_labels(scrape)
+        # concurrent scrapes may both rebuild, either result is valid
+        self.label_set = LabelSet(key, scrape.common_labels, scrape.sgpu_labels)
+        scrape.projections = self.label_set.projections
 
-        return ""
 
-
-    def get_oversubscription_register_id(self, uuid):
-        register_ids = []
-        for key in self.device_pod_map:
-            key_str = str(key)
-            if uuid in key_str: # pod register_id format: "${native gpu uuid}::${index}"
-                register_ids.append(key)
-
-        return register_ids
-
-    def generate_common_labels(self):
-        self.common_labels.clear()
-        for (device_id, die_id), device_info in self.device_info_map.items():
+    def generate_common_labels(self, scrape):
+        common_labels = {}
+        device_pod_map = scrape.device_pod_map
+        for (device_id, die_id), device_info in scrape.device_info_map.items():
             pod_info_list = []
-            if device_info.uuid in self.device_pod_map.keys():
-                pod_info = self.device_pod_map.get(device_info.uuid, PodInfo())
+            if device_info.uuid in device_pod_map.keys():
+                pod_info = device_pod_map.get(device_info.uuid, PodInfo())
                 pod_info_list.append(pod_info)
-            elif device_info.uuid: # k8s-480, try to get device-plugin register
-                register_ids = self.get_sgpu_register_id(device_info.uuid)
-                # k8s-745 support gpu oversubscription
-                if not register_ids:
-                    register_ids = self.get_oversubscription_register_id(device_info.uuid)
-
+            elif device_info.uuid: # k8s-480 device-plugin register, k8s-745 support gpu oversubscription
+                register_ids = scrape.pod_resources.get_register_ids(device_info.uuid)
                 for register_id in register_ids:
-                    pod_info = self.device_pod_map.get(register_id, PodInfo())
+                    pod_info = device_pod_map.get(register_id, PodInfo())
                     if pod_info:
                         pod_info_list.append(pod_info)
 
             if not pod_info_list:
                 pod_info_list.append(PodInfo("", "", "", device_id))
 
-            for pod_info in pod_info_list:
-                new_element = [device_id, device_info.uuid, pod_info.pod_name, pod_info.pod_namespace,
-                    pod_info.container_name, self.host_name, device_info.driver_version, device_info.bios_version, device_info.name, die_id]
+            device_labels = [(device_id, device_info.uuid, pod_info.pod_name, pod_info.pod_namespace,
+                pod_info.container_name, self.host_name, device_info.driver_version, device_info.bios_version, device_info.name)
+                for pod_info in pod_info_list]
 
-                if new_element not in self.common_labels[(device_id, die_id)]:
-                    self.common_labels[(device_id, die_id)].append([device_id, device_info.uuid, pod_info.pod_name, pod_info.pod_namespace,
-                    pod_info.container_name, self.host_name, device_info.driver_version, device_info.bios_version, device_info.name, die_id])
+            # dict keeps the order and drops duplicated label sets
+            common_labels[(device_id, die_id)] = tuple(dict.fromkeys(labels + (die_id,) for labels in device_labels))
 
             # label for pcie, board power, etc.
-            if not device_id in self.common_labels:
-                for pod_info in pod_info_list:
-                    self.common_labels[device_id].append([device_id, device_info.uuid, pod_info.pod_name, pod_info.pod_namespace,
-                        pod_info.container_name, self.host_name, device_info.driver_version, device_info.bios_version, device_info.name])
+            if not device_id in common_labels:
+                common_labels[device_id] = tuple(device_labels)
+
+        scrape.common_labels = common_labels
 
 
-    def export_server_info(self):
-        server_data = self.gpu_monitor.get_server_data()
+    def export_sample_age(self, scrape):
+        if 'sample_age' in scrape.metrics:
+            now = time.time()
+            for device_id, sample_time in scrape.snapshot.device_sample_time.items():
+                self.export_common(scrape, device_id, scrape.metrics['sample_age'], (), now - sample_time)
+
+
+    def export_server_info(self, scrape):
+        server_data = scrape.snapshot.server_data
         metric_id = 'server_info'
-        if metric_id in self.metrics_required:
-            metric_gauge = self.metrics_required[metric_id]
+        if metric_id in scrape.metrics:
+            metric = scrape.metrics[metric_id]
             for kind, value in server_data.get(metric_id, {}).items():
                 for uuid, vvalue in value.items():
-                    self.gauge_labels_set(metric_gauge, [kind, uuid, self.host_name], vvalue)
+                    metric.set([kind, uuid, self.host_name], vvalue)
 
         metric_id = 'server_conn_status'
-        if metric_id in self.metrics_required:
-            metric_gauge = self.metrics_required[metric_id]
+        if metric_id in scrape.metrics:
+            metric = scrape.metrics[metric_id]
             for uuid,conn_status in server_data.get(metric_id, {}).items():
-                self.gauge_labels_set(metric_gauge, [uuid, self.host_name], conn_status)
-
+                metric.set([uuid, self.host_name], conn_status)
 
-    def export_log_info(self):
-        self.bdf_device_map = self.gpu_monitor.get_bdf_device_map()
 
-        if 'driver_log_errors' in self.metrics_required:
-            self.export_kernel_log_info(self.metrics_required['driver_log_errors'])
+    def export_log_info(self, scrape):
+        if 'driver_log_errors' in scrape.metrics:
+            self.export_kernel_log_info(scrape, scrape.metrics['driver_log_errors'])
 
-        if 'driver_eid_errors' in self.metrics_required:
-            self.export_driver_eid_errors(self.metrics_required['driver_eid_errors'])
+        if 'driver_eid_errors' in scrape.metrics:
+            self.export_driver_eid_errors(scrape, scrape.metrics['driver_eid_errors'])
 
-        if 'sdk_eid_errors' in self.metrics_required:
-            self.export_sdk_eid_errors(self.metrics_required['sdk_eid_errors'])
+        if 'sdk_eid_errors' in scrape.metrics:
+            self.export_sdk_eid_errors(scrape, scrape.metrics['sdk_eid_errors'])
 
         return
 
 
-    def export_common(self, device_key, metric_gauge, metric_data):
-        for common_labels in self.common_labels[device_key]:
-            if isinstance(metric_data, dict):
-                for key, value in metric_data.items():
-                    if isinstance(value, dict):  # mxlk bw / pcie event
-                        for vkey,vvalue in value.items():
-                            self.gauge_labels_set(metric_gauge, [key, vkey, *common_labels], vvalue)
-                    else:
-                        self.gauge_labels_set(metric_gauge, [key, *common_labels], value)
+    def export_series(self, scrape, metric_id, metric, frame, sgpu):
+        # the layout of a metric is only replaced when its samples change shape, so its label
+        # values are compiled once per layout and label set, the loop below only copies values
+        series = frame.layout.get(metric_id, ())
+        projection = scrape.projections.get((metric_id, sgpu))
+        if projection is None or projection[0] is not series:
+            projection = (series, self.compile_projection(scrape, metric.template, series, sgpu))
+            scrape.projections[(metric_id, sgpu)] = projection
+
+        values = frame.values
+        valid = frame.valid
+        samples = metric.samples
+        for slot, labels in projection[1]:
+            if valid[slot]:
+                samples[labels] = values[slot]
+
+
+    def compile_projection(self, scrape, template, series, sgpu):
+        compiled = []
+        for series_key, sub_key, slot in series:
+            if sgpu:
+                label_sets = (scrape.sgpu_labels[series_key],) if series_key in scrape.sgpu_labels else ()
+                sub_key = ()
             else:
-                self.gauge_labels_set(metric_gauge, common_labels, metric_data)
-
-
-    def generate_sgpu_labels(self):
-        for (device_id, sgpu_id), sgpu_info in self.all_sgpu_info.items():
+                label_sets = scrape.common_labels.get(series_key, ())
+            # sub keys of nested samples lead the labels, eg. ("rx", link) for mxlk bw / pcie event
+            for labels in label_sets:
+                compiled.append((slot, template.project(sub_key + labels)))
+        return tuple(compiled)
+
+
+    def export_common(self, scrape, device_key, metric, sub_key, value):
+        # sub keys of nested samples lead the labels, eg. ("rx", link) for mxlk bw / pcie event
+        for common_labels in scrape.common_labels.get(device_key, ()):
+            metric.set([*sub_key, *common_labels], value)
+
+
+    def generate_sgpu_labels(self, scrape):
+        sgpu_labels = {}
+        # device id : device info of its last die
+        device_infos = {id: device_info for (id, _), device_info in scrape.device_info_map.items()}
+        for (device_id, sgpu_id), sgpu_info in scrape.all_sgpu_info.items():
+            if device_id not in device_infos:
+                continue
+            device_info = device_infos[device_id]
             uuid = sgpu_info.uuid.decode('ASCII')
-            pod_uuid = self.sgpu_pod_register_id[(device_id, sgpu_id)]
-            pod_info = self.device_pod_map.get(pod_uuid, PodInfo())
-            for (id, _), device_info in self.device_info_map.items():
-                if device_id != id:
-                    continue
-                self.sgpu_labels[(device_id, sgpu_id)] = [device_id, sgpu_id, sgpu_info.minor, uuid, pod_info.pod_name,
-                    pod_info.pod_namespace, pod_info.container_name, self.host_name,
-                    device_info.driver_version, device_info.bios_version, device_info.name]
-
+            pod_uuid = scrape.sgpu_pod_register_id[(device_id, sgpu_id)]
+            pod_info = scrape.device_pod_map.get(pod_uuid, PodInfo())
+            sgpu_labels[(device_id, sgpu_id)] = (device_id, sgpu_id, sgpu_info.minor, uuid, pod_info.pod_name,
+                pod_info.pod_namespace, pod_info.container_name, self.host_name,
+                device_info.driver_version, device_info.bios_version, device_info.name)
 
-    def export_sgpu_info(self, device_id, sgpu_id, metric_gauge, metric_data):
-        self.gauge_labels_set(metric_gauge, self.sgpu_labels[(device_id, sgpu_id)], metric_data)
+        scrape.sgpu_labels = sgpu_labels
 
 
-    def export_kernel_log_info(self, metric):
-        metric.clear()
+    def export_kernel_log_info(self, scrape, metric):
         logs = self.kernel_log_monitor.get_kernel_error_info()
         for log in logs:
-            device_id = self.bdf_device_map.get(log.bdf_id, -1)
-            if device_id in self.common_labels:
-                for common_labels in self.common_labels[(device_id, log.die_id)]:
-                    self.gauge_labels_inc(metric, [log.submodule, log.log_level, *common_labels])
+            device_id = scrape.bdf_device_map.get(log.bdf_id, -1)
+            if device_id in scrape.common_labels:
+                for common_labels in scrape.common_labels.get((device_id, log.die_id), ()):
+                    metric.inc([log.submodule, log.log_level, *common_labels])
             else:
                 print("export_kernel_log_info Invalid device_id %d" % device_id)
                 print(log)
 
 
-    def export_driver_eid_errors(self, metric):
-        metric.clear()
+    def export_driver_eid_errors(self, scrape, metric):
         driver_eid_errors = self.kernel_log_monitor.get_eid_error_info()
         for err in driver_eid_errors:
-            device_id = self.bdf_device_map.get(err.bdf_id, -1)
-            if device_id in self.common_labels:
-                for common_labels in self.common_labels[(device_id, err.die_id)]:
-                    self.gauge_labels_set(metric, [err.eid_info, *common_labels], err.eid)
+            device_id = scrape.bdf_device_map.get(err.bdf_id, -1)
+            if device_id in scrape.common_labels:
+                for common_labels in scrape.common_labels.get((device_id, err.die_id), ()):
+                    metric.set([err.eid_info, *common_labels], err.eid)
             else:
                 print("export_driver_eid_errors Invalid device_id %d" % device_id)
                 print(err)
 
 
-    def export_sdk_eid_errors(self, metric):
-        metric.clear()
+    def export_sdk_eid_errors(self, scrape, metric):
         sdk_eid_errors = self.sys_log_monitor.get_eid_error_info()
         for err in sdk_eid_errors:
-            device_id = self.bdf_device_map.get(err.bdf_id, -1) # ToDo inaccurate for double die device
-            if device_id in self.common_labels:
-                for common_labels in self.common_labels[(device_id,0)]:
-                    self.gauge_labels_set(metric, [err.sdk_version, err.eid_info, *common_labels], err.eid)
+            device_id = scrape.bdf_device_map.get(err.bdf_id, -1) # ToDo inaccurate for double die device
+            if device_id in scrape.common_labels:
+                for common_labels in scrape.common_labels.get((device_id,0), ()):
+                    metric.set([err.sdk_version, err.eid_info, *common_labels], err.eid)
             else:
                 print("export_sdk_eid_errors Invalid device_id %d" % device_id)
                 print(err)
@@ -394,23 +535,3 @@ class MxCollector(object):
                 host_name = ""
 
             return host_name
-
-    def gauge_labels_set(self, gauge, labels, value):
-        configured_label_count = len(gauge._labelnames)
-        current_label_count = len(labels)
-
-        if(current_label_count >= configured_label_count):
-            gauge.labels(*labels[:configured_label_count]).set(value)
-        else:
-            support_labels = labels + ["NA" for _ in range(configured_label_count - current_label_count)]
-            gauge.labels(*support_labels).set(value)
-
-    def gauge_labels_inc(self, gauge, labels):
-        configured_label_count = len(gauge._labelnames)
-        current_label_count = len(labels)
-
-        if(current_label_count >= configured_label_count):
-            gauge.labels(*labels[:configured_label_count]).inc()
-        else:
-            support_labels = labels + ["NA" for _ in range(configured_label_count - current_label_count)]
-            gauge.labels(*support_labels).inc()
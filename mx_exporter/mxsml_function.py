@@ -32,6 +32,14 @@ import sys
 import importlib
 
 
+# the simulated backend only exists in the bindings shipped with mx-exporter,
+# which are next to this file in the image and under dep/ in the source tree
+if os.environ.get("MXSML_SIMULATE", "0") not in ("", "0"):
+    # appended ahead of the installed bindings rather than inserted first, this directory
+    # must not shadow the mx_exporter package for processes inheriting sys.path
+    sys.path.append(os.path.join(os.path.dirname(__file__), "..", "dep"))
+    sys.path.append(os.path.dirname(__file__))
+
 sys.path.append("/opt/maca/include/mxsml")
 sys.path.append("/opt/mxn100/include/mxsml")
 sys.path.append(os.path.dirname(__file__))
@@ -41,165 +49,411 @@ from mxsmlBindings import *
 _module = importlib.import_module("mxsmlBindings")
 
 
+# entry point : present in the loaded bindings, probed once at load
+capabilities = {}
+# wrapper : implementation bound at load
+call_paths = {}
+
+
+def dispatch(wrapper, *paths):
+    # paths are (entry point, implementation), the first one whose entry point is present in
+    # the loaded bindings is bound, an entry point of None is always available
+    for entry_point, function in paths:
+        if entry_point is not None:
+            if entry_point not in capabilities:
+                capabilities[entry_point] = hasattr(_module, entry_point)
+            if not capabilities[entry_point]:
+                continue
+        call_paths[wrapper] = function.__name__
+        return function
+    raise RuntimeError("No call path for %s" % wrapper)
+
+
+def get_mxsml_capabilities():
+    return {"entry_points": dict(capabilities), "call_paths": dict(call_paths)}
+
+
+class BufferArena:
+    """ctypes buffers handed to mxsml, allocated on first use and reused by later cycles
+
+    Keys start with the device id and a device is sampled by one thread at a time, so a
+    buffer is never used by two calls in flight. Results returned by the wrappers point
+    into the arena and stay valid until the same query runs again for the same device.
+    """
+
+    def __init__(self):
+        self.buffers = {}
+
+    def get(self, key, factory):
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            buffer = factory()
+            self.buffers[key] = buffer
+        return buffer
+
+    def release(self):
+        # drop buffers of devices that are gone, called when devices are enumerated again
+        self.buffers = {}
+
+
+buffer_arena = BufferArena()
+
+
+class QueryCache:
+    """Results of the mxsml queries issued in the running gather cycle, keyed by (wrapper, arguments)
+
+    Metrics sharing a query read it through the cache, so a query runs at most once per
+    cycle for the same arguments. Results may point into the buffer arena, which keeps them
+    valid because nothing else issues the same query again before the next cycle.
+    """
+
+    def __init__(self):
+        self.results = {}
+
+    def call(self, wrapper, *args):
+        key = (wrapper, args)
+        result = self.results.get(key, self)
+        if result is self:
+            result = wrapper(*args)
+            self.results[key] = result
+        return result
+
+    def clear(self):
+        # called by the gather thread before the devices of a cycle are sampled
+        self.results = {}
+
+
+query_cache = QueryCache()
+
+
+def _clock_buffer():
+    return (c_uint * 8)()
+
+
+def _metaxlink_bandwidth_buffer():
+    return (MxSmlMetaXLinkBandwidth * METAX_LINK_NUM)()
+
+
+def _metaxlink_traffic_stat_buffer():
+    return (MxSmlMetaXLinkTrafficStat * METAX_LINK_NUM)()
+
+
+def _metaxlink_aer_buffer():
+    return (MxSmlMetaXLinkAer * METAX_LINK_NUM)()
+
+
+def _pci_event_buffer():
+    return (MxSmlPciEventInfo * 32)()
+
+
+def _optical_module_status_buffer():
+    return (MxSmlOpticalModuleStatus * 3)()
+
+
+def _board_power_buffer():
+    return (MxSmlBoardWayElectricInfo * 3)()
+
+
+def _process_buffer():
+    return (MxSmlProcessInfo_v2 * 32)()
+
+
 def mxsml_get_error_string(ret):
     return mxSmlGetErrorString(ret).decode('ASCII')
 
 
-def mxsml_get_device_die_count(device_id): # ret: (MxSmlReturn, int)
-    if hasattr(_module, "mxSmlGetDeviceDieCount"):
-        die_count = c_uint()
-        ret = mxSmlGetDeviceDieCount(device_id, byref(die_count))
-        return (ret, die_count.value)
-    else:
-        return (MxSmlReturn.MXSML_Success, 1)
+def _get_device_die_count(device_id):
+    die_count = c_uint()
+    ret = mxSmlGetDeviceDieCount(device_id, byref(die_count))
+    return (ret, die_count.value)
 
 
-def mxsml_get_die_version(device_id, die_id, unit): # ret: (MxSmlReturn, string)
-    if hasattr(_module, "mxSmlGetDeviceDieVersion"):
-        size = c_uint(64)
-        entrylist = []
-        version = (c_char * 64)(*entrylist)
-        ret = mxSmlGetDeviceDieVersion(device_id, die_id, unit, version, size)
-        return (ret, version.value.decode('ASCII'))
-    else:
-        size = c_uint(64)
-        entrylist = []
-        version = (c_char * 64)(*entrylist)
-        ret = mxSmlGetDeviceVersion(device_id, unit, version, size)
-        return (ret, version.value.decode('ASCII'))
-
-
-def mxsml_get_die_memory_info(device_id, die_id): # ret: (MxSmlReturn, MxSmlMemoryInfo)
-    if hasattr(_module, "mxSmlGetDieMemoryInfo"):
-        info = MxSmlMemoryInfo()
-        ret = mxSmlGetDieMemoryInfo(device_id, die_id, byref(info))
-        return (ret, info)
-    else:
-        info = MxSmlMemoryInfo()
-        ret = mxSmlGetMemoryInfo(device_id, byref(info))
-        return (ret, info)
+def _get_single_die_count(device_id):
+    return (MxSmlReturn.MXSML_Success, 1)
+
+
+mxsml_get_device_die_count = dispatch("mxsml_get_device_die_count", # ret: (MxSmlReturn, int)
+    ("mxSmlGetDeviceDieCount", _get_device_die_count),
+    (None, _get_single_die_count))
+
+
+def _get_die_version(device_id, die_id, unit):
+    size = c_uint(64)
+    entrylist = []
+    version = (c_char * 64)(*entrylist)
+    ret = mxSmlGetDeviceDieVersion(device_id, die_id, unit, version, size)
+    return (ret, version.value.decode('ASCII'))
+
+
+def _get_device_version(device_id, die_id, unit):
+    size = c_uint(64)
+    entrylist = []
+    version = (c_char * 64)(*entrylist)
+    ret = mxSmlGetDeviceVersion(device_id, unit, version, size)
+    return (ret, version.value.decode('ASCII'))
+
+
+mxsml_get_die_version = dispatch("mxsml_get_die_version", # ret: (MxSmlReturn, string)
+    ("mxSmlGetDeviceDieVersion", _get_die_version),
+    (None, _get_device_version))
+
+
+def _get_die_memory_info(device_id, die_id):
+    info = buffer_arena.get((device_id, "memory_info", die_id), MxSmlMemoryInfo)
+    ret = mxSmlGetDieMemoryInfo(device_id, die_id, byref(info))
+    return (ret, info)
+
+
+def mxsml_get_device_memory_info(device_id): # ret: (MxSmlReturn, MxSmlMemoryInfo)
+    info = buffer_arena.get((device_id, "memory_info"), MxSmlMemoryInfo)
+    ret = mxSmlGetMemoryInfo(device_id, byref(info))
+    return (ret, info)
+
+
+def _get_device_memory_info(device_id, die_id):
+    return query_cache.call(mxsml_get_device_memory_info, device_id)
+
+
+mxsml_get_die_memory_info = dispatch("mxsml_get_die_memory_info", # ret: (MxSmlReturn, MxSmlMemoryInfo)
+    ("mxSmlGetDieMemoryInfo", _get_die_memory_info),
+    (None, _get_device_memory_info))
 
 
 def mxsml_get_device_metaxlink_info(device_id): # ret: (MxSmlReturn, MxSmlMetaXLinkInfo)
-    mxlk_info = MxSmlMetaXLinkInfo()
+    mxlk_info = buffer_arena.get((device_id, "metaxlink_info"), MxSmlMetaXLinkInfo)
     ret = mxSmlGetMetaXLinkInfo(device_id, byref(mxlk_info))
     return(ret, mxlk_info)
 
 
+def mxsml_get_device_pcie_info(device_id): # ret: (MxSmlReturn, MxSmlPcieInfo)
+    pcie_info = buffer_arena.get((device_id, "pcie_info"), MxSmlPcieInfo)
+    ret = mxSmlGetPcieInfo(device_id, byref(pcie_info))
+    return (ret, pcie_info)
+
+
+def mxsml_get_device_pcie_max_link_info(device_id): # ret: (MxSmlReturn, MxSmlPcieInfo)
+    pcie_info = buffer_arena.get((device_id, "pcie_max_link_info"), MxSmlPcieInfo)
+    ret = mxSmlGetPcieMaxLinkInfo(device_id, byref(pcie_info))
+    return (ret, pcie_info)
+
+
+def mxsml_get_device_pcie_throughput(device_id): # ret: (MxSmlReturn, MxSmlPcieThroughput)
+    pcieThroughput = buffer_arena.get((device_id, "pcie_throughput"), MxSmlPcieThroughput)
+    ret = mxSmlGetPcieThroughput(device_id, byref(pcieThroughput))
+    return (ret, pcieThroughput)
+
+
+def mxsml_get_device_eth_throughput(device_id): # ret: (MxSmlReturn, MxSmlEthThroughput)
+    ethThroughput = buffer_arena.get((device_id, "eth_throughput"), MxSmlEthThroughput)
+    ret = mxSmlGetEthThroughput(device_id, byref(ethThroughput))
+    return (ret, ethThroughput)
+
+
+def mxsml_get_die_hbm_bandwidth(device_id, die_id): # ret: (MxSmlReturn, MxSmlHbmBandwidth)
+    hbmThroughput = buffer_arena.get((device_id, "hbm_bandwidth", die_id), MxSmlHbmBandwidth)
+    ret = mxSmlGetDieHbmBandWidth(device_id, die_id, byref(hbmThroughput))
+    return (ret, hbmThroughput)
+
+
+def mxsml_get_device_optical_module_status(device_id): # ret: (MxSmlReturn, MxSmlOpticalModuleStatus*, int)
+    omInfo = buffer_arena.get((device_id, "optical_module_status"), _optical_module_status_buffer)
+    omInfoSize = c_uint(3)
+    ret = mxSmlGetOpticalModuleStatus(device_id, omInfo, byref(omInfoSize))
+    return (ret, omInfo, omInfoSize.value)
+
+
+def mxsml_get_device_board_power_info(device_id): # ret: (MxSmlReturn, MxSmlBoardWayElectricInfo*, int)
+    boardPowerInfo = buffer_arena.get((device_id, "board_power_info"), _board_power_buffer)
+    BoardWaySize = c_uint(3)
+    ret = mxSmlGetBoardPowerInfo(device_id, byref(BoardWaySize), boardPowerInfo)
+    return (ret, boardPowerInfo, BoardWaySize.value)
+
+
+def mxsml_get_device_process_info(device_id): # ret: (MxSmlReturn, MxSmlProcessInfo_v2*, int)
+    processNumber = c_uint(32)
+    processInfo = buffer_arena.get((device_id, "process_info"), _process_buffer)
+    ret = mxSmlGetSingleGpuProcess_v2(device_id, processNumber, processInfo)
+    return (ret, processInfo, processNumber.value)
+
+
+def mxsml_get_device_state(device_id): # ret: (MxSmlReturn, int)
+    deviceState = buffer_arena.get((device_id, "device_state"), c_int)
+    ret = mxSmlGetDeviceState(device_id, byref(deviceState))
+    return (ret, deviceState.value)
+
+
 def mxsml_get_device_temperature_info(device_id, sensor): # ret: (MxSmlReturn, int)
-    temp = c_int(0)
+    temp = buffer_arena.get((device_id, "temperature", sensor), c_int)
     ret = mxSmlGetTemperatureInfo(device_id, sensor, temp)
     return (ret, temp.value)
 
 
-def mxsml_get_die_temperature_info(device_id, die_id, sensor): # ret: (MxSmlReturn, int)
-    if hasattr(_module, "mxSmlGetDieTemperatureInfo"):
-        temp = c_int(0)
-        ret = mxSmlGetDieTemperatureInfo(device_id, die_id, sensor, temp)
-        return (ret, temp.value)
-    else:
-        return mxsml_get_device_temperature_info(device_id, sensor)
+def _get_die_temperature_info(device_id, die_id, sensor):
+    temp = buffer_arena.get((device_id, "die_temperature", die_id, sensor), c_int)
+    ret = mxSmlGetDieTemperatureInfo(device_id, die_id, sensor, temp)
+    return (ret, temp.value)
+
+
+def _get_device_temperature_info(device_id, die_id, sensor):
+    return query_cache.call(mxsml_get_device_temperature_info, device_id, sensor)
+
+
+mxsml_get_die_temperature_info = dispatch("mxsml_get_die_temperature_info", # ret: (MxSmlReturn, int)
+    ("mxSmlGetDieTemperatureInfo", _get_die_temperature_info),
+    (None, _get_device_temperature_info))
 
 
 def mxsml_get_device_ip_usage(device_id, ip): # ret: (MxSmlReturn, int)
-    usage = c_int(0)
+    usage = buffer_arena.get((device_id, "ip_usage", ip), c_int)
     ret = mxSmlGetDeviceIpUsage(device_id, ip, usage)
     return (ret, usage.value)
 
 
-def mxsml_get_die_ip_usage(device_id, die_id, ip): # ret: (MxSmlReturn, int)
-    if hasattr(_module, "mxSmlGetDieIpUsage"):
-        usage = c_int(0)
-        ret = mxSmlGetDieIpUsage(device_id, die_id, ip, usage)
-        return (ret, usage.value)
-    else:
-        return mxsml_get_device_ip_usage(device_id, ip)
+def _get_die_ip_usage(device_id, die_id, ip):
+    usage = buffer_arena.get((device_id, "die_ip_usage", die_id, ip), c_int)
+    ret = mxSmlGetDieIpUsage(device_id, die_id, ip, usage)
+    return (ret, usage.value)
+
+
+def _get_device_ip_usage(device_id, die_id, ip):
+    return query_cache.call(mxsml_get_device_ip_usage, device_id, ip)
+
 
+mxsml_get_die_ip_usage = dispatch("mxsml_get_die_ip_usage", # ret: (MxSmlReturn, int)
+    ("mxSmlGetDieIpUsage", _get_die_ip_usage),
+    (None, _get_device_ip_usage))
 
-def mxsml_get_device_clocks(device_id, ip): # ret: (MxSmlReturn, List[int])
+
+def mxsml_get_device_clocks(device_id, ip): # ret: (MxSmlReturn, c_uint*8)
     clocksSize = c_uint(8)
-    clocksMhz = (c_uint * 8)()
+    clocksMhz = buffer_arena.get((device_id, "clocks", ip), _clock_buffer)
     ret = mxSmlGetClocks(device_id, ip, clocksSize, clocksMhz)
-    return (ret, [clockMhz for clockMhz in clocksMhz])
+    return (ret, clocksMhz)
 
 
-def mxsml_get_die_clocks(device_id, die_id, ip): # ret: (MxSmlReturn, List[int])
-    if hasattr(_module, "mxSmlGetDieClocks"):
-        clocksSize = c_uint(8)
-        clocksMhz = (c_uint * 8)()
-        ret = mxSmlGetDieClocks(device_id, die_id, ip, clocksSize, clocksMhz)
-        return (ret, [clockMhz for clockMhz in clocksMhz])
-    else:
-        return mxsml_get_device_clocks(device_id, ip)
+def _get_die_clocks(device_id, die_id, ip):
+    clocksSize = c_uint(8)
+    clocksMhz = buffer_arena.get((device_id, "die_clocks", die_id, ip), _clock_buffer)
+    ret = mxSmlGetDieClocks(device_id, die_id, ip, clocksSize, clocksMhz)
+    return (ret, clocksMhz)
+
+
+def _get_device_clocks(device_id, die_id, ip):
+    return query_cache.call(mxsml_get_device_clocks, device_id, ip)
+
+
+mxsml_get_die_clocks = dispatch("mxsml_get_die_clocks", # ret: (MxSmlReturn, c_uint*8)
+    ("mxSmlGetDieClocks", _get_die_clocks),
+    (None, _get_device_clocks))
 
 
 def mxsml_get_device_metaxlink_bandwidth(device_id, mxlk_type): # ret: (MxSmlReturn, int, MxSmlMetaXLinkBandwidth*)
-    entryList = []
-    bandwidth = (MxSmlMetaXLinkBandwidth* METAX_LINK_NUM)(*entryList)
+    bandwidth = buffer_arena.get((device_id, "metaxlink_bandwidth", mxlk_type), _metaxlink_bandwidth_buffer)
     linkSize = c_uint(8)
     ret = mxSmlGetMetaXLinkBandwidth(device_id, mxlk_type, linkSize, bandwidth)
     return (ret, linkSize.value, bandwidth)
 
 
-def mxsml_get_device_metaxlink_traffic_stat(device_id, mxlk_type): # ret: (MxSmlReturn, int, MxSmlMetaXLinkTrafficStat*)
-    if hasattr(_module, "mxSmlGetMetaXLinkTrafficStat"):
-        entryList = []
-        stat = (MxSmlMetaXLinkTrafficStat* METAX_LINK_NUM)(*entryList)
-        linkSize = c_uint(METAX_LINK_NUM)
-        ret = mxSmlGetMetaXLinkTrafficStat(device_id, mxlk_type, byref(linkSize), stat)
-        return (ret, linkSize.value, stat)
-    else:
-        return (MxSmlReturn.MXSML_OperationNotSupport, 0, [])
+def _get_metaxlink_traffic_stat(device_id, mxlk_type):
+    stat = buffer_arena.get((device_id, "metaxlink_traffic_stat", mxlk_type), _metaxlink_traffic_stat_buffer)
+    linkSize = c_uint(METAX_LINK_NUM)
+    ret = mxSmlGetMetaXLinkTrafficStat(device_id, mxlk_type, byref(linkSize), stat)
+    return (ret, linkSize.value, stat)
 
 
-def mxsml_get_device_metaxlink_aer(device_id): # ret: (MxSmlReturn, int, mxlkAer*)
-    if hasattr(_module, "mxSmlGetMetaXLinkAer"):
-        entryList = []
-        mxlkAer = (MxSmlMetaXLinkAer* METAX_LINK_NUM)(*entryList)
-        linkSize = c_uint(METAX_LINK_NUM)
-        ret = mxSmlGetMetaXLinkAer(device_id, linkSize, mxlkAer)
-        return (ret, linkSize.value, mxlkAer)
-    else:
-        return (MxSmlReturn.MXSML_OperationNotSupport, 0, None)
-
-
-def mxsml_get_current_clocks_throttle_reason(device_id, die_id): # ret: (MxSmlReturn, int)
-    if hasattr(_module, "mxSmlGetDieCurrentClocksThrottleReason"):
-        clocksThrottleReason = c_ulonglong(0)
-        ret = mxSmlGetDieCurrentClocksThrottleReason(device_id, die_id, byref(clocksThrottleReason))
-        return (ret, clocksThrottleReason.value)
-    if hasattr(_module, "mxSmlGetCurrentClocksThrottleReason"):
-        clocksThrottleReason = c_ulonglong(0)
-        ret = mxSmlGetCurrentClocksThrottleReason(device_id, byref(clocksThrottleReason))
-        return (ret, clocksThrottleReason.value)
-    else:
-        return (MxSmlReturn.MXSML_OperationNotSupport, 0)
+def _metaxlink_traffic_stat_not_supported(device_id, mxlk_type):
+    return (MxSmlReturn.MXSML_OperationNotSupport, 0, [])
 
 
-def mxsml_get_die_total_ecc_errors(device_id, die_id): # ret: (MxSmlReturn, MxSmlEccErrorCount)
-    if hasattr(_module, "mxSmlGetDieTotalEccErrors"):
-        eccCounts = MxSmlEccErrorCount()
-        ret = mxSmlGetDieTotalEccErrors(device_id, die_id, byref(eccCounts))
-        return (ret, eccCounts)
-    else:
-        return (MxSmlReturn.MXSML_OperationNotSupport, None)
+mxsml_get_device_metaxlink_traffic_stat = dispatch("mxsml_get_device_metaxlink_traffic_stat", # ret: (MxSmlReturn, int, MxSmlMetaXLinkTrafficStat*)
+    ("mxSmlGetMetaXLinkTrafficStat", _get_metaxlink_traffic_stat),
+    (None, _metaxlink_traffic_stat_not_supported))
 
 
-def mxsml_get_device_metaxlink_topo(device_id): # ret: (MxSmlReturn, MxSmlMetaXLinkTopo)
-    if hasattr(_module, "mxSmlGetMetaXLinkTopo"):
-        topoInfo = MxSmlMetaXLinkTopo()
-        ret = mxSmlGetMetaXLinkTopo(device_id, byref(topoInfo))
-        return (ret, topoInfo)
-    else:
-        return (MxSmlReturn.MXSML_OperationNotSupport, None)
+def _get_metaxlink_aer(device_id):
+    mxlkAer = buffer_arena.get((device_id, "metaxlink_aer"), _metaxlink_aer_buffer)
+    linkSize = c_uint(METAX_LINK_NUM)
+    ret = mxSmlGetMetaXLinkAer(device_id, linkSize, mxlkAer)
+    return (ret, linkSize.value, mxlkAer)
 
 
-def mxsml_get_sgpu_count(device_id): # ret: sgpu count
-    if hasattr(_module, "mxSmlGetSgpuCount"):
-        sgpu_count = mxSmlGetSgpuCount(device_id)
-        return sgpu_count
-    else:
-        return -1
+def _metaxlink_aer_not_supported(device_id):
+    return (MxSmlReturn.MXSML_OperationNotSupport, 0, None)
+
+
+mxsml_get_device_metaxlink_aer = dispatch("mxsml_get_device_metaxlink_aer", # ret: (MxSmlReturn, int, mxlkAer*)
+    ("mxSmlGetMetaXLinkAer", _get_metaxlink_aer),
+    (None, _metaxlink_aer_not_supported))
+
+
+def _get_die_clocks_throttle_reason(device_id, die_id):
+    clocksThrottleReason = buffer_arena.get((device_id, "clocks_throttle_reason", die_id), c_ulonglong)
+    ret = mxSmlGetDieCurrentClocksThrottleReason(device_id, die_id, byref(clocksThrottleReason))
+    return (ret, clocksThrottleReason.value)
+
+
+def _device_clocks_throttle_reason(device_id):
+    clocksThrottleReason = buffer_arena.get((device_id, "clocks_throttle_reason"), c_ulonglong)
+    ret = mxSmlGetCurrentClocksThrottleReason(device_id, byref(clocksThrottleReason))
+    return (ret, clocksThrottleReason.value)
+
+
+def _get_device_clocks_throttle_reason(device_id, die_id):
+    return query_cache.call(_device_clocks_throttle_reason, device_id)
+
+
+def _clocks_throttle_reason_not_supported(device_id, die_id):
+    return (MxSmlReturn.MXSML_OperationNotSupport, 0)
+
+
+mxsml_get_current_clocks_throttle_reason = dispatch("mxsml_get_current_clocks_throttle_reason", # ret: (MxSmlReturn, int)
+    ("mxSmlGetDieCurrentClocksThrottleReason", _get_die_clocks_throttle_reason),
+    ("mxSmlGetCurrentClocksThrottleReason", _get_device_clocks_throttle_reason),
+    (None, _clocks_throttle_reason_not_supported))
+
+
+def _get_die_total_ecc_errors(device_id, die_id):
+    eccCounts = buffer_arena.get((device_id, "total_ecc_errors", die_id), MxSmlEccErrorCount)
+    ret = mxSmlGetDieTotalEccErrors(device_id, die_id, byref(eccCounts))
+    return (ret, eccCounts)
+
+
+def _total_ecc_errors_not_supported(device_id, die_id):
+    return (MxSmlReturn.MXSML_OperationNotSupport, None)
+
+
+mxsml_get_die_total_ecc_errors = dispatch("mxsml_get_die_total_ecc_errors", # ret: (MxSmlReturn, MxSmlEccErrorCount)
+    ("mxSmlGetDieTotalEccErrors", _get_die_total_ecc_errors),
+    (None, _total_ecc_errors_not_supported))
+
+
+def _get_metaxlink_topo(device_id):
+    topoInfo = MxSmlMetaXLinkTopo()
+    ret = mxSmlGetMetaXLinkTopo(device_id, byref(topoInfo))
+    return (ret, topoInfo)
+
+
+def _metaxlink_topo_not_supported(device_id):
+    return (MxSmlReturn.MXSML_OperationNotSupport, None)
+
+
+mxsml_get_device_metaxlink_topo = dispatch("mxsml_get_device_metaxlink_topo", # ret: (MxSmlReturn, MxSmlMetaXLinkTopo)
+    ("mxSmlGetMetaXLinkTopo", _get_metaxlink_topo),
+    (None, _metaxlink_topo_not_supported))
+
+
+def _get_sgpu_count(device_id):
+    sgpu_count = mxSmlGetSgpuCount(device_id)
+    return sgpu_count
+
+
+def _sgpu_count_not_supported(device_id):
+    return -1
+
+
+mxsml_get_sgpu_count = dispatch("mxsml_get_sgpu_count", # ret: sgpu count
+    ("mxSmlGetSgpuCount", _get_sgpu_count),
+    (None, _sgpu_count_not_supported))
 
 
 def mxsml_get_sgpu_info(device_id, sgpu_id): # ret: (MxSmlReturn, MxSmlSgpuInfo)
@@ -208,6 +462,18 @@ def mxsml_get_sgpu_info(device_id, sgpu_id): # ret: (MxSmlReturn, MxSmlSgpuInfo)
     return (ret, sgpuInfo)
 
 
+def mxsml_get_sgpu_usage(device_id, sgpu_id): # ret: (MxSmlReturn, int)
+    usage = buffer_arena.get((device_id, "sgpu_usage", sgpu_id), c_int)
+    ret = mxSmlGetSgpuUsage(device_id, sgpu_id, byref(usage))
+    return (ret, usage.value)
+
+
+def mxsml_get_sgpu_memory(device_id, sgpu_id): # ret: (MxSmlReturn, MxSmlSgpuMemoryInfo)
+    memory = buffer_arena.get((device_id, "sgpu_memory", sgpu_id), MxSmlSgpuMemoryInfo)
+    ret = mxSmlGetSgpuMemory(device_id, sgpu_id, byref(memory))
+    return (ret, memory)
+
+
 def mxsml_get_sgpu_annotations_id(device_id, sgpu_id): # ret: annotations id
     size = c_uint(96)
     entrylist = []
@@ -216,37 +482,54 @@ def mxsml_get_sgpu_annotations_id(device_id, sgpu_id): # ret: annotations id
     return annotations_id.value.decode('ASCII')
 
 
-def mxsml_get_local_and_multiple_remote_uuid(): # ret: (MxSmlReturn, string, string, string)
-    if hasattr(_module, "mxSmlGetLocalAndMultipleRemoteUuid"):
-        entrylist = []
-        localUuid = (c_char * 64)(*entrylist)
-        remoteUuid1 = (c_char * 64)(*entrylist)
-        remoteUuid2 = (c_char * 64)(*entrylist)
-        remotes = (POINTER(c_char)*2)(*[remoteUuid1, remoteUuid2])
-        remotesSize = c_uint(2)
-        uuidSize = c_uint(64)
-        ret = mxSmlGetLocalAndMultipleRemoteUuid(localUuid, remotes, byref(remotesSize), byref(uuidSize))
-        return (ret, localUuid.value.decode('ASCII'), remoteUuid1.value.decode('ASCII'), remoteUuid2.value.decode('ASCII'))
-    else:
-        return (MxSmlReturn.MXSML_OperationNotSupport, "", "", "")
+def _get_local_and_multiple_remote_uuid():
+    entrylist = []
+    localUuid = (c_char * 64)(*entrylist)
+    remoteUuid1 = (c_char * 64)(*entrylist)
+    remoteUuid2 = (c_char * 64)(*entrylist)
+    remotes = (POINTER(c_char)*2)(*[remoteUuid1, remoteUuid2])
+    remotesSize = c_uint(2)
+    uuidSize = c_uint(64)
+    ret = mxSmlGetLocalAndMultipleRemoteUuid(localUuid, remotes, byref(remotesSize), byref(uuidSize))
+    return (ret, localUuid.value.decode('ASCII'), remoteUuid1.value.decode('ASCII'), remoteUuid2.value.decode('ASCII'))
 
 
-def mxsml_init(): # ret: MxSmlReturn
-    if hasattr(_module, "mxSmlInitWithFlags"):
-        return mxSmlInitWithFlags(1)
-    else:
-        return mxSmlInit()
+def _remote_uuid_not_supported():
+    return (MxSmlReturn.MXSML_OperationNotSupport, "", "", "")
 
 
-def mxsml_get_device_pci_event(device_id, event_type): # ret: (MxSmlReturn, MxSmlPciEventInfo*, int)
-    if hasattr(_module, "mxSmlGetPciEventInfo"):
-        entrylist = []
-        eventInfo = (MxSmlPciEventInfo*32)(*entrylist)
-        size = c_uint(32)
-        ret = mxSmlGetPciEventInfo(device_id, event_type, eventInfo, byref(size))
-        return (ret, eventInfo, size.value)
-    else:
-        return (MxSmlReturn.MXSML_OperationNotSupport, None, 0)
+mxsml_get_local_and_multiple_remote_uuid = dispatch("mxsml_get_local_and_multiple_remote_uuid", # ret: (MxSmlReturn, string, string, string)
+    ("mxSmlGetLocalAndMultipleRemoteUuid", _get_local_and_multiple_remote_uuid),
+    (None, _remote_uuid_not_supported))
+
+
+def _init_with_flags():
+    return mxSmlInitWithFlags(1)
+
+
+def _init():
+    return mxSmlInit()
+
+
+mxsml_init = dispatch("mxsml_init", # ret: MxSmlReturn
+    ("mxSmlInitWithFlags", _init_with_flags),
+    (None, _init))
+
+
+def _get_pci_event(device_id, event_type):
+    eventInfo = buffer_arena.get((device_id, "pci_event", event_type), _pci_event_buffer)
+    size = c_uint(32)
+    ret = mxSmlGetPciEventInfo(device_id, event_type, eventInfo, byref(size))
+    return (ret, eventInfo, size.value)
+
+
+def _pci_event_not_supported(device_id, event_type):
+    return (MxSmlReturn.MXSML_OperationNotSupport, None, 0)
+
+
+mxsml_get_device_pci_event = dispatch("mxsml_get_device_pci_event", # ret: (MxSmlReturn, MxSmlPciEventInfo*, int)
+    ("mxSmlGetPciEventInfo", _get_pci_event),
+    (None, _pci_event_not_supported))
 
 
 ras_register_name_map = {
@@ -294,87 +577,131 @@ def __parse_ras_error_data(ras_data):
     return ras_error_data
 
 
-def mxsml_get_die_ras_count(device_id, die_id): # ret: (MxSmlReturn, List[Tuple[str, int]])
-    if hasattr(_module, "mxSmlGetDieRasErrorData"):
-        device_RasErrorData = MxSmlRasErrorData()
-        ret = mxSmlGetDieRasErrorData(device_id, die_id, byref(device_RasErrorData))
-        if ret == MxSmlReturn.MXSML_Success:
-            return (ret, __parse_ras_error_data(device_RasErrorData))
-        else:
-            return (ret, [])
-    elif hasattr(_module, "mxSmlGetRasErrorData"):
-        device_RasErrorData = MxSmlRasErrorData()
-        ret = mxSmlGetRasErrorData(device_id, byref(device_RasErrorData))
-        if ret == MxSmlReturn.MXSML_Success:
-            return (ret, __parse_ras_error_data(device_RasErrorData))
-        else:
-            return (ret, [])
+def _get_die_ras_count(device_id, die_id):
+    device_RasErrorData = buffer_arena.get((device_id, "ras_error_data", die_id), MxSmlRasErrorData)
+    ret = mxSmlGetDieRasErrorData(device_id, die_id, byref(device_RasErrorData))
+    if ret == MxSmlReturn.MXSML_Success:
+        return (ret, __parse_ras_error_data(device_RasErrorData))
     else:
-        return (MxSmlReturn.MXSML_OperationNotSupport, None)
-
-
-def mxsml_get_die_ras_status(device_id, die_id): # ret: (MxSmlReturn, List[Tuple[str, int]])
-    if hasattr(_module, "mxSmlGetDieRasStatusData"):
-        device_RasStatusData = MxSmlRasStatusData()
-        ret = mxSmlGetDieRasStatusData(device_id, die_id, byref(device_RasStatusData))
-        ras_status = []
-        if ret == MxSmlReturn.MXSML_Success:
-            for index in range(device_RasStatusData.showRasStatusSize):
-                ras_register_name = (str(ras_register_name_map[device_RasStatusData.rasStatusRegister[index].rasIp.value])
-                                     + " reg" + str(device_RasStatusData.rasStatusRegister[index].registerIndex))
-                ras_status += [(ras_register_name, device_RasStatusData.rasStatusRegister[index].registerData)]
-        return (ret, ras_status)
-    elif hasattr(_module, "mxSmlGetRasStatusData"):
-        device_RasStatusData = MxSmlRasStatusData()
-        ret = mxSmlGetRasStatusData(device_id, byref(device_RasStatusData))
-        ras_status = []
-        if ret == MxSmlReturn.MXSML_Success:
-            for index in range(device_RasStatusData.showRasStatusSize):
-                ras_register_name = (str(ras_register_name_map[device_RasStatusData.rasStatusRegister[index].rasIp.value])
-                                     + " reg" + str(device_RasStatusData.rasStatusRegister[index].registerIndex))
-                ras_status += [(ras_register_name, device_RasStatusData.rasStatusRegister[index].registerData)]
-        return (ret, ras_status)
-    else:
-        return (MxSmlReturn.MXSML_OperationNotSupport, None)
+        return (ret, [])
 
 
-def mxsml_get_die_unavailable_reason(device_id, die_id): # ret: (MxSmlReturn, str)
-    if hasattr(_module, "mxSmlGetDieUnavailableReason"):
-        unavailable_reason = ""
-        sml_unavailable_reason = MxSmlDeviceUnavailableReasonInfo()
-        ret = mxSmlGetDieUnavailableReason(device_id, die_id, byref(sml_unavailable_reason))
-        if ret == MxSmlReturn.MXSML_Success:
-            unavailable_reason = sml_unavailable_reason.unavailableReason.decode('ASCII')
-        return (ret, unavailable_reason)
+def _device_ras_count(device_id):
+    device_RasErrorData = buffer_arena.get((device_id, "ras_error_data"), MxSmlRasErrorData)
+    ret = mxSmlGetRasErrorData(device_id, byref(device_RasErrorData))
+    if ret == MxSmlReturn.MXSML_Success:
+        return (ret, __parse_ras_error_data(device_RasErrorData))
     else:
-        return (MxSmlReturn.MXSML_OperationNotSupport, unavailable_reason)
+        return (ret, [])
+
+
+def _get_device_ras_count(device_id, die_id):
+    return query_cache.call(_device_ras_count, device_id)
+
+
+def _ras_count_not_supported(device_id, die_id):
+    return (MxSmlReturn.MXSML_OperationNotSupport, None)
+
+
+mxsml_get_die_ras_count = dispatch("mxsml_get_die_ras_count", # ret: (MxSmlReturn, List[Tuple[str, int]])
+    ("mxSmlGetDieRasErrorData", _get_die_ras_count),
+    ("mxSmlGetRasErrorData", _get_device_ras_count),
+    (None, _ras_count_not_supported))
+
+
+def _get_die_ras_status(device_id, die_id):
+    device_RasStatusData = buffer_arena.get((device_id, "ras_status_data", die_id), MxSmlRasStatusData)
+    ret = mxSmlGetDieRasStatusData(device_id, die_id, byref(device_RasStatusData))
+    ras_status = []
+    if ret == MxSmlReturn.MXSML_Success:
+        for index in range(device_RasStatusData.showRasStatusSize):
+            ras_register_name = (str(ras_register_name_map[device_RasStatusData.rasStatusRegister[index].rasIp.value])
+                                 + " reg" + str(device_RasStatusData.rasStatusRegister[index].registerIndex))
+            ras_status += [(ras_register_name, device_RasStatusData.rasStatusRegister[index].registerData)]
+    return (ret, ras_status)
+
+
+def _device_ras_status(device_id):
+    device_RasStatusData = buffer_arena.get((device_id, "ras_status_data"), MxSmlRasStatusData)
+    ret = mxSmlGetRasStatusData(device_id, byref(device_RasStatusData))
+    ras_status = []
+    if ret == MxSmlReturn.MXSML_Success:
+        for index in range(device_RasStatusData.showRasStatusSize):
+            ras_register_name = (str(ras_register_name_map[device_RasStatusData.rasStatusRegister[index].rasIp.value])
+                                 + " reg" + str(device_RasStatusData.rasStatusRegister[index].registerIndex))
+            ras_status += [(ras_register_name, device_RasStatusData.rasStatusRegister[index].registerData)]
+    return (ret, ras_status)
+
+
+def _get_device_ras_status(device_id, die_id):
+    return query_cache.call(_device_ras_status, device_id)
+
+
+def _ras_status_not_supported(device_id, die_id):
+    return (MxSmlReturn.MXSML_OperationNotSupport, None)
+
+
+mxsml_get_die_ras_status = dispatch("mxsml_get_die_ras_status", # ret: (MxSmlReturn, List[Tuple[str, int]])
+    ("mxSmlGetDieRasStatusData", _get_die_ras_status),
+    ("mxSmlGetRasStatusData", _get_device_ras_status),
+    (None, _ras_status_not_supported))
+
+
+def _get_die_unavailable_reason(device_id, die_id):
+    unavailable_reason = ""
+    sml_unavailable_reason = buffer_arena.get((device_id, "unavailable_reason", die_id), MxSmlDeviceUnavailableReasonInfo)
+    ret = mxSmlGetDieUnavailableReason(device_id, die_id, byref(sml_unavailable_reason))
+    if ret == MxSmlReturn.MXSML_Success:
+        unavailable_reason = sml_unavailable_reason.unavailableReason.decode('ASCII')
+    return (ret, unavailable_reason)
+
+
+def _unavailable_reason_not_supported(device_id, die_id):
+    return (MxSmlReturn.MXSML_OperationNotSupport, "")
+
+
+mxsml_get_die_unavailable_reason = dispatch("mxsml_get_die_unavailable_reason", # ret: (MxSmlReturn, str)
+    ("mxSmlGetDieUnavailableReason", _get_die_unavailable_reason),
+    (None, _unavailable_reason_not_supported))
 
 
 def mxsml_get_device_current_dpm_ip_perf_level(device_id, ip): # ret: (MxSmlReturn, int)
-    dpmIpPerfLevel = c_uint(0)
+    dpmIpPerfLevel = buffer_arena.get((device_id, "dpm_ip_perf_level", ip), c_uint)
     ret = mxSmlGetCurrentDpmIpPerfLevel(device_id, ip, byref(dpmIpPerfLevel))
     return (ret, dpmIpPerfLevel.value)
 
 
-def mxsml_get_die_current_dpm_ip_perf_level(device_id, die_id, ip): # ret: (MxSmlReturn, int)
-    if hasattr(_module, "mxSmlGetCurrentDieDpmIpPerfLevel"):
-        dpmIpPerfLevel = c_uint(0)
-        ret = mxSmlGetCurrentDieDpmIpPerfLevel(device_id, die_id, ip, byref(dpmIpPerfLevel))
-        return (ret, dpmIpPerfLevel.value)
-    else:
-        return mxsml_get_device_current_dpm_ip_perf_level(device_id, ip)
+def _get_die_dpm_ip_perf_level(device_id, die_id, ip):
+    dpmIpPerfLevel = buffer_arena.get((device_id, "die_dpm_ip_perf_level", die_id, ip), c_uint)
+    ret = mxSmlGetCurrentDieDpmIpPerfLevel(device_id, die_id, ip, byref(dpmIpPerfLevel))
+    return (ret, dpmIpPerfLevel.value)
+
+
+def _get_device_dpm_ip_perf_level(device_id, die_id, ip):
+    return query_cache.call(mxsml_get_device_current_dpm_ip_perf_level, device_id, ip)
+
+
+mxsml_get_die_current_dpm_ip_perf_level = dispatch("mxsml_get_die_current_dpm_ip_perf_level", # ret: (MxSmlReturn, int)
+    ("mxSmlGetCurrentDieDpmIpPerfLevel", _get_die_dpm_ip_perf_level),
+    (None, _get_device_dpm_ip_perf_level))
 
 
 def mxsml_get_device_pmbus_info(device_id, unit): # ret: (MxSmlReturn, MxSmlPmbusInfo)
-    pmbusPowerInfo = MxSmlPmbusInfo()
+    pmbusPowerInfo = buffer_arena.get((device_id, "pmbus_info", unit), MxSmlPmbusInfo)
     ret = mxSmlGetPmbusInfo(device_id, unit, byref(pmbusPowerInfo))
     return (ret, pmbusPowerInfo)
 
 
-def mxsml_get_die_pmbus_info(device_id, die_id, unit): # ret: (MxSmlReturn, MxSmlPmbusInfo)
-    if hasattr(_module, "mxSmlGetDiePmbusInfo"):
-        pmbusPowerInfo = MxSmlPmbusInfo()
-        ret = mxSmlGetDiePmbusInfo(device_id, die_id, unit, byref(pmbusPowerInfo))
-        return (ret, pmbusPowerInfo)
-    else:
-        return mxsml_get_device_pmbus_info(device_id, unit)
+def _get_die_pmbus_info(device_id, die_id, unit):
+    pmbusPowerInfo = buffer_arena.get((device_id, "die_pmbus_info", die_id, unit), MxSmlPmbusInfo)
+    ret = mxSmlGetDiePmbusInfo(device_id, die_id, unit, byref(pmbusPowerInfo))
+    return (ret, pmbusPowerInfo)
+
+
+def _get_device_pmbus_info(device_id, die_id, unit):
+    return query_cache.call(mxsml_get_device_pmbus_info, device_id, unit)
+
+
+mxsml_get_die_pmbus_info = dispatch("mxsml_get_die_pmbus_info", # ret: (MxSmlReturn, MxSmlPmbusInfo)
+    ("mxSmlGetDiePmbusInfo", _get_die_pmbus_info),
+    (None, _get_device_pmbus_info))
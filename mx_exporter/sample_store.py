@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+"""
+Copyright © 2025 MetaX Integrated Circuits (Shanghai) Co., Ltd. All Rights Reserved.
+
+This software and associated documentation files (hereinafter collectively referred to as
+"Software") is a proprietary commercial software developed by MetaX Integrated Circuits
+(Shanghai) Co., Ltd. and/or its affiliates (hereinafter collectively referred to as “MetaX”).
+The information presented in the Software belongs to MetaX. Without prior written permission
+from MetaX, no entity or individual has the right to obtain a copy of the Software to deal in
+the Software, including but not limited to use, copy, modify, merge, disclose, publish,
+distribute, sublicense, and/or sell copies of the Software or substantial portions of the Software.
+
+The Software is provided for reference only, without warranty of any kind, either express or
+implied, including but not limited to the warranty of merchantability, fitness for any purpose
+and/or noninfringement. In no case shall MetaX be liable for any claim, damage or other liability
+arising from, out of or in connection with the Software.
+
+If the Software need to be used in conjunction with any third-party software or open source
+software, the rights to the third-party software or open source software still belong to the
+copyright owners. For details, please refer to the respective notices or licenses. Please comply
+with the provisions of the relevant notices or licenses. If the open source software licenses
+additionally require the disposal of rights related to this Software, please contact MetaX
+immediately and obtain MetaX 's written consent.
+
+MetaX reserves the right, at its sole discretion, to change, modify, add or remove portions of the
+Software, at any time. MetaX reserves all the right for the final explanation.
+"""
+
+import threading
+from array import array
+from collections import defaultdict
+from datetime import datetime
+
+
+old_print = print
+def timestamp_print(*args, **kwargs):
+    old_print(datetime.now(), "SampleStore", *args, **kwargs)
+print = timestamp_print
+
+
+def flatten(data, sub_key = ()):
+    # {"rx": {1: v1, 2: v2}} -> ("rx", 1), v1 and ("rx", 2), v2, sub keys become leading labels
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from flatten(value, sub_key + (key,))
+    else:
+        yield sub_key, data
+
+
+class SampleFrame:
+    """Read-only copy of a SampleStore, shared by all scrapes of a gather cycle"""
+
+    __slots__ = ("layout", "values", "valid")
+
+    def __init__(self, layout, values, valid):
+        # metric id : ((series key, sub key, slot), ...)
+        self.layout = layout
+        self.values = values
+        self.valid = valid
+
+    def series(self, metric_id):
+        values = self.values
+        valid = self.valid
+        for series_key, sub_key, slot in self.layout.get(metric_id, ()):
+            if valid[slot]:
+                yield series_key, sub_key, values[slot]
+
+    def to_dict(self):
+        # nested dict layout of the former gpu_data, for debugging only
+        data = {}
+        for metric_id in self.layout:
+            for series_key, sub_key, value in self.series(metric_id):
+                keys = (metric_id,) + sub_key
+                target = data.setdefault(series_key, {})
+                for key in keys[:-1]:
+                    target = target.setdefault(key, {})
+                target[keys[-1]] = value
+        return data
+
+
+class SampleStore:
+    """Columnar storage of numeric samples
+
+    Every (series key, metric id, sub key) gets a slot in a flat array of doubles the first
+    time it is written and keeps it until the store is dropped, so after the first cycle an
+    update is a plain array write. Series keys are device ids, (device id, die id) or
+    (device id, sgpu id).
+
+    Series may be written concurrently as long as each series key has a single writer,
+    freeze() must not run concurrently with writers.
+    """
+
+    def __init__(self):
+        self.values = array('d')
+        self.valid = bytearray()
+        # (series key, metric id) : {sub key : slot}
+        self.slots = {}
+        # guards slot allocation between sampling workers
+        self.lock = threading.Lock()
+
+        self.layout = {}
+        self.layout_changed = False
+        self.frame = None
+
+    def write(self, series_key, metric_id, data):
+        slots = self.slots.get((series_key, metric_id))
+        if slots is None:
+            with self.lock:
+                slots = self.slots.setdefault((series_key, metric_id), {})
+
+        # a metric is replaced as a whole, sub keys missing from data are not exported
+        for slot in slots.values():
+            self.valid[slot] = 0
+
+        for sub_key, value in flatten(data):
+            slot = slots.get(sub_key)
+            if slot is None:
+                slot = self.allocate(slots, sub_key)
+            try:
+                self.values[slot] = value
+            except TypeError:
+                print("Skip non numeric value %s of metric %s" % (value, metric_id))
+                continue
+            self.valid[slot] = 1
+
+        self.frame = None
+
+    def invalidate(self, device_id):
+        # samples of the device are not exported until they are written again. A task abandoned
+        # at its deadline may still write and allocate slots, so the slots are copied under the lock
+        with self.lock:
+            for (series_key, metric_id), slots in list(self.slots.items()):
+                if series_key == device_id or (isinstance(series_key, tuple) and series_key[0] == device_id):
+                    for slot in list(slots.values()):
+                        self.valid[slot] = 0
+        self.frame = None
+
+    def allocate(self, slots, sub_key):
+        with self.lock:
+            slot = len(self.values)
+            self.values.append(0)
+            self.valid.append(0)
+            slots[sub_key] = slot
+            self.layout_changed = True
+        return slot
+
+    def freeze(self):
+        if self.frame is not None:
+            return self.frame
+
+        if self.layout_changed:
+            layout = defaultdict(list)
+            for (series_key, metric_id), slots in self.slots.items():
+                for sub_key, slot in slots.items():
+                    layout[metric_id].append((series_key, sub_key, slot))
+            self.layout = {metric_id: tuple(series) for metric_id, series in layout.items()}
+            self.layout_changed = False
+
+        self.frame = SampleFrame(self.layout, self.values[:], bytes(self.valid))
+        return self.frame
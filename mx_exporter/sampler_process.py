@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+
+"""
+Copyright © 2025 MetaX Integrated Circuits (Shanghai) Co., Ltd. All Rights Reserved.
+
+This software and associated documentation files (hereinafter collectively referred to as
+"Software") is a proprietary commercial software developed by MetaX Integrated Circuits
+(Shanghai) Co., Ltd. and/or its affiliates (hereinafter collectively referred to as “MetaX”).
+The information presented in the Software belongs to MetaX. Without prior written permission
+from MetaX, no entity or individual has the right to obtain a copy of the Software to deal in
+the Software, including but not limited to use, copy, modify, merge, disclose, publish,
+distribute, sublicense, and/or sell copies of the Software or substantial portions of the Software.
+
+The Software is provided for reference only, without warranty of any kind, either express or
+implied, including but not limited to the warranty of merchantability, fitness for any purpose
+and/or noninfringement. In no case shall MetaX be liable for any claim, damage or other liability
+arising from, out of or in connection with the Software.
+
+If the Software need to be used in conjunction with any third-party software or open source
+software, the rights to the third-party software or open source software still belong to the
+copyright owners. For details, please refer to the respective notices or licenses. Please comply
+with the provisions of the relevant notices or licenses. If the open source software licenses
+additionally require the disposal of rights related to this Software, please contact MetaX
+immediately and obtain MetaX 's written consent.
+
+MetaX reserves the right, at its sole discretion, to change, modify, add or remove portions of the
+Software, at any time. MetaX reserves all the right for the final explanation.
+"""
+
+import os
+import atexit
+import signal
+import struct
+import threading
+import time
+import multiprocessing
+from array import array
+from datetime import datetime
+from multiprocessing import shared_memory
+
+from mx_exporter.gpu_monitor import GpuMonitor, Snapshot
+from mx_exporter.sample_store import SampleFrame
+
+
+old_print = print
+def timestamp_print(*args, **kwargs):
+    old_print(datetime.now(), "SamplerProcess", *args, **kwargs)
+print = timestamp_print
+
+
+# Shared memory segment written by the sampler process and read by the exporter process:
+#
+#   header: heartbeat (double), state (uint32)
+#   slot 0, slot 1: seq (uint64), generation (uint64), timestamp (double),
+#                   gpu count (uint32), sgpu count (uint32),
+#                   gpu values (double * capacity), sgpu values (double * capacity),
+#                   gpu valid (byte * capacity), sgpu valid (byte * capacity)
+#
+# Cycles are written to the two slots in turn. seq is odd while a slot is being written, a
+# reader that sees seq odd or changed across its copy drops the copy, a newer cycle follows.
+HEADER = struct.Struct("<dI4x")
+SLOT_HEADER = struct.Struct("<QQdII")
+
+STATE_STARTING = 0
+STATE_INITIALIZING = 1
+STATE_RUNNING = 2
+
+
+def slot_size(capacity):
+    size = SLOT_HEADER.size + capacity * 2 * (8 + 1)
+    return (size + 7) // 8 * 8
+
+
+def slot_offset(capacity, slot):
+    return HEADER.size + slot * slot_size(capacity)
+
+
+class SampleSegment:
+
+    def __init__(self, capacity, name=None):
+        self.capacity = capacity
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=slot_offset(capacity, 2))
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+
+    def write_header(self, state):
+        HEADER.pack_into(self.shm.buf, 0, time.time(), state)
+
+    def read_header(self):
+        return HEADER.unpack_from(self.shm.buf, 0)
+
+    def write_slot(self, slot, generation, timestamp, gpu_frame, sgpu_frame):
+        buf = self.shm.buf
+        offset = slot_offset(self.capacity, slot)
+        seq = SLOT_HEADER.unpack_from(buf, offset)[0]
+        gpu_count = len(gpu_frame.values)
+        sgpu_count = len(sgpu_frame.values)
+
+        SLOT_HEADER.pack_into(buf, offset, seq + 1, generation, timestamp, gpu_count, sgpu_count)
+        values = offset + SLOT_HEADER.size
+        valid = values + self.capacity * 2 * 8
+        buf[values:values + gpu_count * 8] = memoryview(gpu_frame.values).cast('B')
+        buf[values + self.capacity * 8:values + self.capacity * 8 + sgpu_count * 8] = memoryview(sgpu_frame.values).cast('B')
+        buf[valid:valid + gpu_count] = gpu_frame.valid
+        buf[valid + self.capacity:valid + self.capacity + sgpu_count] = sgpu_frame.valid
+        SLOT_HEADER.pack_into(buf, offset, seq + 2, generation, timestamp, gpu_count, sgpu_count)
+
+    def read_slot(self, slot, generation):
+        # ret: (timestamp, gpu values, gpu valid, sgpu values, sgpu valid), None if the slot
+        # doesn't hold a complete copy of the cycle
+        buf = self.shm.buf
+        offset = slot_offset(self.capacity, slot)
+        seq, slot_generation, timestamp, gpu_count, sgpu_count = SLOT_HEADER.unpack_from(buf, offset)
+        if seq % 2 == 1 or slot_generation != generation:
+            return None
+
+        values = offset + SLOT_HEADER.size
+        valid = values + self.capacity * 2 * 8
+        gpu_values = array('d')
+        gpu_values.frombytes(buf[values:values + gpu_count * 8])
+        sgpu_values = array('d')
+        sgpu_values.frombytes(buf[values + self.capacity * 8:values + self.capacity * 8 + sgpu_count * 8])
+        gpu_valid = bytes(buf[valid:valid + gpu_count])
+        sgpu_valid = bytes(buf[valid + self.capacity:valid + self.capacity + sgpu_count])
+
+        if SLOT_HEADER.unpack_from(buf, offset)[0] != seq:
+            return None
+        return timestamp, gpu_values, gpu_valid, sgpu_values, sgpu_valid
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedGpuMonitor(GpuMonitor):
+    """GpuMonitor of the sampler process, publishes every snapshot to the exporter process"""
+
+    def __init__(self, connection, gather_interval, sample_workers, device_timeout, fast_init, inventory_cache, capacity):
+        self.connection = connection
+        self.state = STATE_STARTING
+        self.segment = None
+        self.slot = 0
+        # metadata key : what was last sent for it
+        self.sent_keys = {}
+        self.allocate_segment(capacity)
+        super().__init__(gather_interval, sample_workers, device_timeout=device_timeout, fast_init=fast_init,
+            inventory_cache=inventory_cache)
+
+    def allocate_segment(self, capacity):
+        old_segment = self.segment
+        self.segment = SampleSegment(capacity)
+        self.segment.write_header(self.state)
+        self.connection.send(("segment", self.segment.name, capacity))
+        if old_segment is not None:
+            # the exporter process keeps its own mapping until it has switched over
+            old_segment.close()
+            old_segment.unlink()
+
+    def initialize(self):
+        self.state = STATE_INITIALIZING
+        self.segment.write_header(self.state)
+        super().initialize()
+        self.state = STATE_RUNNING
+        self.segment.write_header(self.state)
+
+    def clear(self):
+        super().clear()
+        self.publish_shared()
+
+    def publish_snapshot(self):
+        super().publish_snapshot()
+        self.publish_shared()
+
+    def publish_shared(self):
+        snapshot = self.snapshot
+        needed = max(len(snapshot.gpu_data.values), len(snapshot.sgpu_data.values))
+        if needed > self.segment.capacity:
+            self.allocate_segment(max(needed, self.segment.capacity * 2))
+
+        # metadata only crosses the pipe when it changes, numbers go through the segment
+        meta = {}
+        # a layout is replaced whenever it changes. The sent one stays referenced here, so that
+        # a new layout can't be allocated at its address and pass for it
+        for key, layout in [("gpu_layout", snapshot.gpu_data.layout), ("sgpu_layout", snapshot.sgpu_data.layout)]:
+            if self.sent_keys.get(key) is not layout:
+                self.sent_keys[key] = layout
+                meta[key] = layout
+        for key, value, sent_key in [
+            ("server_data", dict(snapshot.server_data), dict(snapshot.server_data)),
+            ("topology", (dict(snapshot.device_info_map), dict(snapshot.bdf_device_map)),
+                snapshot.topology_generation),
+            ("sgpu", (dict(snapshot.all_sgpu_info), dict(snapshot.sgpu_pod_uuid_map)),
+                snapshot.sgpu_generation),
+        ]:
+            if key not in self.sent_keys or self.sent_keys[key] != sent_key:
+                self.sent_keys[key] = sent_key
+                meta[key] = value
+        if meta:
+            self.connection.send(("meta", meta))
+
+        self.slot = 1 - self.slot
+        self.segment.write_slot(self.slot, snapshot.generation, snapshot.timestamp,
+            snapshot.gpu_data, snapshot.sgpu_data)
+        self.segment.write_header(self.state)
+        self.connection.send(("cycle", self.slot, snapshot.generation, dict(snapshot.device_sample_time)))
+
+
+def run_sampler(connection, gather_interval, sample_workers, device_timeout, fast_init, inventory_cache, capacity):
+    # entry of the sampler process, which is stopped by the exporter process only, signals
+    # sent to the whole process group must not make it exit first
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    monitor = SharedGpuMonitor(connection, gather_interval, sample_workers, device_timeout, fast_init, inventory_cache,
+        capacity)
+    connection.send(("ready", monitor.get_supported_metrics()))
+    message, metrics_required, metric_intervals = connection.recv()
+    monitor.start(metrics_required, metric_intervals)
+
+    # the gather thread does all the work, exit as soon as the exporter process goes away
+    try:
+        while True:
+            connection.recv()
+    except (EOFError, OSError):
+        pass
+    monitor.segment.close()
+    monitor.segment.unlink()
+    os._exit(0)
+
+
+class SamplerProcess:
+    """GpuMonitor running in a separate process, same interface as GpuMonitor
+
+    libmxsml calls and sample bookkeeping run in the sampler process, this process only
+    rebuilds snapshots from the shared memory segment, renders and serves. A sampler that
+    stops publishing for hang_timeout seconds while running is killed and started again,
+    scrapes keep getting the last snapshot in the meantime.
+    """
+
+    def __init__(self, gather_interval = 10, sample_workers = 0, device_timeout = 0, fast_init = 0, inventory_cache = "",
+            hang_timeout = None, capacity = 4096):
+        self.gather_interval = gather_interval
+        self.sample_workers = sample_workers
+        self.device_timeout = device_timeout
+        self.fast_init = fast_init
+        self.inventory_cache = inventory_cache
+        self.hang_timeout = hang_timeout if hang_timeout is not None else max(3 * gather_interval, 30)
+        self.capacity = capacity
+        self.context = multiprocessing.get_context("spawn")
+
+        self.process = None
+        self.stopping = False
+        # held by the supervisor while it talks to the sampler, and by stop()
+        self.lock = threading.Lock()
+        self.connection = None
+        self.segment = None
+        self.start_args = None
+        self.metrics_supported = []
+
+        # latest rebuilt cycle, generations are renumbered here so that they keep growing
+        # across sampler restarts
+        self.snapshot = None
+        self.generation = 0
+        self.topology_generation = 0
+        self.sgpu_generation = 0
+        self.meta = {}
+        self.cycle_listeners = []
+
+        self.spawn()
+        self.metrics_supported = self.wait_ready()
+        atexit.register(self.stop)
+
+    def spawn(self):
+        self.connection, child_connection = self.context.Pipe()
+        self.process = self.context.Process(target=run_sampler, name="mx-sampler", daemon=True,
+            args=(child_connection, self.gather_interval, self.sample_workers, self.device_timeout, self.fast_init,
+                self.inventory_cache, self.capacity))
+        self.process.start()
+        child_connection.close()
+        self.meta = {}
+        print("Sampler process %d started" % self.process.pid)
+
+    def wait_ready(self):
+        # the sampler may initialize for a long time, or forever if the driver hangs, so a stop
+        # must be able to interrupt the wait
+        while not self.stopping:
+            if self.connection.poll(1):
+                message = self.connection.recv()
+                if message[0] == "ready":
+                    return message[1]
+                self.handle_message(message)
+        raise EOFError("Sampler stopping")
+
+    def start(self, metrics_required, metric_intervals = None):
+        if metric_intervals is None:
+            metric_intervals = {}
+        self.start_args = ("start", list(metrics_required), dict(metric_intervals))
+        self.connection.send(self.start_args)
+
+        t = threading.Thread(target=self.supervise, args=(), daemon=True)
+        t.start()
+
+    def get_supported_metrics(self):
+        return self.metrics_supported
+
+    def get_snapshot(self):
+        return self.snapshot
+
+    def register_cycle_listener(self, listener):
+        self.cycle_listeners.append(listener)
+
+    def notify_cycle_listeners(self):
+        for listener in self.cycle_listeners:
+            try:
+                listener()
+            except Exception as e:
+                print("Cycle listener exception: %s" % (e))
+
+    def supervise(self):
+        while True:
+            with self.lock:
+                if self.stopping:
+                    return
+                self.supervise_once()
+
+    def supervise_once(self):
+        try:
+            if self.connection.poll(1):
+                self.handle_message(self.connection.recv())
+                return
+        except (EOFError, OSError):
+            self.process.join(1)
+            print("Sampler process %d exited with %s" % (self.process.pid, self.process.exitcode))
+            self.restart()
+            return
+
+        if self.is_hung():
+            print("Sampler process %d published nothing for %.0fs, restart it" % (self.process.pid, self.hang_timeout))
+            self.restart()
+
+    def is_hung(self):
+        if self.segment is None:
+            return False
+        heartbeat, state = self.segment.read_header()
+        # initialization waits for the driver on purpose, only running cycles are bounded
+        return state == STATE_RUNNING and time.time() - heartbeat > self.hang_timeout
+
+    def stop(self):
+        # at exit, the supervisor must not start another sampler. It may hold the lock while
+        # waiting for a restarted sampler to initialize, so stopping is flagged and the sampler
+        # killed before taking the lock, which ends the wait
+        self.stopping = True
+        self.process.kill()
+        with self.lock:
+            self.terminate()
+
+    def terminate(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+        # the sampler can't unlink its segment once killed
+        if self.segment is not None:
+            self.segment.close()
+            self.segment.unlink()
+            self.segment = None
+
+    def restart(self):
+        self.terminate()
+        self.spawn()
+        try:
+            self.wait_ready()
+            self.connection.send(self.start_args)
+        except (EOFError, OSError):
+            if self.stopping:
+                return
+            print("Sampler process %d exited during start" % self.process.pid)
+            time.sleep(1)
+
+    def handle_message(self, message):
+        if message[0] == "segment":
+            old_segment = self.segment
+            self.segment = SampleSegment(message[2], message[1])
+            if old_segment is not None:
+                old_segment.close()
+        elif message[0] == "meta":
+            meta = message[1]
+            if "topology" in meta:
+                self.topology_generation += 1
+            if "sgpu" in meta:
+                self.sgpu_generation += 1
+            self.meta.update(meta)
+        elif message[0] == "cycle":
+            self.load_cycle(message[1], message[2], message[3])
+
+    def load_cycle(self, slot, generation, device_sample_time):
+        data = self.segment.read_slot(slot, generation)
+        if data is None:
+            return
+        timestamp, gpu_values, gpu_valid, sgpu_values, sgpu_valid = data
+
+        self.generation += 1
+        device_info_map, bdf_device_map = self.meta["topology"]
+        all_sgpu_info, sgpu_pod_uuid_map = self.meta["sgpu"]
+        snapshot = Snapshot(self.generation, self.topology_generation, self.sgpu_generation,
+            SampleFrame(self.meta["gpu_layout"], gpu_values, gpu_valid),
+            SampleFrame(self.meta["sgpu_layout"], sgpu_values, sgpu_valid),
+            self.meta["server_data"], device_info_map, bdf_device_map, all_sgpu_info, sgpu_pod_uuid_map,
+            device_sample_time)
+        snapshot.timestamp = timestamp
+        self.snapshot = snapshot
+        self.notify_cycle_listeners()
@@ -24,8 +24,11 @@ setup(
     install_requires=[
         'prometheus_client>=0.7.0',
         'grpcio',
-        'protobuf>=3.12.0'
+        'protobuf>=3.20.0'
     ],
+    extras_require={
+        'zstd': ['zstandard'],
+    },
     entry_points={
         'console_scripts': [
             'mx-exporter=mx_exporter:main',